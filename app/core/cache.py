@@ -0,0 +1,111 @@
+"""
+In-process caching utilities
+A bounded LRU cache with per-entry TTL and optional JSON persistence to disk
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    LRU cache bounded by entry count, with entries expiring after ttl_seconds
+
+    Values must be JSON-serialisable if persist_path is set. Expiry uses wall
+    clock time so persisted entries keep their remaining lifetime across restarts.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        if persist_path:
+            self.load()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            # Left in place (until evicted) for get_stale
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """The value for a key even if it has expired, for serving while the source is unavailable"""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Unexpired entries, least recently used first"""
+        now = time.time()
+        return [(key, value) for key, (expires_at, value) in self._entries.items() if expires_at > now]
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def load(self):
+        """Load unexpired entries from persist_path, ignoring a missing or corrupt file"""
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache file {self.persist_path}: {e}")
+            return
+
+        now = time.time()
+        for key, expires_at, value in stored[-self.max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+
+    def save(self):
+        """Atomically write unexpired entries to persist_path, oldest first"""
+        if not self.persist_path:
+            return
+
+        now = time.time()
+        stored = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items() if expires_at > now]
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.persist_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,250 @@
+"""
+Traffic capture for replay
+Opt-in middleware that records the shape and timing of requests to the
+chat, verse, STT and audio routes, plus the latency, status and size of
+every upstream call made while serving them, as one compact JSON line per
+request. No text, audio or identifiers are kept: strings are reduced to
+their length and a salted fingerprint (so repeated questions stay
+recognisable within a capture, which keeps cache hit rates realistic), and
+uploads to their size. benchmarks/replay.py plays a capture back.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT = 1
+
+# JSON bodies larger than this are recorded by size only
+_MAX_JSON_BYTES = 64 * 1024
+# Path segments that look like ids or dates are replaced, so paths group by route
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[\w-]{6,}$|^\d+$")
+
+_calls: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("capture_calls", default=None)
+
+# Fingerprints are only comparable within one process's captures; the salt is never written
+_SALT = os.urandom(16)
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.blake2b(data, key=_SALT, digest_size=6).hexdigest()
+
+
+def shape(value: Any) -> Any:
+    """
+    JSON value with every string replaced by {"$s": length, "$h": fingerprint}
+
+    Numbers, booleans, nulls, keys and list lengths are kept as they are.
+    """
+    if isinstance(value, str):
+        return {"$s": len(value), "$h": fingerprint(value.encode())}
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(item) for item in value]
+    return value
+
+
+def route_path(path: str) -> str:
+    """`path` with id-like segments replaced by {id} ("/audio/download/{id}")"""
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+@contextlib.contextmanager
+def upstream_call(service: str, operation: str, **fields) -> Iterator[Dict[str, Any]]:
+    """
+    Time one upstream call for the request being captured
+
+    Yields the call's record; callers add what they learn about the reply
+    ("status", "bytes", "chars", "tokens"). Outside a captured request the
+    record is simply discarded.
+    """
+    calls = _calls.get()
+    if calls is None:
+        yield {}
+        return
+    record: Dict[str, Any] = {"svc": service, "op": operation, **fields}
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.setdefault("status", getattr(e, "status_code", None) or type(e).__name__)
+        raise
+    finally:
+        record.setdefault("status", 200)
+        record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        calls.append(record)
+
+
+def annotate_call(operation: str, **fields):
+    """Add reply details to the captured request's latest `operation` call (e.g. once a stream is read)"""
+    calls = _calls.get()
+    if calls:
+        for record in reversed(calls):
+            if record["op"] == operation:
+                record.update(fields)
+                return
+
+
+class CaptureWriter:
+    """
+    Append-only JSONL capture files, rotated by size
+
+    Lines are buffered in the file object, so writing one costs a memory copy
+    on the event loop; the buffer is flushed as it fills and on close().
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.started = time.monotonic()
+        self._file = None
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = time.strftime("capture-%Y%m%d-%H%M%S", time.gmtime()) + f"-{os.getpid()}.jsonl"
+        path = os.path.join(self.directory, name)
+        self._file = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._written = 0
+        # Request times are offsets from this header's start, so replays keep their spacing across files
+        self._write({"capture": CAPTURE_FORMAT, "started_at": time.time() - (time.monotonic() - self.started)})
+        logger.info(f"Capturing traffic to {path}")
+
+    def _write(self, record: Dict[str, Any]):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._written += len(line)
+
+    def write(self, record: Dict[str, Any]):
+        with self._lock:
+            if self._file is None or self._written >= self.max_bytes:
+                self.close()
+                try:
+                    self._open()
+                except OSError as e:
+                    logger.error(f"Traffic capture disabled: {e}")
+                    self.max_bytes = float("inf")
+                    return
+            self._write(record)
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError as e:
+                logger.error(f"Failed to flush traffic capture: {e}")
+            self._file = None
+
+
+class TrafficCaptureMiddleware:
+    """
+    Record sampled requests under the given path prefixes to a CaptureWriter
+
+    Each line holds the request's start offset, method, route, query and
+    body shape, response status and size, time to first byte and to the end
+    of the body, and its upstream calls in order.
+    """
+
+    def __init__(self, app, writer: CaptureWriter, prefixes: List[str], sample_ratio: float = 1.0):
+        """
+        Args:
+            app: The wrapped ASGI application
+            writer: Where captured requests go
+            prefixes: Paths to capture (anything starting with one of them)
+            sample_ratio: Share of matching requests captured
+        """
+        self.app = app
+        self.writer = writer
+        self.prefixes = tuple(prefixes)
+        self.sample_ratio = sample_ratio
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.prefixes)
+            or (self.sample_ratio < 1.0 and random.random() >= self.sample_ratio)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_type = ""
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                content_type = value.decode("latin-1").split(";", 1)[0].strip()
+                break
+        keep_json = content_type == "application/json"
+        hasher = hashlib.blake2b(key=_SALT, digest_size=6)
+        body: List[bytes] = []
+        request_bytes = 0
+        response: Dict[str, Any] = {"status": None, "bytes": 0, "ttfb": None}
+        started = time.monotonic()
+
+        async def receive_wrapper():
+            nonlocal request_bytes, keep_json
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                request_bytes += len(chunk)
+                hasher.update(chunk)
+                if keep_json:
+                    if request_bytes <= _MAX_JSON_BYTES:
+                        body.append(chunk)
+                    else:
+                        keep_json = False
+                        body.clear()
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["ttfb"] = time.monotonic() - started
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        calls: List[Dict[str, Any]] = []
+        token = _calls.set(calls)
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            _calls.reset(token)
+            record: Dict[str, Any] = {
+                "t": round(started - self.writer.started, 3),
+                "method": scope["method"],
+                "path": route_path(scope["path"]),
+                "status": response["status"] or 500,
+                "req_bytes": request_bytes,
+                "resp_bytes": response["bytes"],
+                "ttfb_ms": round(response["ttfb"] * 1000, 1) if response["ttfb"] is not None else None,
+                "ms": round((time.monotonic() - started) * 1000, 1),
+            }
+            if scope.get("query_string"):
+                # Numeric parameters (counts, dates) are kept; anything else is shaped like a body string
+                record["query"] = {
+                    name: value if value.replace("-", "").isdigit() else shape(value)
+                    for name, value in parse_qsl(scope["query_string"].decode("latin-1"))
+                }
+            if request_bytes:
+                record["ct"] = content_type
+                record["fp"] = hasher.hexdigest()
+                if keep_json:
+                    try:
+                        record["body"] = shape(json.loads(b"".join(body)))
+                    except ValueError:
+                        pass
+            if calls:
+                record["up"] = calls
+            self.writer.write(record)
@@ -0,0 +1,239 @@
+"""
+Circuit breakers for upstream services
+Each upstream's breaker watches a window of recent calls and opens when too
+many fail or run slow. While open, calls fail at once with CircuitOpen so
+routes can answer from their fallbacks instead of waiting on a degraded
+upstream. After a cool-down it lets a few probe calls through (half-open)
+and closes again once they succeed.
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, Tuple
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_state = metrics.gauge("circuit_breaker_state", "Breaker state by upstream (0 closed, 1 half-open, 2 open)")
+_transitions = metrics.counter("circuit_breaker_transitions_total", "Breaker state changes by upstream and new state")
+_rejected = metrics.counter("circuit_breaker_rejected_total", "Calls failed fast by a breaker, by upstream")
+fallbacks = metrics.counter("fallback_responses_total", "Responses served from a fallback, by route and source")
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable; retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Whether an error counts against the upstream
+
+    Connection errors, timeouts, 5xx and 429 replies do; other 4xx replies
+    (our request was wrong) and our own deadlines and cancellations don't.
+    """
+    if not isinstance(error, Exception) or isinstance(error, (DeadlineExceeded, CircuitOpen)):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is None:
+        return True
+    return status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over the last `window` calls
+
+    Opens once at least `min_calls` are in the window and the share that
+    failed reaches `failure_ratio`, or the share slower than
+    `slow_call_seconds` reaches `slow_call_ratio`. Stays open for
+    `open_seconds`, then admits up to `half_open_probes` concurrent calls;
+    that many successes close it, and any failure or slow probe reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_seconds: float,
+        failure_ratio: float = 0.5,
+        slow_call_ratio: float = 0.8,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 2,
+        enabled: bool = True
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_ratio = failure_ratio
+        self.slow_call_ratio = slow_call_ratio
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._outcomes: Deque[Tuple[bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._probes = 0
+        self._probe_successes = 0
+        _state.set(0, upstream=name)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._opened_at + self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        self._state = state
+        self._probes = 0
+        self._probe_successes = 0
+        if state != HALF_OPEN:
+            self._outcomes.clear()
+            self._failures = self._slow = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        _state.set(_STATE_VALUES[state], upstream=self.name)
+        _transitions.inc(upstream=self.name, state=state)
+        log = logger.warning if state == OPEN else logger.info
+        log(f"Circuit breaker for {self.name} is now {state}")
+
+    def _reject(self, retry_after: float):
+        _rejected.inc(upstream=self.name)
+        raise CircuitOpen(self.name, retry_after)
+
+    def check(self):
+        """Fail fast if the breaker is open, without taking a half-open probe"""
+        if self.enabled and self.state == OPEN:
+            self._reject(self._opened_at + self.open_seconds - time.monotonic())
+
+    def before_call(self) -> bool:
+        """
+        Admit one call, or raise CircuitOpen
+
+        Returns:
+            Whether the call is a half-open probe; pass it to record() or abandon()
+        """
+        if not self.enabled:
+            return False
+        state = self.state
+        if state == OPEN:
+            self._reject(self._opened_at + self.open_seconds - time.monotonic())
+        if state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self._reject(1.0)
+            self._probes += 1
+            return True
+        return False
+
+    def record(self, seconds: float, failed: bool, probe: bool = False):
+        """Report how an admitted call went"""
+        if not self.enabled:
+            return
+        slow = seconds >= self.slow_call_seconds
+        if probe:
+            if self._state != HALF_OPEN:
+                return
+            self._probes -= 1
+            if failed or slow:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+        if self._state != CLOSED:
+            # Admitted before the breaker opened; the probes decide from here
+            return
+
+        if len(self._outcomes) == self.window:
+            old_failed, old_slow = self._outcomes.popleft()
+            self._failures -= old_failed
+            self._slow -= old_slow
+        self._outcomes.append((failed, slow))
+        self._failures += failed
+        self._slow += slow
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and (
+            self._failures >= self.failure_ratio * calls or self._slow >= self.slow_call_ratio * calls
+        ):
+            self._transition(OPEN)
+
+    def abandon(self, probe: bool):
+        """A call ended without an answer either way (cancelled, or our own deadline)"""
+        if probe and self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """Admit the block as one call and record its outcome (exceptions are classified by is_upstream_failure)"""
+        probe = self.before_call()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, (asyncio.CancelledError, DeadlineExceeded)):
+                self.abandon(probe)
+            else:
+                self.record(time.monotonic() - started, is_upstream_failure(e), probe)
+            raise
+        self.record(time.monotonic() - started, False, probe)
+
+    def snapshot(self) -> Dict[str, object]:
+        state = self.state
+        calls = len(self._outcomes)
+        snapshot = {
+            "state": state,
+            "calls": calls,
+            "failure_ratio": round(self._failures / calls, 3) if calls else 0.0,
+            "slow_ratio": round(self._slow / calls, 3) if calls else 0.0,
+        }
+        if state == OPEN:
+            snapshot["retry_in_seconds"] = round(self._opened_at + self.open_seconds - time.monotonic(), 1)
+        return snapshot
+
+
+def _breaker(name: str, slow_call_seconds: float) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        slow_call_seconds=slow_call_seconds,
+        failure_ratio=settings.circuit_failure_ratio,
+        slow_call_ratio=settings.circuit_slow_call_ratio,
+        window=settings.circuit_window,
+        min_calls=settings.circuit_min_calls,
+        open_seconds=settings.circuit_open_seconds,
+        half_open_probes=settings.circuit_half_open_probes,
+        enabled=settings.circuit_breaker_enabled
+    )
+
+
+openai_breaker = _breaker("openai", settings.openai_slow_call_seconds)
+elevenlabs_breaker = _breaker("elevenlabs", settings.elevenlabs_slow_call_seconds)
+breakers: Dict[str, CircuitBreaker] = {breaker.name: breaker for breaker in (openai_breaker, elevenlabs_breaker)}
+
+
+def breaker_states() -> Dict[str, str]:
+    return {name: breaker.state for name, breaker in breakers.items()}
+
+
+def retry_after_header(error: CircuitOpen) -> str:
+    return str(max(1, math.ceil(error.retry_after)))
@@ -12,16 +12,99 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
     # OpenAI Settings
-    openai_api_key: str = Field(..., alias="OPEN_AI_API_KEY")
+    # Keys are checked when the upstream clients are first built (and by /ready),
+    # so a missing key doesn't stop the app from importing or serving /health
+    openai_api_key: Optional[str] = Field(default=None, alias="OPEN_AI_API_KEY")
     openai_model: str = Field(default="gpt-4o-2024-08-06", alias="Model")
+    # Simple chat queries are answered by this model (see MODEL_ROUTING)
+    openai_fast_model: str = "gpt-4o-mini"
+    llm_routing_enabled: bool = True
+    # Estimated spend per trailing hour above which every routed query uses the fast model
+    llm_cost_budget_per_hour: float = 5.0
+    # Point at a local stand-in (e.g. benchmarks/mock_upstream.py) for load testing
+    openai_base_url: Optional[str] = None
     openai_max_tokens: int = 512
     openai_temperature: float = 0.7
     openai_top_p: float = 0.9
     openai_frequency_penalty: float = 0.0
     openai_presence_penalty: float = 0.0
+    openai_timeout_seconds: float = 60.0
+    openai_connect_timeout_seconds: float = 5.0
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_max_retries: int = 2
+    openai_retry_base_delay_seconds: float = 0.5
+    openai_retry_max_delay_seconds: float = 8.0
+    hedge_enabled: bool = False
+    hedge_latency_percentile: float = 95.0
+    hedge_min_samples: int = 50
+    hedge_max_ratio: float = 0.05
+    hedge_burst: float = 10.0
+    # Concurrent upstream calls, shared by priority class (see UPSTREAM_PRIORITY_WEIGHTS)
+    openai_max_concurrency: int = 32
+    # Calls slower than this count against the OpenAI circuit breaker
+    openai_slow_call_seconds: float = 30.0
+    llm_response_cache_max_entries: int = 2048
+    llm_response_cache_ttl_seconds: int = 24 * 3600
+    llm_response_cache_path: Optional[str] = None
     
+    # Speech-to-Text Settings
+    stt_max_concurrency: int = 4
+    stt_max_upload_mb: int = 25
+    stt_ingest_chunk_size: int = 64 * 1024
+    stt_long_max_upload_mb: int = 500
+    stt_segment_seconds: float = 120.0
+    stt_segment_overlap_seconds: float = 2.0
+    stt_silence_search_seconds: float = 1.5
+    stt_stream_min_segment_seconds: float = 2.0
+    stt_stream_max_segment_seconds: float = 15.0
+    stt_stream_pause_seconds: float = 0.6
+    stt_stream_silence_rms: int = 400
+    stt_stream_overlap_seconds: float = 1.0
+    stt_stream_max_pending_segments: int = 4
+    stt_stream_max_chunk_bytes: int = 256 * 1024
+    transcript_cache_max_entries: int = 2048
+    transcript_cache_ttl_seconds: int = 7 * 24 * 3600
+    transcript_cache_path: Optional[str] = None
+    voice_tts_max_concurrency: int = 3
+    voice_min_sentence_chars: int = 40
+
+    # Devotions Settings
+    devotions_db_path: str = "data/devotions.sqlite3"
+    devotions_timezone: str = "UTC"
+    devotions_days_ahead: int = 7
+    devotions_days_kept: int = 30
+    devotions_prefill_enabled: bool = True
+    devotions_prefill_interval_seconds: float = 3600.0
+    devotions_prefill_concurrency: int = 2
+
+    # Recently generated verses and prayers, served by /verses/random while OpenAI is unavailable
+    verse_pool_max_entries: int = 500
+    verse_pool_ttl_seconds: int = 30 * 24 * 3600
+    verse_pool_path: Optional[str] = "data/verse_pool.json"
+
+    # Background Job Settings (per-type worker counts in JOB_CONCURRENCY)
+    jobs_db_path: str = "data/jobs.sqlite3"
+    jobs_artifact_dir: str = "data/jobs"
+    jobs_max_workers: int = 4
+    jobs_retention_hours: float = 24.0
+    jobs_tts_max_chars: int = 50_000
+    jobs_tts_chunk_chars: int = 2_500
+
     # ElevenLabs Settings
-    elevenlabs_api_key: str = Field(..., alias="ELEVENLABS_API_KEY")
+    elevenlabs_api_key: Optional[str] = Field(default=None, alias="ELEVENLABS_API_KEY")
+    elevenlabs_base_url: str = "https://api.elevenlabs.io"
+    elevenlabs_max_concurrency: int = 4
+    elevenlabs_slow_call_seconds: float = 20.0
+
+    # Circuit Breakers (one per upstream, see app/core/circuit_breaker.py)
+    circuit_breaker_enabled: bool = True
+    circuit_failure_ratio: float = 0.5
+    circuit_slow_call_ratio: float = 0.8
+    circuit_window: int = 20
+    circuit_min_calls: int = 10
+    circuit_open_seconds: float = 30.0
+    circuit_half_open_probes: int = 2
     
     # Application Settings
     app_name: str = "Vilisasu Bible AI"
@@ -34,6 +117,39 @@ class Settings(BaseSettings):
     
     # API Settings
     api_v1_prefix: str = "/api/v1"
+    request_deadline_default_seconds: float = 60.0
+    request_deadline_max_seconds: float = 600.0
+    loop_lag_probe_interval_seconds: float = 0.1
+    warm_clients_on_startup: bool = True
+    compression_min_bytes: int = 1024
+    
+    # Tracing (OTLP JSON span logs) and on-demand profiling
+    tracing_enabled: bool = True
+    # Share of requests without an incoming traceparent that are traced
+    tracing_sample_ratio: float = 0.01
+    # Span logs go to stdout unless a file is given
+    tracing_log_path: Optional[str] = None
+    # Profiling via the X-Debug-Profile header is off unless a token is set
+    debug_profile_token: Optional[str] = None
+    debug_profile_interval_ms: float = 5.0
+    debug_profile_max_seconds: float = 120.0
+    debug_profiles_kept: int = 16
+
+    # Traffic capture for benchmarks/replay.py (anonymized request shapes and upstream timings)
+    capture_enabled: bool = False
+    capture_dir: str = "data/captures"
+    capture_sample_ratio: float = 1.0
+    capture_max_file_mb: int = 64
+    
+    # Rate Limiting (per client IP and per X-API-Key, see RATE_LIMIT_COSTS)
+    rate_limit_enabled: bool = True
+    rate_limit_per_second: float = 1.0
+    rate_limit_burst: float = 30.0
+    rate_limit_shards: int = 16
+    # Only enable behind a proxy that sets X-Forwarded-For (e.g. the bundled Nginx)
+    rate_limit_trust_forwarded: bool = False
+    llm_token_quota_per_hour: int = 100_000
+    tts_char_quota_per_hour: int = 20_000
     
     # Bible AI Settings
     bible_versions: List[str] = ["KJV", "NIV", "ESV", "NLT"]
@@ -70,6 +186,85 @@ CORS_CONFIG = {
     "allow_headers": ["*"],
 }
 
+# Per-route request deadline budgets in seconds (longest matching prefix wins)
+ROUTE_DEADLINES = {
+    f"{settings.api_v1_prefix}/bible-chat": 30.0,
+    f"{settings.api_v1_prefix}/verses": 45.0,
+    f"{settings.api_v1_prefix}/stt": 60.0,
+    f"{settings.api_v1_prefix}/stt/voice_chat": 120.0,
+    f"{settings.api_v1_prefix}/stt/transcribe_long": 600.0,
+    f"{settings.api_v1_prefix}/audio": 60.0,
+    f"{settings.api_v1_prefix}/devotions": 45.0,
+    # Submitting returns at once, but the long-audio upload itself can take a while
+    f"{settings.api_v1_prefix}/jobs/transcribe_long": 600.0,
+}
+
+# Path prefixes recorded by the traffic capture middleware when capture_enabled is set
+CAPTURE_ROUTES = [
+    f"{settings.api_v1_prefix}/bible-chat/query",
+    f"{settings.api_v1_prefix}/verses",
+    f"{settings.api_v1_prefix}/stt",
+    f"{settings.api_v1_prefix}/audio",
+]
+
+# Background workers per job type (app/core/jobs.py); jobs_max_workers caps the total
+JOB_CONCURRENCY = {
+    "verses": 2,
+    "tts": 2,
+    "transcription": 1,
+}
+
+# Share of upstream slots each priority class gets when all are queued (app/core/scheduler.py)
+UPSTREAM_PRIORITY_WEIGHTS = {
+    "interactive": 8.0,
+    "batch": 2.0,
+    "prefetch": 1.0,
+}
+
+# Gateway routes whose model is picked per query by complexity (app/services/api_manager/model_router.py).
+# Borderline queries move to the fast model while the full model's p95 latency on the route is over
+# its SLO (judged once min_samples calls have been seen); fast_max_tokens caps the fast tier's answers
+MODEL_ROUTING = {
+    "bible_chat": {"slo_p95_seconds": 8.0, "min_samples": 50, "fast_max_tokens": 700},
+    "voice_chat": {"slo_p95_seconds": 4.0, "min_samples": 50, "fast_max_tokens": 400},
+}
+
+# USD per million (input, output) tokens, matched by longest model-name prefix, for cost budgets
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Request-bucket cost per route prefix (longest matching prefix wins; unlisted paths are free)
+RATE_LIMIT_COSTS = {
+    settings.api_v1_prefix: 1.0,
+    f"{settings.api_v1_prefix}/bible-chat/health": 0.0,
+    f"{settings.api_v1_prefix}/bible-chat/examples": 0.0,
+    f"{settings.api_v1_prefix}/bible-chat/query": 2.0,
+    f"{settings.api_v1_prefix}/verses": 5.0,
+    f"{settings.api_v1_prefix}/stt": 4.0,
+    f"{settings.api_v1_prefix}/stt/voice_chat": 6.0,
+    f"{settings.api_v1_prefix}/stt/transcribe_long": 15.0,
+    f"{settings.api_v1_prefix}/audio/generate": 4.0,
+    f"{settings.api_v1_prefix}/jobs/verses": 5.0,
+    f"{settings.api_v1_prefix}/jobs/tts": 8.0,
+    f"{settings.api_v1_prefix}/jobs/transcribe_long": 15.0,
+}
+
+# Upstream quotas a client must have credit in before a route is admitted
+ROUTE_QUOTAS = {
+    f"{settings.api_v1_prefix}/bible-chat/query": ("llm_tokens",),
+    f"{settings.api_v1_prefix}/verses": ("llm_tokens",),
+    f"{settings.api_v1_prefix}/stt/bible_ai_chat": ("llm_tokens",),
+    f"{settings.api_v1_prefix}/stt/voice_chat": ("llm_tokens", "tts_chars"),
+    f"{settings.api_v1_prefix}/audio/generate": ("tts_chars",),
+    f"{settings.api_v1_prefix}/jobs/verses": ("llm_tokens",),
+    f"{settings.api_v1_prefix}/jobs/tts": ("tts_chars",),
+}
+
 # Bible System Prompt
 BIBLE_SYSTEM_PROMPT = """
 You are a knowledgeable Bible assistant with expertise in multiple Bible versions (KJV, NIV, ESV, NLT).
@@ -109,3 +304,7 @@ Your role is to:
 1. Generate 15 random verses from various religious texts or inspiring sources.
 
 """
+
+
+# System prompt for structured JSON batch generation (verses and prayers)
+JSON_GENERATOR_SYSTEM_PROMPT = "You are a JSON generator. Return ONLY valid JSON arrays. No markdown. No explanations. Just valid JSON that starts with [ and ends with ]. No exceptions."
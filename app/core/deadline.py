@@ -0,0 +1,137 @@
+"""
+Per-request deadline budgets
+Each HTTP request gets an absolute deadline (from the X-Request-Timeout-Ms
+header or a per-route default) held in a context variable, so every upstream
+call made while serving it can size its own timeout from what is left, and
+is cancelled if it is still running when the deadline passes
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = b"x-request-timeout-ms"
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's time budget is used up before an upstream call"""
+
+
+def set_deadline(budget_seconds: float) -> contextvars.Token:
+    """Start a deadline budget_seconds from now for the current context"""
+    return _deadline.set(time.monotonic() + budget_seconds)
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None outside a request"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timeout_for(default: float) -> float:
+    """
+    Timeout for the next upstream call: the smaller of its default and the time left
+
+    Raises:
+        DeadlineExceeded: If the budget is already spent
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, left)
+
+
+@contextlib.asynccontextmanager
+async def within_deadline(upstream: str) -> AsyncIterator[None]:
+    """
+    Cancel the awaits in the block when the request deadline passes
+
+    timeout_for() only bounds each phase of an HTTP call (connect, every read),
+    so a reply that keeps trickling in can outlive the budget; this bounds the
+    whole block. Unbounded outside a request.
+
+    Raises:
+        DeadlineExceeded: If the budget is spent before or during the block
+    """
+    left = remaining()
+    if left is None:
+        yield
+        return
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    scope = asyncio.timeout(left)
+    try:
+        async with scope:
+            yield
+    except TimeoutError as e:
+        if not scope.expired():
+            raise
+        raise DeadlineExceeded(f"Request deadline exceeded waiting for {upstream}") from e
+
+
+async def iter_within_deadline(chunks: AsyncIterable[T], upstream: str) -> AsyncIterator[T]:
+    """Items of a streamed reply, each read bounded by within_deadline (the consumer's time between reads is not)"""
+    iterator = chunks.__aiter__()
+    while True:
+        async with within_deadline(upstream):
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+        yield item
+
+
+class DeadlineMiddleware:
+    """
+    Attach a deadline to every HTTP request
+
+    A client may shorten (never extend beyond max_seconds) its budget with the
+    X-Request-Timeout-Ms header; otherwise the longest matching route prefix
+    in route_budgets applies, falling back to default_seconds.
+    """
+
+    def __init__(self, app, default_seconds: float, max_seconds: float, route_budgets: Dict[str, float]):
+        self.app = app
+        self.default_seconds = default_seconds
+        self.max_seconds = max_seconds
+        # Longest prefix first so specific routes win over their parents
+        self.route_budgets = sorted(route_budgets.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _budget(self, scope) -> float:
+        for name, value in scope["headers"]:
+            if name == DEADLINE_HEADER:
+                try:
+                    return max(0.001, min(int(value) / 1000.0, self.max_seconds))
+                except ValueError:
+                    break
+
+        path = scope["path"]
+        for prefix, seconds in self.route_budgets:
+            if path.startswith(prefix):
+                return seconds
+        return self.default_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = set_deadline(self._budget(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,86 @@
+"""
+Hedged requests for tail-latency control
+When a call runs past a latency threshold (typically a recent p95), a
+duplicate is sent and whichever finishes first wins; the other is cancelled.
+A budget caps hedges to a fraction of primary requests so a slow upstream
+is never hit with double the traffic.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+
+class HedgeBudget:
+    """
+    Token bucket that earns `ratio` tokens per primary request and spends one per hedge
+
+    With ratio=0.05 at most ~5% of requests are hedged over time; burst bounds
+    how many hedges can fire back to back after a quiet period.
+    """
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def record_request(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+async def hedged_call(
+    request: Callable[[], Awaitable[Any]],
+    hedge_after: Optional[float],
+    budget: HedgeBudget,
+    on_hedge: Callable[[], None] = lambda: None,
+    on_hedge_win: Callable[[], None] = lambda: None
+) -> Any:
+    """
+    Await request(), sending one duplicate if it is still running after hedge_after seconds
+
+    Args:
+        request: Factory returning a fresh awaitable for each attempt; must be idempotent
+        hedge_after: Delay before hedging, or None to never hedge
+        budget: Shared hedge budget
+        on_hedge: Called when a hedge is sent
+        on_hedge_win: Called when the hedge finishes before the primary
+
+    Returns:
+        The first successful result; if both attempts fail, the primary's error is raised
+    """
+    budget.record_request()
+    if hedge_after is None:
+        return await request()
+
+    primary = asyncio.ensure_future(request())
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done or not budget.try_spend():
+            return await primary
+
+        on_hedge()
+        backup = asyncio.ensure_future(request())
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception():
+                        if task is backup:
+                            on_hedge_win()
+                        return task.result()
+            # Both failed
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if not backup.done():
+                backup.cancel()
+    finally:
+        if not primary.done():
+            primary.cancel()
@@ -0,0 +1,419 @@
+"""
+Persistent background jobs
+A SQLite-backed job queue with a bounded pool of async workers, separate
+concurrency limits per job type, idempotency keys, and change notifications
+for status streaming. Jobs left running by a restart are picked up again.
+
+One process owns the queue: run the app with a single worker process (as the
+Dockerfile does), or point each process at its own jobs_db_path.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import metrics
+from app.core.rate_limit import bind_clients, reset_clients
+from app.core.scheduler import BATCH, upstream_priority
+from app.core.tracing import trace
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+_submitted = metrics.counter("jobs_submitted_total", "Jobs accepted, by type")
+_finished = metrics.counter("jobs_finished_total", "Jobs finished, by type and status")
+_wait = metrics.histogram("job_queue_wait_seconds", "Time from submission (or recovery) to start, by type")
+_run = metrics.histogram("job_run_seconds", "Job execution time, by type")
+_running = metrics.gauge("jobs_running", "Jobs currently executing, by type")
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused with different parameters"""
+
+
+@dataclass
+class Job:
+    id: str
+    type: str
+    status: str
+    params: Dict[str, Any]
+    created_at: float
+    idempotency_key: Optional[str] = None
+    clients: List[str] = field(default_factory=list)
+    attempts: int = 0
+    progress: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def public(self) -> Dict[str, Any]:
+        """The fields clients may see"""
+        data = asdict(self)
+        for private in ("clients", "params", "idempotency_key"):
+            del data[private]
+        return data
+
+
+# Handlers get the job and a progress callback (0.0-1.0) and return a JSON-serialisable result
+JobHandler = Callable[[Job, Callable[[float], None]], Awaitable[Dict[str, Any]]]
+
+_COLUMNS = (
+    "id", "type", "status", "params", "created_at", "idempotency_key", "clients", "attempts",
+    "progress", "result", "error", "started_at", "finished_at"
+)
+_JSON_COLUMNS = ("params", "clients", "result")
+
+
+class JobStore:
+    """The jobs table; calls block and are run in a worker thread"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, type TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+                "created_at REAL NOT NULL, idempotency_key TEXT, clients TEXT NOT NULL, attempts INTEGER NOT NULL, "
+                "progress REAL NOT NULL, result TEXT, error TEXT, started_at REAL, finished_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs (type, idempotency_key) "
+                "WHERE idempotency_key IS NOT NULL"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @staticmethod
+    def _row(row) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            if values[column] is not None:
+                values[column] = json.loads(values[column])
+        return Job(**values)
+
+    def insert(self, job: Job) -> Tuple[Job, bool]:
+        """
+        Insert a job unless one with the same type and idempotency key exists
+
+        Returns:
+            The stored job and whether it was newly created
+        """
+        values = asdict(job)
+        for column in _JSON_COLUMNS:
+            if values[column] is not None:
+                values[column] = json.dumps(values[column])
+        with self._lock, self._conn:
+            if job.idempotency_key is not None:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE type = ? AND idempotency_key = ?",
+                    (job.type, job.idempotency_key)
+                ).fetchone()
+                if row:
+                    return self._row(row), False
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(values[column] for column in _COLUMNS)
+            )
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        for column in _JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column])
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def unfinished(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def delete_finished_before(self, cutoff: float) -> List[str]:
+        with self._lock, self._conn:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (SUCCEEDED, FAILED, cutoff)
+            )]
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        return ids
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs registered job types on a bounded pool of async workers
+
+    Each type has its own in-memory queue and worker count; a global
+    semaphore caps how many jobs of any type run at once. SQLite is the
+    source of truth, so on start every queued job (and any job a restart
+    interrupted) is queued again.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        artifact_dir: str,
+        max_workers: int,
+        concurrency: Dict[str, int],
+        retention_seconds: float,
+        max_attempts: int = 2
+    ):
+        """
+        Args:
+            db_path: SQLite database file
+            artifact_dir: Directory for job inputs and outputs (one subdirectory per job)
+            max_workers: Jobs running at once across all types
+            concurrency: Workers per job type
+            retention_seconds: How long finished jobs and their artifacts are kept
+            max_attempts: Runs a job gets before one interrupted by restarts is failed
+        """
+        self.db_path = db_path
+        self.artifact_dir = artifact_dir
+        self.concurrency = concurrency
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self._slots = asyncio.Semaphore(max_workers)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._enqueued_at: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._store: Optional[JobStore] = None
+
+    def register(self, job_type: str, handler: JobHandler):
+        if job_type not in self.concurrency:
+            raise ValueError(f"No concurrency limit configured for job type {job_type}")
+        self._handlers[job_type] = handler
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            raise RuntimeError("Job queue is not started")
+        return self._store
+
+    def artifact_path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.artifact_dir, job_id, name)
+
+    async def start(self):
+        if self._store is not None:
+            return
+        self._store = await asyncio.to_thread(JobStore, self.db_path)
+        for job_type in self._handlers:
+            self._queues[job_type] = asyncio.Queue()
+            self._tasks += [asyncio.create_task(self._worker(job_type)) for _ in range(self.concurrency[job_type])]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+        recovered = 0
+        for job in await asyncio.to_thread(self.store.unfinished):
+            if job.type not in self._handlers:
+                continue
+            if job.status == RUNNING and job.attempts >= self.max_attempts:
+                await self._finish(job, FAILED, error="Interrupted by restarts too many times")
+                continue
+            if job.status == RUNNING:
+                await asyncio.to_thread(self.store.update, job.id, status=QUEUED)
+            self._enqueue(job)
+            recovered += 1
+        if recovered:
+            logger.info(f"Re-queued {recovered} unfinished jobs")
+
+    async def stop(self):
+        # Jobs cut off here stay "running" in SQLite and are re-queued on the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def _enqueue(self, job: Job):
+        self._enqueued_at[job.id] = time.monotonic()
+        self._queues[job.type].put_nowait(job.id)
+
+    async def submit(
+        self,
+        job_type: str,
+        params: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+        clients: Tuple[str, ...] = (),
+        attachment: Optional[BinaryIO] = None
+    ) -> Tuple[Job, bool]:
+        """
+        Persist and queue a job, or return the existing one for a reused idempotency key
+
+        Args:
+            job_type: A registered job type
+            params: JSON-serialisable handler input
+            idempotency_key: Client-chosen key; resubmitting it returns the original job
+            clients: Rate-limit identities the job's upstream usage is charged to
+            attachment: Input file copied to artifact_path(job.id, "input") before the job is stored
+
+        Returns:
+            The job and whether it was newly created
+
+        Raises:
+            IdempotencyConflict: If the key was used before with different parameters
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = Job(
+            id=uuid.uuid4().hex, type=job_type, status=QUEUED, params=params, created_at=time.time(),
+            idempotency_key=idempotency_key, clients=list(clients)
+        )
+        # Write the input before the row exists: a restart must never recover a queued job without it
+        created = False
+        if attachment is not None:
+            await asyncio.to_thread(self._save_attachment, job.id, attachment)
+        try:
+            stored, created = await asyncio.to_thread(self.store.insert, job)
+        finally:
+            if attachment is not None and not created:
+                await asyncio.to_thread(shutil.rmtree, os.path.join(self.artifact_dir, job.id), True)
+        if not created:
+            if stored.params != params:
+                raise IdempotencyConflict("Idempotency key was already used with different parameters")
+            return stored, False
+
+        _submitted.inc(type=job_type)
+        self._enqueue(job)
+        return job, True
+
+    def _save_attachment(self, job_id: str, attachment: BinaryIO):
+        os.makedirs(os.path.join(self.artifact_dir, job_id), exist_ok=True)
+        attachment.seek(0)
+        with open(self.artifact_path(job_id, "input"), "wb") as f:
+            shutil.copyfileobj(attachment, f, 1024 * 1024)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def watch(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Job]:
+        """Yield the job now, after every change, and every `heartbeat` seconds, until it finishes"""
+        while True:
+            # Subscribe before reading so a change between the two isn't missed
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job.status in TERMINAL:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                pass
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _finish(self, job: Job, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        await asyncio.to_thread(
+            self.store.update, job.id, status=status, result=result, error=error,
+            progress=1.0 if status == SUCCEEDED else job.progress, finished_at=time.time()
+        )
+        _finished.inc(type=job.type, status=status)
+        self._notify(job.id)
+
+    async def _worker(self, job_type: str):
+        queue = self._queues[job_type]
+        while True:
+            job_id = await queue.get()
+            async with self._slots:
+                await self._run(job_type, job_id)
+
+    async def _run(self, job_type: str, job_id: str):
+        job = await self.get(job_id)
+        if job is None or job.status != QUEUED:
+            return
+        _wait.observe(time.monotonic() - self._enqueued_at.pop(job_id, time.monotonic()), type=job_type)
+
+        job.attempts += 1
+        await asyncio.to_thread(self.store.update, job.id, status=RUNNING, attempts=job.attempts, started_at=time.time())
+        self._notify(job.id)
+
+        # At most one progress write in flight; updates made meanwhile are coalesced into the next
+        writer: Optional[asyncio.Task] = None
+
+        async def write_progress():
+            written = None
+            while written != job.progress:
+                written = job.progress
+                try:
+                    await asyncio.to_thread(self.store.update, job.id, progress=written)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not record progress for job {job.id}: {e}")
+                    return
+                self._notify(job.id)
+
+        def progress(fraction: float):
+            nonlocal writer
+            job.progress = max(0.0, min(1.0, fraction))
+            if writer is None or writer.done():
+                writer = asyncio.create_task(write_progress())
+
+        started = time.perf_counter()
+        token = bind_clients(tuple(job.clients))
+        _running.inc(1, type=job_type)
+        try:
+            # Upstream calls made for jobs queue behind interactive requests
+            with trace(f"job {job_type}", **{"job.id": job.id, "job.type": job_type, "job.attempt": job.attempts}), \
+                    upstream_priority(BATCH):
+                try:
+                    result = await self._handlers[job_type](job, progress)
+                finally:
+                    # Let the last progress write land before the final status is stored
+                    if writer is not None:
+                        await asyncio.wait((writer,))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job_type}) failed: {e}", exc_info=True)
+            await self._finish(job, FAILED, error=str(e) or type(e).__name__)
+        else:
+            await self._finish(job, SUCCEEDED, result=result)
+        finally:
+            _running.inc(-1, type=job_type)
+            reset_clients(token)
+            _run.observe(time.perf_counter() - started, type=job_type)
+
+    async def _sweep(self, interval: float = 3600.0):
+        while True:
+            try:
+                for job_id in await asyncio.to_thread(self.store.delete_finished_before, time.time() - self.retention_seconds):
+                    await asyncio.to_thread(shutil.rmtree, os.path.join(self.artifact_dir, job_id), True)
+            except Exception as e:
+                logger.error(f"Job retention sweep failed: {e}")
+            await asyncio.sleep(interval)
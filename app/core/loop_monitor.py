@@ -0,0 +1,42 @@
+"""
+Event-loop lag monitor
+A background task that sleeps for a fixed interval and records how late it
+wakes up; sustained lag means something is blocking the loop
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core.metrics import metrics
+
+_lag = metrics.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a fixed-interval probe",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            _lag.observe(max(0.0, time.perf_counter() - expected))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
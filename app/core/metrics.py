@@ -0,0 +1,160 @@
+"""
+In-process metrics
+Labelled counters and histograms with Prometheus text exposition, kept
+dependency-free so they cost a dict lookup on the hot path
+"""
+
+import bisect
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {_format_labels(key) or "total": value for key, value in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, **labels):
+        self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class _Series:
+    __slots__ = ("counts", "total", "count", "recent")
+
+    def __init__(self, buckets: int, window: int):
+        self.counts = [0] * (buckets + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+
+class Histogram:
+    """
+    Bucketed histogram that also keeps a sliding window of recent samples,
+    so callers can ask for live percentiles (e.g. to decide when to hedge)
+    """
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 512):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.window = window
+        self._series: Dict[LabelKey, _Series] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(len(self.buckets), self.window)
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.total += value
+        series.count += 1
+        series.recent.append(value)
+
+    def percentile(self, q: float, **labels):
+        """q-th percentile (0-100) of the recent window, or None without samples"""
+        series = self._series.get(_label_key(labels))
+        if series is None or not series.recent:
+            return None
+        ordered = sorted(series.recent)
+        index = min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def sample_count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return len(series.recent) if series else 0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for key, series in self._series.items():
+            result[_format_labels(key) or "total"] = {
+                "count": series.count,
+                "sum": round(series.total, 6),
+                "p50": self.percentile(50, **dict(key)),
+                "p95": self.percentile(95, **dict(key)),
+                "p99": self.percentile(99, **dict(key)),
+            }
+        return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series.total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, description, **kwargs)
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, description, **kwargs)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
@@ -0,0 +1,147 @@
+"""
+Lightweight ASGI middleware shared across services
+"""
+
+import json
+from typing import Dict, Tuple
+
+from app.core.responses import compress, negotiate_encoding
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized uploads from their Content-Length header before the body is read
+
+    Multipart parsing happens before a route handler runs, so a size check inside
+    the handler only fires after the whole body has been received and spooled.
+    This rejects the obvious cases up front with a 413.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: The wrapped ASGI application
+            limits: Map of path prefix to maximum request body size in bytes
+        """
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            path = scope["path"]
+            for prefix, limit in self.limits.items():
+                if path.startswith(prefix):
+                    content_length = self._content_length(scope)
+                    if content_length is not None and content_length > limit:
+                        await self._reject(send, limit)
+                        return
+                    break
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _content_length(scope):
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({
+            "detail": f"File too large: request body exceeds {limit / (1024 * 1024):.0f}MB limit"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class CompressionMiddleware:
+    """
+    Compress buffered JSON responses with brotli or gzip, as the client prefers
+
+    Only responses sent in a single body message are compressed. Streaming
+    responses (SSE, audio) arrive in many messages and pass through unchanged,
+    so compression never delays a flush. Responses that already carry a
+    Content-Encoding, such as precomputed static payloads, are also left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, media_types: Tuple[str, ...] = ("application/json",)):
+        """
+        Args:
+            app: The wrapped ASGI application
+            minimum_size: Bodies smaller than this many bytes are sent uncompressed
+            media_types: Content-Type prefixes eligible for compression
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.media_types = tuple(media_type.encode() for media_type in media_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or not content_type.startswith(self.media_types):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            body = message.get("body", b"")
+            passthrough = True
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers = []
+            vary = [b"Accept-Encoding"]
+            for name, value in start_message.get("headers", []):
+                if name == b"vary":
+                    vary.insert(0, value)
+                elif name != b"content-length":
+                    headers.append((name, value))
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join(vary)),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,174 @@
+"""
+On-demand request profiling
+A request carrying X-Debug-Profile with the configured token is sampled by a
+background thread that snapshots the event-loop thread's Python stack at a
+fixed interval until the response completes. The stacks are kept in memory
+in collapsed format (one "frame;frame;frame count" line per stack), ready for
+flamegraph.pl, speedscope or inferno
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-debug-profile"
+
+_CWD = os.getcwd() + os.sep
+
+
+def _frame_label(code, labels: Dict[object, str]) -> str:
+    label = labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(_CWD):
+            filename = filename[len(_CWD):]
+        elif "site-packages" + os.sep in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        else:
+            filename = os.path.basename(filename)
+        label = labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+    return label
+
+
+@dataclass
+class Profile:
+    """Stacks sampled while one request was served"""
+    id: str
+    method: str
+    path: str
+    started_at: float
+    interval: float
+    duration: float = 0.0
+    trace_id: Optional[str] = None
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """The sampler thread for one profiled request"""
+
+    def __init__(self, profile: Profile, loop_thread: int, max_seconds: float, on_finish: Callable[["ProfileSession"], None]):
+        self.profile = profile
+        self.on_finish = on_finish
+        self.loop_thread = loop_thread
+        self.max_seconds = max_seconds
+        self._loop = asyncio.get_running_loop()
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{profile.id[:8]}", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        labels: Dict[object, str] = {}
+        stacks = self.profile.stacks
+        deadline = self._started + self.max_seconds
+        while not self._stop.wait(self.profile.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.loop_thread)
+            names: List[str] = []
+            while frame is not None:
+                names.append(_frame_label(frame.f_code, labels))
+                frame = frame.f_back
+            if names:
+                stacks[";".join(reversed(names))] += 1
+        # Past max_seconds, keep the profile back until the response completes
+        self._stop.wait()
+        try:
+            # on_finish runs on the loop thread, which owns the profiler's state
+            self._loop.call_soon_threadsafe(self.on_finish, self)
+        except RuntimeError:
+            pass  # The loop has closed
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        return [(b"x-profile-id", self.profile.id.encode())]
+
+    def finish(self, trace_id: Optional[str]):
+        """
+        Stop sampling once the response is complete
+
+        Never blocks the loop: the sampler thread hands the profile back
+        through on_finish once it has taken its last sample.
+        """
+        self.profile.duration = time.perf_counter() - self._started
+        self.profile.trace_id = trace_id
+        self._stop.set()
+
+
+class RequestProfiler:
+    """
+    Profiles requests that ask for it, one at a time
+
+    Profiling is off unless a token is configured; the per-request cost is
+    then a single attribute check. The loop thread runs every request, so
+    samples taken while others are in flight include their work too.
+    """
+
+    def __init__(self, token: Optional[str], interval: float, max_seconds: float, kept: int):
+        """
+        Args:
+            token: Shared secret the X-Debug-Profile header must carry; None disables profiling
+            interval: Seconds between samples
+            max_seconds: Longest a single request is sampled for
+            kept: Finished profiles kept for download
+        """
+        self.token = token
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.kept = kept
+        self._active: Optional[ProfileSession] = None
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def authorized(self, value: Optional[str]) -> bool:
+        return bool(self.token) and value is not None and hmac.compare_digest(value.encode(), self.token.encode())
+
+    def begin(self, scope) -> Optional[ProfileSession]:
+        """Start sampling if the request asked for it with the right token"""
+        if not self.token:
+            return None
+        value = None
+        for name, header in scope["headers"]:
+            if name == PROFILE_HEADER:
+                value = header.decode("latin-1")
+                break
+        if value is None or not self.authorized(value):
+            return None
+        if self._active is not None:
+            logger.warning(f"Profile requested for {scope['path']} while another is running; not profiled")
+            return None
+
+        profile = Profile(
+            id=uuid.uuid4().hex, method=scope["method"], path=scope["path"],
+            started_at=time.time(), interval=self.interval
+        )
+        self._active = ProfileSession(profile, threading.get_ident(), self.max_seconds, self._keep)
+        return self._active
+
+    def _keep(self, session: ProfileSession):
+        self._profiles[session.profile.id] = session.profile
+        while len(self._profiles) > self.kept:
+            self._profiles.popitem(last=False)
+        if self._active is session:
+            self._active = None
+        logger.info(
+            f"Profiled {session.profile.method} {session.profile.path}: {session.profile.samples} samples "
+            f"over {session.profile.duration:.3f}s (profile {session.profile.id})"
+        )
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
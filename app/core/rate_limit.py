@@ -0,0 +1,269 @@
+"""
+Per-client rate limiting and upstream quotas
+Token buckets keyed by client IP and API key: one table meters requests
+(weighted by route cost), others meter the LLM tokens and TTS characters each
+client consumes upstream. Usage is charged where it happens via a context
+variable naming the current request's clients.
+"""
+
+import contextvars
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings, RATE_LIMIT_COSTS, ROUTE_QUOTAS
+from app.core.metrics import metrics
+
+API_KEY_HEADER = b"x-api-key"
+FORWARDED_HEADER = b"x-forwarded-for"
+
+_clients: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("rate_limit_clients", default=())
+_limited = metrics.counter("rate_limited_total", "Requests rejected with 429, by exhausted resource")
+
+
+class TokenBucketTable:
+    """
+    Token buckets keyed by client, split across shards
+
+    A bucket is a two-item list [tokens, last_update]; clients never seen are
+    treated as full. Buckets that have refilled completely are indistinguishable
+    from absent ones, so one shard at a time is swept of them every
+    `sweep_every` operations, keeping memory bounded without a full scan.
+    """
+
+    def __init__(self, rate: float, burst: float, shards: int = 16, sweep_every: int = 1024):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+            shards: Number of dicts buckets are spread across
+            sweep_every: Operations between sweeps of the next shard
+        """
+        self.rate = rate
+        self.burst = burst
+        self.sweep_every = sweep_every
+        self._shards: List[Dict[str, list]] = [{} for _ in range(shards)]
+        self._ops = 0
+        self._next_sweep = 0
+
+    def _shard(self, key: str) -> Dict[str, list]:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _tokens(self, shard: Dict[str, list], key: str, now: float) -> float:
+        bucket = shard.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def take(self, keys: Iterable[str], cost: float, now: float) -> float:
+        """
+        Take `cost` tokens from every key's bucket, or from none of them
+
+        Returns:
+            0.0 if taken, otherwise seconds until all buckets could afford it
+        """
+        cost = min(cost, self.burst)
+        entries = []
+        wait = 0.0
+        for key in keys:
+            shard = self._shard(key)
+            tokens = self._tokens(shard, key, now)
+            entries.append((shard, key, tokens))
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / self.rate)
+        if wait == 0.0:
+            for shard, key, tokens in entries:
+                shard[key] = [tokens - cost, now]
+        self._maybe_sweep(now)
+        return wait
+
+    def wait_for_credit(self, keys: Iterable[str], now: float) -> float:
+        """Seconds until every key's balance is positive again (0.0 if it already is)"""
+        wait = 0.0
+        for key in keys:
+            tokens = self._tokens(self._shard(key), key, now)
+            if tokens <= 0:
+                wait = max(wait, -tokens / self.rate + 1.0 / self.rate)
+        return wait
+
+    def charge(self, keys: Iterable[str], amount: float, now: float):
+        """Deduct usage after the fact; balances may go negative (debt is repaid by refill)"""
+        for key in keys:
+            shard = self._shard(key)
+            shard[key] = [self._tokens(shard, key, now) - amount, now]
+        self._maybe_sweep(now)
+
+    def _maybe_sweep(self, now: float):
+        self._ops += 1
+        if self._ops < self.sweep_every:
+            return
+        self._ops = 0
+        shard = self._shards[self._next_sweep]
+        self._next_sweep = (self._next_sweep + 1) % len(self._shards)
+        for key in [key for key, (tokens, last) in shard.items() if tokens + (now - last) * self.rate >= self.burst]:
+            del shard[key]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class RateLimiter:
+    """Request buckets plus per-resource quota buckets, and the route tables that apply them"""
+
+    def __init__(self):
+        shards = settings.rate_limit_shards
+        self.requests = TokenBucketTable(settings.rate_limit_per_second, settings.rate_limit_burst, shards)
+        self.quotas: Dict[str, TokenBucketTable] = {
+            "llm_tokens": TokenBucketTable(
+                settings.llm_token_quota_per_hour / 3600.0, settings.llm_token_quota_per_hour, shards
+            ),
+            "tts_chars": TokenBucketTable(
+                settings.tts_char_quota_per_hour / 3600.0, settings.tts_char_quota_per_hour, shards
+            ),
+        }
+        # Longest prefix first so specific routes win over their parents
+        self.costs = sorted(RATE_LIMIT_COSTS.items(), key=lambda item: len(item[0]), reverse=True)
+        self.route_quotas = sorted(ROUTE_QUOTAS.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def cost(self, path: str) -> float:
+        for prefix, cost in self.costs:
+            if path.startswith(prefix):
+                return cost
+        return 0.0
+
+    def quotas_for(self, path: str) -> Tuple[str, ...]:
+        for prefix, quotas in self.route_quotas:
+            if path.startswith(prefix):
+                return quotas
+        return ()
+
+    def check(self, clients: Tuple[str, ...], path: str, now: float) -> Optional[Tuple[str, float]]:
+        """
+        Admit or reject one request
+
+        Returns:
+            None if admitted, otherwise (exhausted resource, seconds to wait)
+        """
+        for quota in self.quotas_for(path):
+            wait = self.quotas[quota].wait_for_credit(clients, now)
+            if wait:
+                return quota, wait
+        cost = self.cost(path)
+        if cost:
+            wait = self.requests.take(clients, cost, now)
+            if wait:
+                return "requests", wait
+        return None
+
+
+rate_limiter = RateLimiter()
+
+
+def current_clients() -> Tuple[str, ...]:
+    """Rate-limit identities of the request being served (empty outside a request)"""
+    return _clients.get()
+
+
+def bind_clients(clients: Tuple[str, ...]) -> contextvars.Token:
+    """Charge usage in the current context to these clients (e.g. a background job's submitter)"""
+    return _clients.set(clients)
+
+
+def reset_clients(token: contextvars.Token):
+    _clients.reset(token)
+
+
+def charge_quota(resource: str, amount: float):
+    """
+    Charge upstream usage to the clients of the current request
+
+    A no-op outside a rate-limited request (background work, scripts).
+
+    Args:
+        resource: "llm_tokens" or "tts_chars"
+        amount: Tokens or characters consumed
+    """
+    clients = _clients.get()
+    if clients and amount > 0:
+        rate_limiter.quotas[resource].charge(clients, amount, time.monotonic())
+
+
+class RateLimitMiddleware:
+    """
+    Enforce rate limits and quotas before a request reaches its route
+
+    Every client is identified by IP ("ip:...") and, if it sends X-API-Key,
+    also by key ("key:..."). Both identities must have room, so rotating
+    keys does not escape the per-IP limit. Rejected HTTP requests get a 429
+    with Retry-After; rejected WebSocket handshakes are closed with 1008.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter, trust_forwarded: bool = False):
+        """
+        Args:
+            app: The wrapped ASGI application
+            limiter: Bucket tables and route costs
+            trust_forwarded: Take the client IP from X-Forwarded-For (only behind a trusted proxy)
+        """
+        self.app = app
+        self.limiter = limiter
+        self.trust_forwarded = trust_forwarded
+
+    def _clients(self, scope) -> Tuple[str, ...]:
+        ip = scope["client"][0] if scope.get("client") else "unknown"
+        key = None
+        for name, value in scope["headers"]:
+            if name == API_KEY_HEADER:
+                key = value[:128].decode("latin-1")
+            elif name == FORWARDED_HEADER and self.trust_forwarded:
+                ip = value.split(b",", 1)[0].strip().decode("latin-1")
+        return (f"ip:{ip}", f"key:{key}") if key else (f"ip:{ip}",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        clients = self._clients(scope)
+        rejected = self.limiter.check(clients, scope["path"], time.monotonic())
+        if rejected:
+            resource, wait = rejected
+            _limited.inc(resource=resource)
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1008})
+            else:
+                await self._reject(send, resource, wait)
+            return
+
+        token = bind_clients(clients)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_clients(token)
+
+    @staticmethod
+    async def _reject(send, resource: str, wait: float):
+        retry_after = str(max(1, math.ceil(wait)))
+        message = {
+            "requests": "Too many requests. Please slow down and try again shortly.",
+            "llm_tokens": "AI usage quota exhausted for now. Please try again later.",
+            "tts_chars": "Audio generation quota exhausted for now. Please try again later.",
+        }[resource]
+        body = json.dumps({
+            "success": False,
+            "error": "Rate limit exceeded",
+            "limit": resource,
+            "message": message,
+            "retry_after": int(retry_after)
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,122 @@
+"""
+Response encoding helpers
+The default JSON response class (orjson when installed), content-encoding
+negotiation, and responses whose bodies are serialized and compressed once
+"""
+
+import gzip
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse, Response
+from starlette.requests import Request
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:  # pragma: no cover - stdlib json fallback
+    orjson = None
+    DefaultJSONResponse = JSONResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON exactly as DefaultJSONResponse would"""
+    return DefaultJSONResponse(content).body
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best content-coding the client accepts
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        "br", "gzip", or None for identity
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class PrecomputedResponse:
+    """
+    A fixed JSON payload serialized, hashed and compressed once
+
+    Serving it is a header lookup plus a bytes copy: a matching If-None-Match
+    gets a 304, otherwise the best encoding the client accepts is returned.
+    """
+
+    def __init__(self, content: Any, status_code: int = 200, max_age: Optional[int] = None, minimum_size: int = 512):
+        """
+        Args:
+            content: JSON-serialisable payload
+            status_code: Status for full responses
+            max_age: Cache-Control max-age in seconds; None means clients must revalidate
+            minimum_size: Bodies smaller than this are never compressed
+        """
+        self.status_code = status_code
+        self.bodies: Dict[Optional[str], bytes] = {None: dumps(content)}
+        self.etag = f'W/"{hashlib.sha256(self.bodies[None]).hexdigest()[:32]}"'
+        self.cache_control = f"public, max-age={max_age}" if max_age is not None else "no-cache"
+        if len(self.bodies[None]) >= minimum_size:
+            self.bodies["gzip"] = compress(self.bodies[None], "gzip")
+            if brotli is not None:
+                self.bodies["br"] = compress(self.bodies[None], "br")
+
+    def __call__(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if self.status_code == 200 and if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding not in self.bodies:
+            encoding = None
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        return Response(
+            content=self.bodies[encoding],
+            status_code=self.status_code,
+            media_type="application/json",
+            headers=headers
+        )
+
+    def _matches(self, if_none_match: str) -> bool:
+        # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+        if if_none_match.strip() == "*":
+            return True
+        tag = self.etag[2:]
+        return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
@@ -0,0 +1,159 @@
+"""
+Priority scheduling for shared upstream capacity
+Every call to an upstream (OpenAI, ElevenLabs) holds a slot from that
+upstream's scheduler while it runs. When all slots are busy, callers queue
+by priority class and are admitted by weighted fair queueing: interactive
+requests overtake batch and prefetch work, which still keeps a share of
+the slots in proportion to its weight and so always makes progress.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from app.core.config import settings, UPSTREAM_PRIORITY_WEIGHTS
+from app.core.deadline import DeadlineExceeded, remaining
+from app.core.metrics import metrics
+
+# Priority classes
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PREFETCH = "prefetch"
+
+_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("upstream_priority", default=None)
+
+_wait = metrics.histogram(
+    "upstream_queue_wait_seconds", "Time calls waited for an upstream slot, by upstream and priority",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+_depth = metrics.gauge("upstream_queue_depth", "Calls waiting for an upstream slot, by upstream and priority")
+_in_flight = metrics.gauge("upstream_in_flight", "Upstream calls holding a slot, by upstream")
+_expired = metrics.counter(
+    "upstream_queue_expired_total", "Calls whose request deadline ran out while queued, by upstream and priority"
+)
+
+
+def current_priority(default: str = INTERACTIVE) -> str:
+    """The priority set for the current context by upstream_priority(), else `default`"""
+    return _priority.get() or default
+
+
+@contextlib.contextmanager
+def upstream_priority(priority: str) -> Iterator[None]:
+    """Run upstream calls made inside the block (and tasks it starts) at `priority`"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "tag")
+
+    def __init__(self, future: asyncio.Future, priority: str, tag: float):
+        self.future = future
+        self.priority = priority
+        self.tag = tag
+
+
+class UpstreamScheduler:
+    """
+    A fixed number of slots for calls to one upstream, shared by priority classes
+
+    Queued callers are ordered by self-clocked fair queueing: each gets a
+    virtual finish tag of max(now, its class's last tag) + 1/weight, and the
+    smallest tag is admitted next. With weights 8:2:1, a backlog of all
+    three classes is served in that ratio, and a lone interactive call
+    waits behind at most the batch work already tagged ahead of it.
+    """
+
+    def __init__(self, name: str, capacity: int, weights: Dict[str, float]):
+        """
+        Args:
+            name: Upstream label for metrics
+            capacity: Calls allowed in flight at once
+            weights: Relative share of slots per priority class
+        """
+        self.name = name
+        self.capacity = capacity
+        self.weights = weights
+        self._in_use = 0
+        self._waiting = 0
+        self._queues: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in weights}
+        self._last_tag: Dict[str, float] = {priority: 0.0 for priority in weights}
+        self._virtual_time = 0.0
+
+    async def acquire(self, priority: str):
+        """
+        Wait for a slot; pair every successful call with release()
+
+        Raises:
+            DeadlineExceeded: If the request deadline runs out while queued
+        """
+        queue = self._queues[priority]
+        if self._in_use < self.capacity and not self._waiting:
+            self._in_use += 1
+            _in_flight.set(self._in_use, upstream=self.name)
+            _wait.observe(0.0, upstream=self.name, priority=priority)
+            return
+
+        tag = max(self._virtual_time, self._last_tag[priority]) + 1.0 / self.weights[priority]
+        self._last_tag[priority] = tag
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority, tag)
+        queue.append(waiter)
+        self._waiting += 1
+        _depth.inc(1, upstream=self.name, priority=priority)
+        started = time.monotonic()
+        try:
+            done, _ = await asyncio.wait((waiter.future,), timeout=remaining())
+            if not done:
+                _expired.inc(upstream=self.name, priority=priority)
+                raise DeadlineExceeded(f"Request deadline exceeded waiting for {self.name} capacity")
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we gave up; hand the slot on
+                self.release()
+            else:
+                waiter.future.cancel()
+                queue.remove(waiter)
+                self._waiting -= 1
+                _depth.inc(-1, upstream=self.name, priority=priority)
+            raise
+        finally:
+            _wait.observe(time.monotonic() - started, upstream=self.name, priority=priority)
+
+    def release(self):
+        self._in_use -= 1
+        while self._waiting and self._in_use < self.capacity:
+            waiter = min((queue[0] for queue in self._queues.values() if queue), key=lambda head: head.tag)
+            self._queues[waiter.priority].popleft()
+            self._waiting -= 1
+            _depth.inc(-1, upstream=self.name, priority=waiter.priority)
+            self._virtual_time = waiter.tag
+            self._in_use += 1
+            waiter.future.set_result(None)
+        _in_flight.set(self._in_use, upstream=self.name)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold a slot for the block, at `priority` or else the context's priority (default interactive)"""
+        await self.acquire(priority or current_priority())
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self._in_use,
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+        }
+
+
+openai_scheduler = UpstreamScheduler("openai", settings.openai_max_concurrency, UPSTREAM_PRIORITY_WEIGHTS)
+elevenlabs_scheduler = UpstreamScheduler("elevenlabs", settings.elevenlabs_max_concurrency, UPSTREAM_PRIORITY_WEIGHTS)
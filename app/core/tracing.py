@@ -0,0 +1,365 @@
+"""
+Request tracing
+Spans around upstream calls and pipeline stages, linked per request through a
+context variable and written when the request's root span ends as one
+OTLP/JSON ExportTraceServiceRequest per log line, so a collector's file
+receiver (or jq) can read them as-is. Finished traces are handed to a
+queue; serialising and writing them happens on a listener thread.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+TRACEPARENT_HEADER = b"traceparent"
+TRACE_ID_HEADER = b"x-trace-id"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+_RESOURCE = {"attributes": [
+    {"key": "service.name", "value": {"stringValue": settings.app_name}},
+    {"key": "service.version", "value": {"stringValue": settings.app_version}},
+    {"key": "deployment.environment", "value": {"stringValue": settings.environment}},
+]}
+_SCOPE = {"name": "app.core.tracing"}
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _Trace:
+    """Spans of one trace awaiting export; flushed together when the root span ends"""
+    __slots__ = ("trace_id", "spans", "exported")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Dict[str, Any]] = []
+        self.exported = False
+
+
+class Span:
+    """One timed operation; attributes may be added until it ends"""
+    __slots__ = (
+        "name", "kind", "trace", "span_id", "parent_id", "root", "start_ns", "attributes", "status", "message", "_token"
+    )
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.root = False
+        self.start_ns = time.time_ns()
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.message = ""
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.fail(exc)
+        _current.reset(self._token)
+        self.end()
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.message = f"{type(error).__name__}: {error}"[:500]
+
+    def end(self):
+        record = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(time.time_ns()),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in self.attributes.items() if value is not None
+            ],
+            "status": {"code": self.status, "message": self.message} if self.status else {},
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        trace = self.trace
+        if trace.exported:
+            # Outlived the request (e.g. a generation task it started); export on its own
+            _export([record])
+            return
+        trace.spans.append(record)
+        if self.root:
+            trace.exported = True
+            _export(trace.spans)
+
+
+class _NoopSpan:
+    """Stands in for a span when the trace isn't sampled, so call sites need no checks"""
+    __slots__ = ()
+    trace_id = None
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Export:
+    """Finished spans as a log message, serialised only when the listener formats it"""
+    __slots__ = ("spans",)
+
+    def __init__(self, spans: List[Dict[str, Any]]):
+        self.spans = spans
+
+    def __str__(self) -> str:
+        return json.dumps(
+            {"resourceSpans": [{"resource": _RESOURCE, "scopeSpans": [{"scope": _SCOPE, "spans": self.spans}]}]},
+            separators=(",", ":")
+        )
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are; QueueHandler would format (here: serialise) them on the caller's thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _export(spans: List[Dict[str, Any]]):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(_Export(spans))
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    Start a child of the current span without making it current
+
+    For spans that stay open across yields of an async generator, where the
+    context they end in may not be the one they started in. Call end() when done.
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, kind, attributes)
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    Time a `with` block as a child of the current span, made current inside it
+
+    Costs one context variable read when no sampled trace is active. Errors
+    raised in the block mark the span failed and propagate.
+    """
+    return start_span(name, kind, **attributes)
+
+
+def _parse_traceparent(value: bytes) -> Optional[Tuple[str, str, bool]]:
+    """W3C traceparent (version-traceid-parentid-flags) as (trace id, parent id, sampled)"""
+    parts = value.decode("latin-1").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def start_trace(name: str, kind: int = KIND_INTERNAL, traceparent: Optional[bytes] = None, force: bool = False, **attributes):
+    """
+    Start a root span and make it current
+
+    Args:
+        name: Span name
+        kind: OTLP span kind
+        traceparent: Incoming W3C header; continues that trace and honours its sampled flag
+        force: Sample regardless of tracing settings (e.g. for a profiled request)
+        **attributes: Span attributes
+
+    Returns:
+        (span, token); pass the token to end_trace. The span is NOOP_SPAN if unsampled.
+    """
+    parent = _parse_traceparent(traceparent) if traceparent else None
+    if force:
+        sampled = True
+    elif not settings.tracing_enabled:
+        sampled = False
+    elif parent is not None:
+        sampled = parent[2]
+    else:
+        sampled = random.random() < settings.tracing_sample_ratio
+    if not sampled:
+        return NOOP_SPAN, None
+
+    trace = _Trace(parent[0] if parent else os.urandom(16).hex())
+    root = Span(name, trace, parent[1] if parent else None, kind, attributes)
+    root.root = True
+    return root, _current.set(root)
+
+
+def end_trace(root, token: Optional[contextvars.Token]):
+    if token is not None:
+        _current.reset(token)
+    root.end()
+
+
+@contextlib.contextmanager
+def trace(name: str, **attributes) -> Iterator[Any]:
+    """Run a block as the root of a new trace (background work with no request around it)"""
+    root, token = start_trace(name, **attributes)
+    try:
+        yield root
+    except BaseException as e:
+        root.fail(e)
+        raise
+    finally:
+        end_trace(root, token)
+
+
+def configure_exporter(path: Optional[str] = None):
+    """
+    Write span logs one JSON document per line to a file, or to stdout, apart from the app log
+
+    Records go through a queue to a listener thread, so a slow disk or pipe
+    never blocks the event loop. Call stop_exporter() at shutdown to flush.
+    """
+    global _listener
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.FileHandler(path)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    stop_exporter()
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    logger.handlers = [_DeferredQueueHandler(records)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def stop_exporter():
+    """Write out queued span logs and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+class TracingMiddleware:
+    """
+    Open a server span for every HTTP request
+
+    The span is the parent of every span created while serving the request.
+    Sampled requests get an X-Trace-Id response header for finding their logs.
+    """
+
+    def __init__(self, app, profiler=None):
+        """
+        Args:
+            app: The wrapped ASGI application
+            profiler: Optional RequestProfiler; requests it accepts are always traced
+        """
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == TRACEPARENT_HEADER:
+                traceparent = value
+                break
+        session = self.profiler.begin(scope) if self.profiler is not None else None
+
+        root, token = start_trace(
+            f"{scope['method']} {scope['path']}",
+            kind=KIND_SERVER,
+            traceparent=traceparent,
+            force=session is not None,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status_code": message["status"]})
+                extra = []
+                if root.trace_id is not None:
+                    extra.append((TRACE_ID_HEADER, root.trace_id.encode()))
+                if session is not None:
+                    extra += session.headers()
+                if extra:
+                    message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.fail(e)
+            raise
+        finally:
+            if session is not None:
+                session.finish(root.trace_id)
+            end_trace(root, token)
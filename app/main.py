@@ -1,22 +1,51 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from typing import Optional
 import uvicorn
 
 # Import configuration
-from app.core.config import settings, CORS_CONFIG
+from app.core.capture import CaptureWriter, TrafficCaptureMiddleware
+from app.core.circuit_breaker import CLOSED, CircuitOpen, breaker_states, retry_after_header
+from app.core.config import settings, CAPTURE_ROUTES, CORS_CONFIG, ROUTE_DEADLINES
+from app.core.deadline import DeadlineMiddleware, DeadlineExceeded
+from app.core.middleware import UploadSizeLimitMiddleware, CompressionMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.responses import DefaultJSONResponse, PrecomputedResponse
+from app.core.metrics import metrics
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.profiler import RequestProfiler
+from app.core.tracing import TracingMiddleware, configure_exporter, stop_exporter
 
 # Import routers
 from app.services.Bible_Chat_Service.Bible_chat_route import bible_chat_router
 
 from app.services.Daily_verse_generation.Verse_generation_route import verse_router as verse_generation_router
+from app.services.Daily_verse_generation.Verse_generation_services import save_verse_pool
 
 from app.services.speech_to_text.speech_to_text_route import router as stt_router
+from app.services.speech_to_text.speech_to_text_service import stt_service
+from app.services.api_manager.llm_gateway import get_llm_gateway, gateway_started, close_llm_gateway
+from app.services.api_manager.token_counter import token_counter
 
 from app.services.audio_generation.audio_route import audio_router
+from app.services.audio_generation.audio_service import AudioGenerationService
 
+from app.services.Devotions.Devotions_route import devotions_router
+from app.services.Devotions.Devotions_generation import devotion_engine
+
+from app.services.jobs.jobs_route import jobs_router
+from app.services.jobs.jobs_service import job_queue
+
+logger = logging.getLogger(__name__)
+
+# Routers and services above only import cheap modules; upstream SDKs and
+# clients are built on first use (or warmed in the background at startup)
 
 
 # Create FastAPI instance
@@ -25,15 +54,71 @@ app = FastAPI(
     description=settings.app_description,
     version=settings.app_version,
     docs_url="/docs",  # Always enable docs
-    redoc_url="/redoc"  # Always enable redoc
+    redoc_url="/redoc",  # Always enable redoc
+    default_response_class=DefaultJSONResponse
 )
 
+# Per-client rate limits and upstream quotas; added before CORS so 429s carry CORS headers
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        trust_forwarded=settings.rate_limit_trust_forwarded
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
     **CORS_CONFIG
 )
 
+# Reject oversized STT uploads before their body is received (allow for multipart overhead).
+# The first matching prefix wins, so the long-audio route must come first.
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        f"{settings.api_v1_prefix}/stt/transcribe_long": settings.stt_long_max_upload_mb * 1024 * 1024 + 64 * 1024,
+        f"{settings.api_v1_prefix}/jobs/transcribe_long": settings.stt_long_max_upload_mb * 1024 * 1024 + 64 * 1024,
+        f"{settings.api_v1_prefix}/stt": settings.stt_max_upload_mb * 1024 * 1024 + 64 * 1024,
+    }
+)
+
+# Give every request a deadline budget that upstream calls size their timeouts from
+app.add_middleware(
+    DeadlineMiddleware,
+    default_seconds=settings.request_deadline_default_seconds,
+    max_seconds=settings.request_deadline_max_seconds,
+    route_budgets=ROUTE_DEADLINES
+)
+
+# Compress large buffered JSON (verse and prayer batches); streams pass through
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_bytes
+)
+
+# One server span per request (parent of every upstream and stage span),
+# and per-request sampling profiles for requests carrying the X-Debug-Profile token
+configure_exporter(settings.tracing_log_path)
+request_profiler = RequestProfiler(
+    token=settings.debug_profile_token,
+    interval=settings.debug_profile_interval_ms / 1000.0,
+    max_seconds=settings.debug_profile_max_seconds,
+    kept=settings.debug_profiles_kept
+)
+app.add_middleware(TracingMiddleware, profiler=request_profiler)
+
+# Opt-in capture of anonymized request shapes and upstream timings for benchmarks/replay.py.
+# Outermost, so recorded latencies include every other middleware
+capture_writer = None
+if settings.capture_enabled:
+    capture_writer = CaptureWriter(settings.capture_dir, settings.capture_max_file_mb * 1024 * 1024)
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        writer=capture_writer,
+        prefixes=CAPTURE_ROUTES,
+        sample_ratio=settings.capture_sample_ratio
+    )
+
 # Mount static files directory for audio files
 static_dir = Path("static")
 static_dir.mkdir(exist_ok=True)
@@ -44,74 +129,224 @@ app.include_router(bible_chat_router, prefix=settings.api_v1_prefix)
 app.include_router(verse_generation_router, prefix=settings.api_v1_prefix)
 app.include_router(stt_router, prefix=settings.api_v1_prefix)
 app.include_router(audio_router, prefix=settings.api_v1_prefix)
+app.include_router(devotions_router, prefix=settings.api_v1_prefix)
+app.include_router(jobs_router, prefix=settings.api_v1_prefix)
+
+
+loop_monitor = LoopLagMonitor(settings.loop_lag_probe_interval_seconds)
+# Startup work that runs in the background; referenced here so the tasks aren't collected early
+_startup_tasks = set()
+
 
+def _warm_clients():
+    started = time.perf_counter()
+    try:
+        get_llm_gateway()
+        logger.info(f"Upstream clients ready in {time.perf_counter() - started:.3f}s")
+    except Exception as e:
+        logger.error(f"Upstream clients could not be built: {e}")
+
+
+@app.on_event("startup")
+async def startup():
+    """Start background monitors and warm upstream clients off the event loop"""
+    loop_monitor.start()
+    # tiktoken may download its encodings; load them in a thread, never from a request.
+    # Prompts are counted with the conservative heuristic until this finishes
+    encoders = asyncio.create_task(asyncio.to_thread(
+        token_counter.load, (settings.openai_model, settings.openai_fast_model)
+    ))
+    _startup_tasks.add(encoders)
+    encoders.add_done_callback(_startup_tasks.discard)
+    # Resume jobs a previous process left queued or running
+    await job_queue.start()
+    if settings.warm_clients_on_startup and settings.openai_api_key:
+        asyncio.get_running_loop().run_in_executor(None, _warm_clients)
+    # Keep the next devotions_days_ahead days of devotionals generated and stored
+    if settings.devotions_prefill_enabled and settings.openai_api_key:
+        devotion_engine.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Write persistent caches to disk so they survive restarts, then close upstream pools"""
+    await loop_monitor.stop()
+    await devotion_engine.stop()
+    await job_queue.stop()
+    stt_service.save_cache()
+    save_verse_pool()
+    await close_llm_gateway()
+    await AudioGenerationService.close_client()
+    if capture_writer is not None:
+        capture_writer.close()
+    stop_exporter()
+
+
+# Static payloads are serialized, hashed and compressed once at import
+_root_response = PrecomputedResponse({
+    "message": f"Welcome to {settings.app_name}",
+    "version": settings.app_version,
+    "description": settings.app_description,
+    "environment": settings.environment,
+    "endpoints": {
+        "bible_chat": f"{settings.api_v1_prefix}/bible-chat/query",
+        "verse_generation": f"{settings.api_v1_prefix}/verse-generation/random",
+        "speech_to_text": f"{settings.api_v1_prefix}/stt/transcribe",
+        "audio_generation": f"{settings.api_v1_prefix}/audio/generate",
+        "audio_stream": f"{settings.api_v1_prefix}/audio/generate-stream",
+        "devotion_today": f"{settings.api_v1_prefix}/devotions/today",
+        "voice_chat": f"{settings.api_v1_prefix}/stt/voice_chat",
+        "stt_stream": f"ws {settings.api_v1_prefix}/stt/stream",
+        "stt_long_audio": f"{settings.api_v1_prefix}/stt/transcribe_long",
+        "background_jobs": f"{settings.api_v1_prefix}/jobs/{{job_id}}",
+        "stt_info": f"{settings.api_v1_prefix}/stt/info",
+        "health_check": f"{settings.api_v1_prefix}/bible-chat/health",
+        "readiness": "/ready",
+        "examples": f"{settings.api_v1_prefix}/bible-chat/examples",
+        "documentation": "/docs"
+    },
+    "usage": {
+        "endpoint": f"POST {settings.api_v1_prefix}/bible-chat/query",
+        "payload": {"query": "Your Bible question here"},
+        "example": {"query": "What does the Bible say about love?"}
+    },
+    "supported_bible_versions": settings.bible_versions
+}, max_age=3600)
+
+_health_payload = {
+    "status": "healthy",
+    "service": settings.app_name,
+    "version": settings.app_version,
+    "environment": settings.environment,
+    "bible_chat": "available",
+    "openai_model": settings.openai_model,
+    "supported_versions": settings.bible_versions,
+    "upstreams": breaker_states()
+}
+_health_response = PrecomputedResponse(_health_payload)
+
+_not_found_response = PrecomputedResponse({
+    "success": False,
+    "error": "Endpoint not found",
+    "message": "The requested resource was not found",
+    "available_endpoints": [
+        f"POST {settings.api_v1_prefix}/bible-chat/query",
+        f"GET {settings.api_v1_prefix}/bible-chat/health",
+        f"GET {settings.api_v1_prefix}/bible-chat/examples",
+        f"POST {settings.api_v1_prefix}/verse-generation/random",
+        f"POST {settings.api_v1_prefix}/stt/transcribe",
+        f"POST {settings.api_v1_prefix}/stt/voice_chat",
+        f"POST {settings.api_v1_prefix}/stt/transcribe_long",
+        f"GET {settings.api_v1_prefix}/stt/info",
+        f"POST {settings.api_v1_prefix}/audio/generate",
+        f"POST {settings.api_v1_prefix}/audio/generate-stream",
+        f"GET {settings.api_v1_prefix}/devotions/today",
+        f"GET {settings.api_v1_prefix}/devotions/{{day}}",
+        f"POST {settings.api_v1_prefix}/jobs/verses",
+        f"POST {settings.api_v1_prefix}/jobs/tts",
+        f"POST {settings.api_v1_prefix}/jobs/transcribe_long",
+        f"GET {settings.api_v1_prefix}/jobs/{{job_id}}",
+        "GET /docs"
+    ]
+}, status_code=404)
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint with API information"""
-    return {
-        "message": f"Welcome to {settings.app_name}",
-        "version": settings.app_version,
-        "description": settings.app_description,
-        "environment": settings.environment,
-        "endpoints": {
-            "bible_chat": f"{settings.api_v1_prefix}/bible-chat/query",
-            "verse_generation": f"{settings.api_v1_prefix}/verse-generation/random",
-            "speech_to_text": f"{settings.api_v1_prefix}/stt/transcribe",
-            "audio_generation": f"{settings.api_v1_prefix}/audio/generate",
-            "audio_stream": f"{settings.api_v1_prefix}/audio/generate-stream",
-            "stt_info": f"{settings.api_v1_prefix}/stt/info",
-            "health_check": f"{settings.api_v1_prefix}/bible-chat/health",
-            "examples": f"{settings.api_v1_prefix}/bible-chat/examples",
-            "documentation": "/docs"
-        },
-        "usage": {
-            "endpoint": f"POST {settings.api_v1_prefix}/bible-chat/query",
-            "payload": {"query": "Your Bible question here"},
-            "example": {"query": "What does the Bible say about love?"}
-        },
-        "supported_bible_versions": settings.bible_versions
-    }
+    return _root_response(request)
 
 @app.get("/health")
-async def health_check():
-    """General health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": settings.app_name,
-        "version": settings.app_version,
-        "environment": settings.environment,
-        "bible_chat": "available",
-        "openai_model": settings.openai_model,
-        "supported_versions": settings.bible_versions
+async def health_check(request: Request):
+    """
+    General health check endpoint. Stays 200 while an upstream's circuit
+    breaker is open, but reports "degraded" and each upstream's breaker state.
+    """
+    upstreams = breaker_states()
+    if all(state == CLOSED for state in upstreams.values()):
+        return _health_response(request)
+    return DefaultJSONResponse({
+        **_health_payload,
+        "status": "degraded",
+        "bible_chat": "available" if upstreams["openai"] == CLOSED else "degraded",
+        "upstreams": upstreams
+    }, headers={"Cache-Control": "no-store"})
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 only once upstream credentials are configured and the
+    clients are built. Unlike /health (liveness), this can be 503 while the
+    process itself is fine.
+    """
+    checks = {
+        "openai_api_key": bool(settings.openai_api_key),
+        "elevenlabs_api_key": bool(settings.elevenlabs_api_key),
+        "llm_gateway": gateway_started(),
     }
+    if checks["openai_api_key"] and not checks["llm_gateway"]:
+        await asyncio.get_running_loop().run_in_executor(None, _warm_clients)
+        checks["llm_gateway"] = gateway_started()
+
+    ready = all(checks.values())
+    return DefaultJSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "checks": checks}
+    )
+
+@app.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """Upstream call, cache, latency and event-loop lag metrics (Prometheus text, or ?format=json)"""
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus())
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, x_debug_profile: Optional[str] = Header(None)):
+    """
+    A request profile in collapsed-stack format (flamegraph.pl, speedscope, inferno).
+    Takes the same X-Debug-Profile token that requested it.
+    """
+    profile = request_profiler.get(profile_id) if request_profiler.authorized(x_debug_profile) else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed(), headers={
+        "X-Trace-Id": profile.trace_id or "",
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Duration-Ms": f"{profile.duration * 1000:.1f}",
+        "Cache-Control": "no-store"
+    })
 
 # Exception handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return JSONResponse(
-        status_code=404,
+    return _not_found_response(request)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return DefaultJSONResponse(
+        status_code=504,
         content={
             "success": False,
-            "error": "Endpoint not found",
-            "message": "The requested resource was not found",
-            "available_endpoints": [
-                f"POST {settings.api_v1_prefix}/bible-chat/query",
-                f"GET {settings.api_v1_prefix}/bible-chat/health",
-                f"GET {settings.api_v1_prefix}/bible-chat/examples",
-                f"POST {settings.api_v1_prefix}/verse-generation/random",
-                f"POST {settings.api_v1_prefix}/stt/transcribe",
-                f"GET {settings.api_v1_prefix}/stt/info",
-                f"POST {settings.api_v1_prefix}/audio/generate",
-                f"POST {settings.api_v1_prefix}/audio/generate-stream",
-                "GET /docs"
-            ]
+            "error": "Deadline exceeded",
+            "message": "The request could not be completed within its time budget. Please try again."
         }
     )
 
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request, exc):
+    return DefaultJSONResponse(
+        status_code=503,
+        content={
+            "success": False,
+            "error": "Upstream unavailable",
+            "message": "This service is temporarily unavailable. Please try again shortly."
+        },
+        headers={"Retry-After": retry_after_header(exc)}
+    )
+
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return JSONResponse(
+    return DefaultJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, Request
+from typing import Dict, Any, Optional
 
+from app.core.circuit_breaker import CircuitOpen, retry_after_header
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.responses import DefaultJSONResponse, PrecomputedResponse
+from app.services.api_manager.llm_gateway import GatewayUnavailable, PromptTooLarge
 from .Bible_chat_schema import BibleChatRequest, BibleChatResponse, ErrorResponse
 from .Bible_chat_service import BibleChatService
 
@@ -16,11 +20,23 @@ bible_chat_router = APIRouter(
 def get_bible_chat_service() -> BibleChatService:
     return BibleChatService()
 
+def error_response(status_code: int, error: str, message: str, headers: Optional[Dict[str, str]] = None) -> DefaultJSONResponse:
+    """Error payloads bypass response_model, which only describes the success shape"""
+    return DefaultJSONResponse(
+        status_code=status_code,
+        content=ErrorResponse(error=error, response=message).model_dump(mode="json"),
+        headers=headers
+    )
+
 @bible_chat_router.post(
     "/query",
     response_model=BibleChatResponse,
     summary="AI Bible Chat",
-    description="Ask any question about the Bible and get AI-powered responses with scripture references"
+    description="Ask any question about the Bible and get AI-powered responses with scripture references",
+    responses={
+        400: {"model": ErrorResponse}, 500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}, 504: {"model": ErrorResponse}
+    }
 )
 async def bible_chat_query(
     request: BibleChatRequest,
@@ -46,91 +62,82 @@ async def bible_chat_query(
         # Validate the query
         is_valid, error_message = service.validate_query(request.query)
         if not is_valid:
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "success": False,
-                    "error": f"Validation error: {error_message}",
-                    "response": "Please provide a valid Bible-related question.",
-                    "timestamp": ""
-                }
+            return error_response(
+                400,
+                f"Validation error: {error_message}",
+                "Please provide a valid Bible-related question."
             )
         
         # Process the Bible query
         response = await service.process_bible_query(request)
         
         if response["success"]:
-            return JSONResponse(
-                status_code=200,
-                content=response
-            )
-        else:
-            return JSONResponse(
-                status_code=500,
-                content=response
-            )
+            return response
+        return DefaultJSONResponse(status_code=500, content=response)
             
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "error": f"Internal server error: {str(e)}",
-                "response": "I apologize, but I'm unable to process your Bible question at the moment. Please try again later.",
-                "timestamp": ""
-            }
+    except PromptTooLarge as e:
+        return error_response(
+            400,
+            f"Validation error: {str(e)}",
+            "Please shorten your Bible question and try again."
         )
-
-@bible_chat_router.get(
-    "/health",
-    summary="Health Check",
-    description="Check if the Bible chat service is running properly"
-)
-async def health_check() -> Dict[str, Any]:
-    """
-    Health check endpoint for the Bible chat service
-    """
-    try:
-        # Test service initialization
-        service = BibleChatService()
-        
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": True,
-                "service": "Bible Chat Service",
-                "status": "healthy",
-                "message": "Service is running properly",
-                "endpoint": "/api/v1/bible-chat/query",
-                "supported_versions": ["KJV", "NIV", "ESV", "NLT"],
-                "query_limits": {
-                    "min_length": 2,
-                    "max_length": 2000
-                }
-            }
+    except CircuitOpen as e:
+        # OpenAI is failing and no earlier answer to this question is cached
+        return error_response(
+            503,
+            "Service temporarily unavailable",
+            "I apologize, but the Bible AI service is temporarily unavailable. Please try again in a moment.",
+            headers={"Retry-After": retry_after_header(e)}
+        )
+    except GatewayUnavailable:
+        # The same condition /ready reports as not ready
+        return error_response(
+            503,
+            "Service unavailable: OPEN_AI_API_KEY is not configured",
+            "I apologize, but the Bible AI service is not available right now. Please try again later."
+        )
+    except DeadlineExceeded:
+        return error_response(
+            504,
+            "Deadline exceeded",
+            "I apologize, but your Bible question took too long to answer. Please try again."
         )
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "service": "Bible Chat Service",
-                "status": "unhealthy",
-                "error": str(e),
-                "message": "Service configuration error"
-            }
+        return error_response(
+            500,
+            f"Internal server error: {str(e)}",
+            "I apologize, but I'm unable to process your Bible question at the moment. Please try again later."
         )
 
-@bible_chat_router.get(
-    "/examples",
-    summary="Example Queries",
-    description="Get example queries you can ask the Bible chat AI"
-)
-async def get_examples() -> Dict[str, Any]:
-    """
-    Get example queries for the Bible chat service
-    """
-    examples = {
+# Static payloads are serialized, hashed and compressed once at import
+QUERY_LIMITS = {
+    "min_length": settings.min_query_length,
+    "max_length": settings.max_query_length
+}
+
+if settings.openai_api_key:
+    _health_response = PrecomputedResponse({
+        "success": True,
+        "service": "Bible Chat Service",
+        "status": "healthy",
+        "message": "Service is running properly",
+        "endpoint": f"{settings.api_v1_prefix}/bible-chat/query",
+        "supported_versions": settings.bible_versions,
+        "query_limits": QUERY_LIMITS
+    })
+else:
+    _health_response = PrecomputedResponse({
+        "success": False,
+        "service": "Bible Chat Service",
+        "status": "unhealthy",
+        "error": "OPEN_AI_API_KEY is not configured",
+        "message": "Service configuration error"
+    }, status_code=500)
+
+_examples_response = PrecomputedResponse({
+    "success": True,
+    "message": "Example queries for Bible Chat AI",
+    "examples": {
         "bible_questions": [
             "What does the Bible say about love?",
             "How many books are in the Bible?",
@@ -156,19 +163,30 @@ async def get_examples() -> Dict[str, Any]:
             "What does the Bible say about predestination?",
             "Explain the Trinity from a biblical perspective"
         ]
-    }
-    
-    return JSONResponse(
-        status_code=200,
-        content={
-            "success": True,
-            "message": "Example queries for Bible Chat AI",
-            "examples": examples,
-            "supported_versions": ["KJV", "NIV", "ESV", "NLT"],
-            "usage": "Send a POST request to /api/v1/bible-chat/query with your question in the 'query' field",
-            "query_limits": {
-                "min_length": 2,
-                "max_length": 2000
-            }
-        }
-    )
+    },
+    "supported_versions": settings.bible_versions,
+    "usage": f"Send a POST request to {settings.api_v1_prefix}/bible-chat/query with your question in the 'query' field",
+    "query_limits": QUERY_LIMITS
+}, max_age=3600)
+
+@bible_chat_router.get(
+    "/health",
+    summary="Health Check",
+    description="Check if the Bible chat service is running properly"
+)
+async def health_check(request: Request):
+    """
+    Health check endpoint for the Bible chat service
+    """
+    return _health_response(request)
+
+@bible_chat_router.get(
+    "/examples",
+    summary="Example Queries",
+    description="Get example queries you can ask the Bible chat AI"
+)
+async def get_examples(request: Request):
+    """
+    Get example queries for the Bible chat service
+    """
+    return _examples_response(request)
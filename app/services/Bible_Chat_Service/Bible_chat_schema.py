@@ -29,6 +29,7 @@ class BibleChatResponse(BaseModel):
     """Simple schema for Bible chat responses"""
     success: bool = Field(..., description="Whether the request was successful")
     response: str = Field(..., description="The AI's response to the Bible query")
+    model: Optional[str] = Field(None, description="The model that generated the response")
     timestamp: datetime = Field(default_factory=datetime.now, description="When the response was generated")
     
     class Config:
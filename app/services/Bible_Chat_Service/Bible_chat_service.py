@@ -1,7 +1,10 @@
 from typing import Dict, Any
 from datetime import datetime
 
+from app.core.circuit_breaker import CircuitOpen
+from app.core.deadline import DeadlineExceeded
 from app.services.api_manager.Bible_chat_api_manager import BibleChatAPIManager
+from app.services.api_manager.llm_gateway import GatewayUnavailable, PromptTooLarge
 from .Bible_chat_schema import BibleChatRequest, BibleChatResponse
 
 class BibleChatService:
@@ -30,6 +33,7 @@ class BibleChatService:
                 return {
                     "success": True,
                     "response": api_response["response"],
+                    "model": api_response["model"],
                     "timestamp": datetime.now().isoformat()
                 }
             else:
@@ -40,6 +44,8 @@ class BibleChatService:
                     "timestamp": datetime.now().isoformat()
                 }
                 
+        except (DeadlineExceeded, PromptTooLarge, CircuitOpen, GatewayUnavailable):
+            raise
         except Exception as e:
             return {
                 "success": False,
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Request, Response
 import time
 import logging
+from app.core.circuit_breaker import CircuitOpen, retry_after_header
+from app.core.deadline import DeadlineExceeded
+from app.core.tracing import span
+from app.services.api_manager.llm_gateway import GatewayUnavailable
 from app.services.Daily_verse_generation.Verse_generation_services import generate_random_verses
 from app.services.Daily_verse_generation.Verse_generation_schema import VerseGenerationResponse
 
@@ -12,6 +16,7 @@ verse_router = APIRouter(
     responses={
         404: {"description": "Not found"},
         500: {"description": "Internal server error"}, 
+        503: {"description": "OpenAI is unavailable and no pooled verses are available"},
         200: {"description": "Successfully generated verses and prayers"}
     }
 )
@@ -31,10 +36,11 @@ async def get_random_verses(request: Request, response: Response):
     
     try:
         # Generate verses and prayers using concurrent API calls
-        result_dict = generate_random_verses()
+        result_dict = await generate_random_verses()
         
         # Create the response model
-        verse_response = VerseGenerationResponse(**result_dict)
+        with span("verses.validate"):
+            verse_response = VerseGenerationResponse(**result_dict)
         
         # Log success
         execution_time = time.time() - start_time
@@ -42,6 +48,22 @@ async def get_random_verses(request: Request, response: Response):
         
         return verse_response
         
+    except CircuitOpen as e:
+        logger.warning(f"Verse generation unavailable and the verse pool is empty: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Verse generation is temporarily unavailable",
+            headers={"Retry-After": retry_after_header(e)}
+        )
+    except DeadlineExceeded:
+        logger.warning(f"Verse generation exceeded its deadline after {time.time() - start_time:.2f}s")
+        raise HTTPException(status_code=504, detail="Verse generation timed out")
+    except GatewayUnavailable:
+        # No API key and nothing pooled: the same condition /ready reports as not ready
+        raise HTTPException(
+            status_code=503,
+            detail="Verse generation is unavailable: OPEN_AI_API_KEY is not configured"
+        )
     except Exception as e:
         # Log the error with details
         logger.error(f"Failed to generate verses: {str(e)}", exc_info=True)
@@ -1,16 +1,64 @@
-import openai
 import json
 import random
 import time
 import asyncio
-import concurrent.futures
+import logging
 from typing import Dict, List, Any, Tuple
+from app.core.cache import TTLCache
+from app.core.circuit_breaker import fallbacks
 from app.core.config import settings
-from app.services.Daily_verse_generation.Verse_generation_schema import VerseDetail, PrayerDetail
+from app.core.tracing import span
+from app.services.api_manager.llm_gateway import llm_gateway
+from app.services.scripture.references import check_reference
 
-client = openai.OpenAI(api_key=settings.openai_api_key)
+logger = logging.getLogger(__name__)
 
-def generate_verses_batch(batch_num: int, batch_size: int = 5) -> List[Tuple[str, str, str]]:
+# Recently generated verses ("verse:<reference>") and prayers ("prayer:<title>"),
+# used to fill a response when OpenAI can't be reached
+verse_pool = TTLCache(
+    max_entries=settings.verse_pool_max_entries,
+    ttl_seconds=settings.verse_pool_ttl_seconds,
+    persist_path=settings.verse_pool_path
+)
+
+
+def parse_json_array(content: str) -> List[Any]:
+    """Parse a model reply that should be a JSON array, tolerating a markdown code fence"""
+    content = content.strip()
+    
+    # Remove any markdown wrapper if present
+    if content.startswith('```'):
+        content = content.split('```')[1]
+        if content.startswith('json'):
+            content = content[4:]
+        content = content.strip()
+    
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _well_formed(row: Any, size: int) -> bool:
+    return isinstance(row, (list, tuple)) and len(row) == size and all(isinstance(value, str) for value in row)
+
+
+def validate_verse_rows(rows: List[Any]) -> List[Tuple[str, str, str]]:
+    """Keep [text, explanation, reference] rows whose reference exists, with the reference made canonical"""
+    valid = []
+    for row in rows:
+        if not _well_formed(row, 3):
+            continue
+        reference = check_reference(row[2], source="verses")
+        if reference is None:
+            logger.info(f"Dropped generated verse with invalid reference {row[2]!r}")
+            continue
+        valid.append((row[0], row[1], reference))
+    return valid
+
+
+async def generate_verses_batch(batch_num: int, batch_size: int = 5) -> List[Tuple[str, str, str]]:
     """Generate a batch of Bible verses (5 at a time)"""
 
     
@@ -45,34 +93,14 @@ CONTENT GUIDELINES:
 Batch: {batch_num}
 Seed: {random_seed}"""
 
-    response = client.chat.completions.create(
-        model=settings.openai_model,
-        messages=[
-            {"role": "system", "content": "You are a JSON generator. Return ONLY valid JSON arrays. No markdown. No explanations. Just valid JSON that starts with [ and ends with ]. No exceptions."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=800
-    )
-    
-    content = response.choices[0].message.content.strip()
-    
-    # Remove any markdown wrapper if present
-    if content.startswith('```'):
-        content = content.split('```')[1]
-        if content.startswith('json'):
-            content = content[4:]
-        content = content.strip()
-    
-    try:
-        parsed = json.loads(content)
-        return parsed
-    except json.JSONDecodeError as e:
-        # Return empty list if parsing fails
-        return []
+    with span("verses.batch", **{"verses.kind": "verses", "verses.batch": batch_num}):
+        gateway = await llm_gateway()
+        result = await gateway.complete("verse_batch", prompt)
+        with span("verses.parse", **{"verses.response_chars": len(result.text)}):
+            return validate_verse_rows(parse_json_array(result.text))
 
 
-def generate_prayers_batch(batch_num: int, batch_size: int = 5) -> List[Tuple[str, str]]:
+async def generate_prayers_batch(batch_num: int, batch_size: int = 5) -> List[Tuple[str, str]]:
     """Generate a batch of prayers (5 at a time)"""
 
     random_seed = int(time.time() * 1000) + random.randint(1, 10000)
@@ -104,62 +132,99 @@ CONTENT GUIDELINES:
 Batch: {batch_num}
 Seed: {random_seed}"""
 
-    response = client.chat.completions.create(
-        model=settings.openai_model,
-        messages=[
-            {"role": "system", "content": "You are a JSON generator. Return ONLY valid JSON arrays. No markdown. No explanations. Just valid JSON that starts with [ and ends with ]. No exceptions."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=800
-    )
-    
-    content = response.choices[0].message.content.strip()
-    print(f"Raw response first 100 chars: {content[:100]}...")
-    
-    # Remove any markdown wrapper if present
-    if content.startswith('```'):
-        content = content.split('```')[1]
-        if content.startswith('json'):
-            content = content[4:]
-        content = content.strip()
-    
-    try:
-        parsed = json.loads(content)
-        return parsed
-    except json.JSONDecodeError as e:
-        return []
+    with span("verses.batch", **{"verses.kind": "prayers", "verses.batch": batch_num}):
+        gateway = await llm_gateway()
+        result = await gateway.complete("verse_batch", prompt)
+        logger.debug(f"Raw response first 100 chars: {result.text[:100]}...")
+        with span("verses.parse", **{"verses.response_chars": len(result.text)}):
+            return parse_json_array(result.text)
 
 
-def generate_random_verses() -> Dict[str, Any]:
-    """Generate 15 verses and 15 prayers using concurrent API calls"""
-    
+async def generate_random_verses() -> Dict[str, Any]:
+    """
+    Generate 15 verses and 15 prayers using concurrent API calls
 
+    If some batches fail (or OpenAI's circuit breaker is open), the gaps are
+    filled from the pool of recently generated verses and prayers; the first
+    error is raised only when there is nothing at all to serve.
+    """
     
     all_verses = []
     all_prayers = []
+    errors = []
     
-    # Use concurrent execution for faster processing
-    with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-        # Submit verse generation tasks (3 batches of 5 verses)
-        verse_futures = [executor.submit(generate_verses_batch, i+1) for i in range(3)]
-        
-        # Submit prayer generation tasks (3 batches of 5 prayers)
-        prayer_futures = [executor.submit(generate_prayers_batch, i+1) for i in range(3)]
-        
-        # Collect verse results
-        for future in concurrent.futures.as_completed(verse_futures):
-            batch_result = future.result()
+    # Run all six batches concurrently on the event loop (3 of verses, 3 of prayers)
+    batches = await asyncio.gather(
+        *(generate_verses_batch(i+1) for i in range(3)),
+        *(generate_prayers_batch(i+1) for i in range(3)),
+        return_exceptions=True
+    )
+    for index, batch_result in enumerate(batches):
+        if isinstance(batch_result, BaseException):
+            errors.append(batch_result)
+        elif index < 3:
             all_verses.extend(batch_result)
-            
-        # Collect prayer results
-        for future in concurrent.futures.as_completed(prayer_futures):
-            batch_result = future.result()
-            all_prayers.extend(batch_result)
+        else:
+            all_prayers.extend(row for row in batch_result if _well_formed(row, 2))
+
+    # Verses with invented references were dropped; replace them with one more round
+    missing = 15 - len(all_verses)
+    if missing > 0 and not errors:
+        logger.info(f"Regenerating {missing} verses after dropping invalid references")
+        top_up = await asyncio.gather(
+            *(generate_verses_batch(4 + i) for i in range(-(-missing // 5))),
+            return_exceptions=True
+        )
+        batches.extend(top_up)
+        for batch_result in top_up:
+            if isinstance(batch_result, BaseException):
+                errors.append(batch_result)
+            else:
+                all_verses.extend(batch_result)
+
+    for verse in all_verses:
+        verse_pool.set(f"verse:{verse[2]}", list(verse))
+    for prayer in all_prayers:
+        verse_pool.set(f"prayer:{prayer[0]}", list(prayer))
+
+    if errors:
+        pooled_verses = _from_pool("verse:", {verse[2] for verse in all_verses}, 15 - len(all_verses))
+        pooled_prayers = _from_pool("prayer:", {prayer[0] for prayer in all_prayers}, 15 - len(all_prayers))
+        all_verses.extend(pooled_verses)
+        all_prayers.extend(pooled_prayers)
+        if not all_verses and not all_prayers:
+            raise errors[0]
+        if pooled_verses or pooled_prayers:
+            fallbacks.inc(route="verses", source="verse_pool")
+        logger.warning(
+            f"{len(errors)} of {len(batches)} batches failed ({errors[0]!r}); filled in {len(pooled_verses)} verses "
+            f"and {len(pooled_prayers)} prayers from the pool"
+        )
+    
+    return build_verse_response(all_verses, all_prayers)
+
+
+def _from_pool(prefix: str, exclude: set, count: int) -> List[List[str]]:
+    """Up to `count` random pooled rows of one kind, skipping those already in the response"""
+    if count <= 0:
+        return []
+    rows = [value for key, value in verse_pool.items() if key.startswith(prefix) and key[len(prefix):] not in exclude]
+    return random.sample(rows, min(count, len(rows)))
+
+
+def save_verse_pool():
+    try:
+        verse_pool.save()
+    except OSError as e:
+        logger.error(f"Failed to persist verse pool: {e}")
+
+
+def build_verse_response(all_verses: List[Any], all_prayers: List[Any], limit: int = 15) -> Dict[str, Any]:
+    """Shape parsed verse and prayer rows into the VerseGenerationResponse payload"""
     
     # Limit to 15 items of each
-    verses = all_verses[:15]
-    prayers = all_prayers[:15]
+    verses = all_verses[:limit]
+    prayers = all_prayers[:limit]
     
     # Create result lists in the requested format
     verses_list = []
@@ -193,5 +258,4 @@ def generate_random_verses() -> Dict[str, Any]:
         "prayers": prayers_list
     }
     
-    
     return result
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class Devotion(BaseModel):
+    """A single day's devotional"""
+    date: str = Field(..., description="The calendar day this devotional is for (YYYY-MM-DD)", example="2025-07-21")
+    title: str = Field(..., description="Title of the devotional", example="Joy Beyond Circumstances")
+    scripture_reference: str = Field(..., description="The passage the devotional is built on", example="Habakkuk 3:17-18")
+    scripture_text: str = Field(
+        ...,
+        description="The text of the passage",
+        example="Though the fig tree shall not blossom... yet I will rejoice in the LORD, I will joy in the God of my salvation."
+    )
+    reflection: str = Field(..., description="A short reflection on the passage")
+    prayer: str = Field(..., description="A closing prayer")
+    application: str = Field(..., description="One practical way to live the passage out today")
+    model: str = Field(..., description="The model that wrote the devotional")
+    generated_at: str = Field(..., description="When the devotional was generated (ISO 8601)")
+
+
+class DevotionResponse(BaseModel):
+    """Response model for a single devotional"""
+    success: bool = Field(True, description="Whether the request was successful")
+    devotion: Devotion
+
+
+class DevotionCalendarResponse(BaseModel):
+    """Which days in the serving window already have a devotional"""
+    success: bool = Field(True, description="Whether the request was successful")
+    today: str = Field(..., description="Today in the devotional calendar's time zone")
+    available: List[str] = Field(..., description="Days with a stored devotional, oldest first")
+    pending: List[str] = Field(..., description="Days in the window still to be generated")
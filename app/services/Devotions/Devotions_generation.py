@@ -0,0 +1,324 @@
+"""
+Calendar-cached daily devotionals
+Each day's devotional is generated once, ahead of time, by a background job
+covering a rolling window of days, kept in SQLite so it survives restarts,
+and served from pre-serialized responses with ETags
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.responses import PrecomputedResponse
+from app.core.scheduler import PREFETCH, upstream_priority
+from app.core.tracing import span, trace
+from app.services.api_manager.llm_gateway import llm_gateway
+from app.services.Daily_verse_generation.Verse_generation_services import parse_json_array
+from app.services.scripture.references import check_reference
+from .Deveotions_schema import Devotion
+
+logger = logging.getLogger(__name__)
+
+# Rotating themes give consecutive days different subjects without any shared state
+THEMES = [
+    "hope in waiting", "God's faithfulness", "forgiveness", "rest", "courage", "gratitude",
+    "humility", "generosity", "peace in anxiety", "perseverance", "loving your neighbour",
+    "prayer", "joy in trials", "God's provision", "wisdom", "trust", "grace", "obedience",
+    "comfort in grief", "new beginnings", "serving others", "contentment", "God's presence",
+    "patience", "integrity", "compassion", "renewal", "God's word", "worship", "unity",
+]
+
+# Devotionals are written once and never change, so clients may keep them for a day
+_MAX_AGE = 24 * 3600
+
+_END = object()
+
+_FIELDS = ("title", "scripture_reference", "scripture_text", "reflection", "prayer", "application")
+
+
+class DevotionGenerationError(RuntimeError):
+    """Raised when the model's reply cannot be turned into a devotional"""
+
+
+def today() -> datetime.date:
+    return datetime.datetime.now(ZoneInfo(settings.devotions_timezone)).date()
+
+
+def build_prompt(day: datetime.date) -> str:
+    theme = THEMES[day.toordinal() % len(THEMES)]
+    return f"""Write a daily Christian devotional for {day.strftime('%A, %B %d, %Y')} on the theme of {theme}.
+
+CRITICAL: Return ONLY a valid JSON array of 6 strings that Python json.loads() can parse.
+
+REQUIRED FORMAT - Return EXACTLY this format and nothing else:
+["Title", "Book Chapter:Verse", "Scripture text", "Reflection", "Prayer", "Application"]
+
+JSON RULES (EXTREMELY IMPORTANT):
+- ONLY return a JSON array - NO markdown, NO code blocks, NO explanations
+- Use DOUBLE QUOTES for all JSON strings, never single quotes
+- Use apostrophes inside text instead of quotes
+
+CONTENT GUIDELINES:
+- Scripture text: 1-3 verses quoted from the ESV, NIV, KJV or NLT
+- Reflection: 3 short paragraphs (about 200 words) explaining the passage and its meaning today
+- Prayer: 3-5 sentences, personal, ending in Amen
+- Application: one concrete thing to do today"""
+
+
+def parse_devotion(day: datetime.date, content: str, model: str) -> Dict[str, Any]:
+    """Turn a model reply into a validated devotional payload"""
+    parts = parse_json_array(content)
+    if len(parts) != len(_FIELDS) or not all(isinstance(part, str) and part.strip() for part in parts):
+        raise DevotionGenerationError(f"Unexpected devotional format for {day.isoformat()}")
+    payload = dict(zip(_FIELDS, (part.strip() for part in parts)))
+    reference = check_reference(payload["scripture_reference"], source="devotions")
+    if reference is None:
+        raise DevotionGenerationError(
+            f"Devotional for {day.isoformat()} cites a passage that doesn't exist: {payload['scripture_reference']!r}"
+        )
+    payload["scripture_reference"] = reference
+    payload.update(
+        date=day.isoformat(),
+        model=model,
+        generated_at=datetime.datetime.now(datetime.timezone.utc).isoformat()
+    )
+    return Devotion(**payload).model_dump()
+
+
+class DevotionStore:
+    """Date-keyed SQLite table of devotional payloads; calls block and are run in a worker thread"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS devotions (day TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+
+    def get(self, day: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM devotions WHERE day = ?", (day,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_range(self, first: str, last: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM devotions WHERE day BETWEEN ? AND ? ORDER BY day", (first, last)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def latest_before(self, day: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM devotions WHERE day < ? ORDER BY day DESC LIMIT 1", (day,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, payload: Dict[str, Any]):
+        # First write wins: a devotional never changes once served
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO devotions (day, payload, created_at) VALUES (?, ?, ?)",
+                (payload["date"], json.dumps(payload), payload["generated_at"])
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DevotionEngine:
+    """
+    Serves devotionals for a window of days around today
+
+    Stored days are held in memory as PrecomputedResponse objects. Misses
+    are generated at most once at a time per day: concurrent requests for
+    the same day share one upstream call.
+    """
+
+    def __init__(self):
+        self._store: Optional[DevotionStore] = None
+        self._store_lock = asyncio.Lock()
+        self._responses: "OrderedDict[str, PrecomputedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _db(self) -> DevotionStore:
+        if self._store is None:
+            async with self._store_lock:
+                if self._store is None:
+                    self._store = await asyncio.to_thread(DevotionStore, settings.devotions_db_path)
+        return self._store
+
+    def in_window(self, day: datetime.date) -> bool:
+        """Only days near today are served, so arbitrary dates cannot trigger generation"""
+        offset = (day - today()).days
+        return -settings.devotions_days_kept <= offset <= settings.devotions_days_ahead
+
+    def _remember(self, payload: Dict[str, Any]) -> PrecomputedResponse:
+        response = PrecomputedResponse({"success": True, "devotion": payload}, max_age=_MAX_AGE)
+        self._responses[payload["date"]] = response
+        self._responses.move_to_end(payload["date"])
+        while len(self._responses) > settings.devotions_days_kept + settings.devotions_days_ahead + 1:
+            self._responses.popitem(last=False)
+        return response
+
+    async def cached(self, day: datetime.date) -> Optional[PrecomputedResponse]:
+        """The stored devotional for a day, without generating"""
+        key = day.isoformat()
+        if key in self._responses:
+            return self._responses[key]
+        payload = await asyncio.to_thread((await self._db()).get, key)
+        return self._remember(payload) if payload else None
+
+    async def latest(self, before: datetime.date) -> Optional[PrecomputedResponse]:
+        """The most recent stored devotional before a day, to serve while it can't be generated"""
+        payload = await asyncio.to_thread((await self._db()).latest_before, before.isoformat())
+        return self._remember(payload) if payload else None
+
+    async def _save(self, payload: Dict[str, Any]) -> PrecomputedResponse:
+        store = await self._db()
+        await asyncio.to_thread(store.put, payload)
+        # Re-read so a racing writer in another process and this one serve the same text
+        return self._remember(await asyncio.to_thread(store.get, payload["date"]) or payload)
+
+    def _start_generation(self, day: datetime.date, tokens: Optional[asyncio.Queue] = None) -> asyncio.Task:
+        """
+        Generate and store one day in a task of its own
+
+        The task outlives the request that started it, so a client that
+        disconnects mid-stream doesn't waste the generation, and later
+        requests for the same day await the same task.
+        """
+        key = day.isoformat()
+
+        async def generate() -> PrecomputedResponse:
+            try:
+                # Inside the try: a gateway that can't be built must still end the token stream
+                gateway = await llm_gateway()
+                if tokens is None:
+                    result = await gateway.complete("devotion", build_prompt(day))
+                    text, model = result.text, result.model
+                else:
+                    parts = []
+                    served: Dict[str, Any] = {}
+                    async for token in gateway.stream("devotion", build_prompt(day), served=served):
+                        parts.append(token)
+                        tokens.put_nowait(token)
+                    text, model = "".join(parts), served["model"]
+            finally:
+                if tokens is not None:
+                    tokens.put_nowait(_END)
+            with span("devotion.parse", **{"devotion.day": key}):
+                payload = parse_devotion(day, text, model)
+            return await self._save(payload)
+
+        task = asyncio.create_task(generate())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def get(self, day: datetime.date) -> PrecomputedResponse:
+        """The devotional for a day, generating it on a miss"""
+        response = await self.cached(day)
+        if response is not None:
+            return response
+        task = self._inflight.get(day.isoformat()) or self._start_generation(day)
+        return await asyncio.shield(task)
+
+    async def stream(self, day: datetime.date) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a missing day while streaming the model's text
+
+        Yields {"token": ...} deltas followed by {"devotion": payload}. If the
+        day is already stored or being generated elsewhere, only the final
+        devotion is yielded.
+        """
+        response = await self.cached(day)
+        if response is None:
+            task = self._inflight.get(day.isoformat())
+            if task is None:
+                tokens: asyncio.Queue = asyncio.Queue()
+                task = self._start_generation(day, tokens)
+                while (token := await tokens.get()) is not _END:
+                    yield {"token": token}
+            response = await asyncio.shield(task)
+        yield {"devotion": json.loads(response.bodies[None])["devotion"]}
+
+    async def calendar(self) -> Dict[str, Any]:
+        start = today()
+        first = start - datetime.timedelta(days=settings.devotions_days_kept)
+        last = start + datetime.timedelta(days=settings.devotions_days_ahead)
+        stored = await asyncio.to_thread((await self._db()).get_range, first.isoformat(), last.isoformat())
+        available = [payload["date"] for payload in stored]
+        upcoming = (start + datetime.timedelta(days=offset) for offset in range(settings.devotions_days_ahead + 1))
+        return {
+            "success": True,
+            "today": start.isoformat(),
+            "available": available,
+            "pending": [day.isoformat() for day in upcoming if day.isoformat() not in available]
+        }
+
+    async def prefill(self) -> int:
+        """
+        Generate every missing day from today through devotions_days_ahead
+
+        Returns:
+            Number of devotionals generated
+        """
+        start = today()
+        days = [start + datetime.timedelta(days=offset) for offset in range(settings.devotions_days_ahead + 1)]
+        missing = [day for day in days if await self.cached(day) is None]
+        slots = asyncio.Semaphore(settings.devotions_prefill_concurrency)
+
+        async def fill(day: datetime.date) -> bool:
+            async with slots:
+                try:
+                    with trace("devotion.prefill", **{"devotion.day": day.isoformat()}), upstream_priority(PREFETCH):
+                        await self.get(day)
+                    return True
+                except Exception as e:
+                    logger.error(f"Devotional prefill failed for {day.isoformat()}: {e}")
+                    return False
+
+        generated = sum(await asyncio.gather(*(fill(day) for day in missing)))
+        if missing:
+            logger.info(f"Devotional prefill generated {generated} of {len(missing)} missing days")
+        return generated
+
+    async def _run(self):
+        while True:
+            await self.prefill()
+            await asyncio.sleep(settings.devotions_prefill_interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+devotion_engine = DevotionEngine()
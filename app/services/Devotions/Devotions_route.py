@@ -0,0 +1,136 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import datetime
+import logging
+from zoneinfo import ZoneInfo
+
+from app.core.circuit_breaker import CircuitOpen, fallbacks, openai_breaker, retry_after_header
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.services.api_manager.llm_gateway import GatewayUnavailable
+from app.services.speech_to_text.voice_chat_pipeline import format_sse
+from .Deveotions_schema import DevotionResponse, DevotionCalendarResponse
+from .Devotions_generation import DevotionGenerationError, devotion_engine, today
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+devotions_router = APIRouter(
+    prefix="/devotions",
+    tags=["Devotions"],
+    responses={
+        404: {"description": "No devotional for that day"},
+        502: {"description": "The devotional could not be generated"},
+        503: {"description": "OpenAI is unavailable and no earlier devotional is stored"},
+        504: {"description": "Generation timed out"}
+    }
+)
+
+
+def _seconds_until_tomorrow() -> int:
+    now = datetime.datetime.now(ZoneInfo(settings.devotions_timezone))
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=now.tzinfo)
+    return max(60, int((midnight - now).total_seconds()))
+
+
+async def _stream_events(day: datetime.date):
+    """SSE for a first generation: token deltas, then the stored devotional"""
+    try:
+        async for event in devotion_engine.stream(day):
+            if "token" in event:
+                yield format_sse("token", {"text": event["token"]})
+            else:
+                yield format_sse("devotion", event["devotion"])
+    except Exception as e:
+        logger.error(f"Streaming devotional for {day.isoformat()} failed: {e}")
+        yield format_sse("error", {"message": "The devotional could not be generated. Please try again."})
+    yield format_sse("done", {})
+
+
+async def _recent_fallback(request: Request, day: datetime.date, error: CircuitOpen):
+    """While OpenAI is unavailable, serve the latest stored devotional (dated as written) instead of failing"""
+    response = await devotion_engine.latest(before=day)
+    if response is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Devotionals are temporarily unavailable",
+            headers={"Retry-After": retry_after_header(error)}
+        )
+    fallbacks.inc(route="devotions", source="recent")
+    served = response(request)
+    served.headers["Cache-Control"] = "no-store"
+    served.headers["X-Fallback"] = "recent"
+    return served
+
+
+async def _serve(request: Request, day: datetime.date, stream: bool):
+    if not devotion_engine.in_window(day):
+        raise HTTPException(status_code=404, detail="Devotionals are only available for recent and upcoming days")
+
+    response = await devotion_engine.cached(day)
+    if response is not None:
+        return response(request)
+
+    # Past days are only served from the store; generation covers today onwards
+    if day < today():
+        raise HTTPException(status_code=404, detail=f"No devotional was published for {day.isoformat()}")
+
+    try:
+        if stream:
+            openai_breaker.check()
+            return StreamingResponse(
+                _stream_events(day),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        response = await devotion_engine.get(day)
+    except CircuitOpen as e:
+        return await _recent_fallback(request, day, e)
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Devotional generation timed out")
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Devotionals are unavailable: OPEN_AI_API_KEY is not configured")
+    except DevotionGenerationError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=502, detail="The devotional could not be generated. Please try again.")
+    except Exception as e:
+        logger.error(f"Failed to generate devotional for {day.isoformat()}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to generate devotional")
+    return response(request)
+
+
+@devotions_router.get("/today", response_model=DevotionResponse)
+async def get_today_devotion(request: Request, stream: bool = False):
+    """
+    Today's devotional.
+
+    Served from the store (generated ahead of time). On a miss the devotional is
+    generated once; pass `stream=true` to receive it as Server-Sent Events
+    (`token` deltas, then `devotion`, then `done`).
+    """
+    response = await _serve(request, today(), stream)
+    if not isinstance(response, StreamingResponse) and "x-fallback" not in response.headers:
+        # The URL changes meaning at midnight, unlike /devotions/{day}
+        response.headers["Cache-Control"] = f"public, max-age={_seconds_until_tomorrow()}"
+    return response
+
+
+@devotions_router.get("/calendar", response_model=DevotionCalendarResponse)
+async def get_devotion_calendar():
+    """Days in the serving window that already have a devotional, and those still pending"""
+    return await devotion_engine.calendar()
+
+
+@devotions_router.get("/{day}", response_model=DevotionResponse)
+async def get_devotion(day: str, request: Request, stream: bool = False):
+    """
+    The devotional for a calendar day (YYYY-MM-DD).
+
+    Devotionals never change once written, so responses carry an ETag and a
+    day-long Cache-Control; revalidation with If-None-Match returns 304.
+    """
+    try:
+        parsed = datetime.date.fromisoformat(day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Day must be formatted as YYYY-MM-DD")
+    return await _serve(request, parsed, stream)
@@ -1,25 +1,19 @@
-from openai import AsyncOpenAI
+import logging
 from typing import Dict, Any
-from app.core.config import settings, BIBLE_SYSTEM_PROMPT
+from app.core.circuit_breaker import CircuitOpen
+from app.core.deadline import DeadlineExceeded
+from app.services.api_manager.llm_gateway import GatewayUnavailable, PromptTooLarge, llm_gateway
+from app.services.scripture.references import strip_invalid_citations
+
+logger = logging.getLogger(__name__)
 
 class BibleChatAPIManager:
     """Manages OpenAI API interactions for Bible chat functionality"""
     
     def __init__(self):
-        # Get configuration from settings
-        self.api_key = settings.openai_api_key
-        self.model = settings.openai_model
-        self.max_tokens = 1500
-        self.temperature = 0.7
-        self.top_p = 0.9
-        self.frequency_penalty = 0.0
-        self.presence_penalty = 0.0
-        
-        # Initialize the OpenAI client
-        self.client = AsyncOpenAI(api_key=self.api_key)
-        
-        # System prompt for Bible-focused responses
-        self.system_prompt = BIBLE_SYSTEM_PROMPT
+        # Prompt, model and generation settings live in the gateway's "bible_chat" profile.
+        # The gateway itself is fetched per call: building it is blocking work and needs the API key
+        self.route = "bible_chat"
     
     async def generate_bible_response(self, user_query: str) -> Dict[str, Any]:
         """
@@ -32,28 +26,21 @@ class BibleChatAPIManager:
             Dict containing the response and metadata
         """
         try:
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_query}
-            ]
-            
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                frequency_penalty=self.frequency_penalty,
-                presence_penalty=self.presence_penalty
-            )
+            gateway = await llm_gateway()
+            result = await gateway.complete(self.route, user_query)
+            text, removed = strip_invalid_citations(result.text, source="chat")
+            if removed:
+                logger.info(f"Removed citations of nonexistent verses from chat answer: {removed}")
             
             return {
                 "success": True,
-                "response": response.choices[0].message.content.strip(),
-                "usage": response.usage.model_dump() if response.usage else None,
-                "model": self.model
+                "response": text,
+                "usage": result.usage,
+                "model": result.model
             }
             
+        except (DeadlineExceeded, PromptTooLarge, CircuitOpen, GatewayUnavailable):
+            raise
         except Exception as e:
             # Handle both OpenAI errors and general exceptions
             return {
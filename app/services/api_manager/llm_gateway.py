@@ -0,0 +1,559 @@
+"""
+Unified async gateway for OpenAI chat completions
+Every chat call in the service goes through LLMGateway, which owns the system
+prompt templates, per-route generation settings, model selection (including
+per-query fast/full routing), timeouts, the pooled HTTP client, response
+caching, retries and metrics
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.capture import annotate_call, upstream_call
+from app.core.circuit_breaker import CircuitOpen, fallbacks, openai_breaker
+from app.core.config import settings, OPENAI_CONFIG, BIBLE_SYSTEM_PROMPT, JSON_GENERATOR_SYSTEM_PROMPT
+from app.core.deadline import DeadlineExceeded, iter_within_deadline, remaining, timeout_for, within_deadline
+from app.core.hedging import HedgeBudget, hedged_call
+from app.core.metrics import metrics
+from app.core.rate_limit import charge_quota
+from app.core.scheduler import BATCH, INTERACTIVE, current_priority, openai_scheduler
+from app.core.tracing import KIND_CLIENT, span, start_span
+from app.services.api_manager.model_router import RoutingDecision, model_router, observe_latency
+from app.services.api_manager.token_counter import (
+    TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, context_window, heuristic_count, token_counter
+)
+
+logger = logging.getLogger(__name__)
+
+# System prompt templates, referenced by name from route profiles
+PROMPT_TEMPLATES: Dict[str, str] = {
+    "bible": BIBLE_SYSTEM_PROMPT,
+    "json_generator": JSON_GENERATOR_SYSTEM_PROMPT,
+}
+
+
+@dataclass(frozen=True)
+class RouteProfile:
+    """Generation settings for one call site; unset values fall back to OPENAI_CONFIG"""
+    template: str
+    max_tokens: int = OPENAI_CONFIG["max_tokens"]
+    temperature: float = OPENAI_CONFIG["temperature"]
+    top_p: float = OPENAI_CONFIG["top_p"]
+    frequency_penalty: float = OPENAI_CONFIG["frequency_penalty"]
+    presence_penalty: float = OPENAI_CONFIG["presence_penalty"]
+    model: Optional[str] = None
+    cacheable: bool = False
+    # Prompt budget (system + user, counted locally); over it the call is rejected, or
+    # the user message is trimmed to fit when trim_overflow is set
+    max_prompt_tokens: Optional[int] = None
+    trim_overflow: bool = False
+    # Refuse calls whose remaining context leaves less room than this for the answer
+    min_completion_tokens: int = 64
+    # Scheduling class for upstream capacity, unless the caller's context sets one
+    priority: str = INTERACTIVE
+
+
+
+def _fits_any_query(template: str, max_chars: int) -> int:
+    """
+    A prompt budget every query the route's schema accepts fits in
+
+    Byte-level BPE never spends more than one token per UTF-8 byte, and a
+    character is at most four bytes, so a query counts at most 4 * max_chars;
+    the heuristic system prompt count is an upper bound too.
+    """
+    return heuristic_count(PROMPT_TEMPLATES[template]) + 4 * max_chars + 2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+
+
+ROUTE_PROFILES: Dict[str, RouteProfile] = {
+    # /bible-chat/query; queries are capped at max_query_length characters by the schema, so the
+    # budget only catches a prompt template or limit change, never a valid question
+    "bible_chat": RouteProfile(
+        template="bible", max_tokens=1500, cacheable=True,
+        max_prompt_tokens=_fits_any_query("bible", settings.max_query_length)
+    ),
+    # /stt/bible_ai_chat and the streaming voice pipeline; long transcripts are trimmed, not refused
+    "voice_chat": RouteProfile(
+        template="bible", max_tokens=512, cacheable=True, max_prompt_tokens=1400, trim_overflow=True
+    ),
+    # /verses/random batches; every call must be fresh
+    "verse_batch": RouteProfile(template="json_generator", max_tokens=800, max_prompt_tokens=1200, priority=BATCH),
+    # Daily devotionals; generated once per day and stored, so never response-cached here
+    "devotion": RouteProfile(template="json_generator", max_tokens=1200, max_prompt_tokens=800),
+}
+
+_requests = metrics.counter("llm_requests_total", "Chat completion calls by route, model and outcome")
+_latency = metrics.histogram("llm_request_seconds", "Chat completion latency by route")
+_retries = metrics.counter("llm_retries_total", "Retried chat completion calls by route and error")
+_tokens = metrics.counter("llm_tokens_total", "Tokens used by route and kind")
+_cache = metrics.counter("llm_cache_total", "Response cache lookups by route and result")
+_hedges = metrics.counter("llm_hedges_total", "Hedged duplicate requests sent by route")
+_hedge_wins = metrics.counter("llm_hedge_wins_total", "Hedged requests that finished before the primary, by route")
+_admission = metrics.counter("llm_prompt_admission_total", "Prompt budget checks by route and result")
+_predicted = metrics.counter("llm_prompt_tokens_predicted_total", "Locally counted prompt tokens by route")
+_prediction_error = metrics.histogram(
+    "llm_prompt_token_prediction_error_ratio",
+    "Relative error of local prompt token counts against reported usage, by route",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+)
+
+
+class PromptTooLarge(ValueError):
+    """Raised when a prompt cannot fit its route's token budget"""
+
+
+class GatewayUnavailable(RuntimeError):
+    """Raised when the gateway cannot be built because no OpenAI API key is configured"""
+
+
+@dataclass
+class ChatResult:
+    text: str
+    model: str
+    usage: Optional[Dict[str, Any]] = None
+    cached: bool = False
+    # Served from an expired cache entry because OpenAI was unavailable
+    stale: bool = False
+
+
+class LLMGateway:
+    """Single entry point for chat completions"""
+
+    def __init__(self):
+        if not OPENAI_CONFIG["api_key"]:
+            raise GatewayUnavailable("OPEN_AI_API_KEY is not configured")
+
+        # The SDK (and httpx under it) is the most expensive import in the app;
+        # pay for it on first use rather than at process start
+        import httpx
+        import openai
+
+        self.retryable_errors = (
+            openai.RateLimitError,
+            openai.APIConnectionError,  # includes APITimeoutError
+            openai.InternalServerError,
+        )
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=settings.openai_connect_timeout_seconds)
+        )
+        # Retries are handled here rather than in the SDK so they show up in metrics
+        self.client = openai.AsyncOpenAI(
+            api_key=OPENAI_CONFIG["api_key"],
+            base_url=settings.openai_base_url,
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.default_model = OPENAI_CONFIG["model"]
+        self.timeout_seconds = settings.openai_timeout_seconds
+        self.max_retries = settings.openai_max_retries
+        self.retry_base_delay = settings.openai_retry_base_delay_seconds
+        self.retry_max_delay = settings.openai_retry_max_delay_seconds
+        self.response_cache = TTLCache(
+            max_entries=settings.llm_response_cache_max_entries,
+            ttl_seconds=settings.llm_response_cache_ttl_seconds,
+            persist_path=settings.llm_response_cache_path
+        )
+        self.hedge_budget = HedgeBudget(settings.hedge_max_ratio, settings.hedge_burst)
+
+    def build_messages(self, route: str, user_content: str) -> List[Dict[str, str]]:
+        profile = ROUTE_PROFILES[route]
+        return [
+            {"role": "system", "content": PROMPT_TEMPLATES[profile.template]},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _params(self, profile: RouteProfile, model: Optional[str], overrides: Dict[str, Any]) -> Dict[str, Any]:
+        params = {
+            "model": model or profile.model or self.default_model,
+            "max_tokens": profile.max_tokens,
+            "temperature": profile.temperature,
+            "top_p": profile.top_p,
+            "frequency_penalty": profile.frequency_penalty,
+            "presence_penalty": profile.presence_penalty,
+        }
+        params.update(overrides)
+        return params
+
+    @staticmethod
+    def _route_model(
+        route: str,
+        profile: RouteProfile,
+        user_content: str,
+        model: Optional[str],
+        overrides: Dict[str, Any]
+    ) -> Tuple[Optional[str], Dict[str, Any], Optional[RoutingDecision]]:
+        """Let the model router pick the model when neither the caller nor the route profile fixes one"""
+        if model is not None or profile.model is not None or not model_router.routes(route):
+            return model, overrides, None
+        decision = model_router.choose(route, user_content)
+        if decision.max_tokens is not None and "max_tokens" not in overrides:
+            overrides = {**overrides, "max_tokens": decision.max_tokens}
+        return decision.model, overrides, decision
+
+    @staticmethod
+    def _routing_attributes(decision: Optional[RoutingDecision]) -> Dict[str, Any]:
+        if decision is None:
+            return {}
+        return {
+            "llm.tier": decision.tier, "llm.routing_reason": decision.reason,
+            "llm.intent": decision.intent, "llm.complexity": decision.complexity
+        }
+
+    def _admit(
+        self,
+        route: str,
+        profile: RouteProfile,
+        params: Dict[str, Any],
+        user_content: str,
+        overrides: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Count the prompt locally and fit it to the route's budgets before sending
+
+        Trims the user message if the route allows it, and lowers max_tokens to
+        the room left in the model's context window (unless overridden).
+
+        Returns:
+            The messages to send and their predicted prompt token count
+
+        Raises:
+            PromptTooLarge: If the prompt cannot be made to fit
+        """
+        model = params["model"]
+        messages = self.build_messages(route, user_content)
+        predicted = token_counter.count_messages(messages, model)
+        result = "ok"
+
+        budget = profile.max_prompt_tokens
+        if budget is not None and predicted > budget:
+            keep = token_counter.count(user_content, model) - (predicted - budget)
+            if not profile.trim_overflow or keep <= 0:
+                _admission.inc(route=route, result="rejected")
+                raise PromptTooLarge(f"Prompt is {predicted} tokens, over the {budget} token budget for {route}")
+            messages = self.build_messages(route, token_counter.truncate(user_content, keep, model))
+            predicted = token_counter.count_messages(messages, model)
+            result = "trimmed"
+
+        if "max_tokens" not in overrides:
+            params["max_tokens"] = min(params["max_tokens"], context_window(model) - predicted)
+        if params["max_tokens"] < profile.min_completion_tokens:
+            _admission.inc(route=route, result="rejected")
+            raise PromptTooLarge(f"Prompt is {predicted} tokens, leaving too little context for a reply on {route}")
+
+        _admission.inc(route=route, result=result)
+        _predicted.inc(predicted, route=route)
+        return messages, predicted
+
+    @staticmethod
+    def _cache_key(route: str, params: Dict[str, Any], user_content: str) -> str:
+        normalized = " ".join(user_content.lower().split())
+        raw = f"{route}|{params['model']}|{params['max_tokens']}|{normalized}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _hedge_delay(self, route: str) -> Optional[float]:
+        """Latency after which a call on this route is hedged, once enough samples exist"""
+        if not settings.hedge_enabled or _latency.sample_count(route=route) < settings.hedge_min_samples:
+            return None
+        return _latency.percentile(settings.hedge_latency_percentile, route=route)
+
+    async def _call(
+        self,
+        route: str,
+        model: str,
+        request: Callable[[float], Awaitable[Any]],
+        hedge: bool = False,
+        priority: Optional[str] = None
+    ) -> Any:
+        """
+        Run one upstream request with jittered exponential backoff on transient errors
+
+        Each attempt's timeout is cut to the time left in the request deadline,
+        and the attempt is cancelled if it is still running when the deadline passes.
+        Idempotent calls (hedge=True) may be duplicated once they pass the
+        route's recent latency percentile. With a priority, every attempt (and
+        hedge) holds a scheduler slot while it runs, but not while backing off.
+        Every attempt is reported to the OpenAI circuit breaker; while it is
+        open, CircuitOpen is raised without queueing or retrying.
+        """
+        openai_breaker.check()
+        send = request
+
+        async def send_once(timeout: float) -> Any:
+            with openai_breaker.guard(), upstream_call("openai", "chat.completions", model=model):
+                return await send(timeout)
+
+        async def request(timeout: float) -> Any:
+            if priority is None:
+                return await send_once(timeout)
+            async with openai_scheduler.slot(priority):
+                return await send_once(timeout)
+
+        for attempt in range(self.max_retries + 1):
+            timeout = timeout_for(self.timeout_seconds)
+            started = time.perf_counter()
+            try:
+                with span(
+                    "openai.chat.completions", KIND_CLIENT,
+                    **{"llm.route": route, "llm.model": model, "llm.attempt": attempt + 1}
+                ):
+                    async with within_deadline("OpenAI"):
+                        if hedge:
+                            result = await hedged_call(
+                                lambda: request(timeout),
+                                self._hedge_delay(route),
+                                self.hedge_budget,
+                                on_hedge=lambda: _hedges.inc(route=route),
+                                on_hedge_win=lambda: _hedge_wins.inc(route=route)
+                            )
+                        else:
+                            result = await request(timeout)
+            except CircuitOpen:
+                _requests.inc(route=route, model=model, outcome="circuit_open")
+                raise
+            except DeadlineExceeded:
+                _requests.inc(route=route, model=model, outcome="deadline")
+                raise
+            except self.retryable_errors as e:
+                _latency.observe(time.perf_counter() - started, route=route)
+                observe_latency(route, model, time.perf_counter() - started)
+                left = remaining()
+                if left is not None and left <= 0:
+                    _requests.inc(route=route, model=model, outcome="deadline")
+                    raise DeadlineExceeded("Request deadline exceeded waiting for OpenAI") from e
+                if attempt == self.max_retries:
+                    _requests.inc(route=route, model=model, outcome="error")
+                    raise
+                delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                if left is not None and left <= delay:
+                    _requests.inc(route=route, model=model, outcome="deadline")
+                    raise DeadlineExceeded("Not enough time left in the request deadline to retry") from e
+                _retries.inc(route=route, error=type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                _requests.inc(route=route, model=model, outcome="error")
+                raise
+            elapsed = time.perf_counter() - started
+            _latency.observe(elapsed, route=route)
+            observe_latency(route, model, elapsed)
+            _requests.inc(route=route, model=model, outcome="ok")
+            return result
+
+    async def complete(
+        self,
+        route: str,
+        user_content: str,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        **overrides
+    ) -> ChatResult:
+        """
+        Run a chat completion for a named route
+
+        Args:
+            route: Key into ROUTE_PROFILES
+            user_content: The user message
+            model: Override the route's model (and the model router)
+            use_cache: Set False to bypass the response cache for this call
+            **overrides: Extra or overriding create() parameters
+
+        Returns:
+            ChatResult with the stripped response text
+        """
+        with span("llm.complete", **{"llm.route": route}) as call_span:
+            profile = ROUTE_PROFILES[route]
+            model, overrides, decision = self._route_model(route, profile, user_content, model, overrides)
+            call_span.set(**self._routing_attributes(decision))
+            params = self._params(profile, model, overrides)
+            cache_key = self._cache_key(route, params, user_content) if profile.cacheable and use_cache else None
+
+            if cache_key:
+                cached = self.response_cache.get(cache_key)
+                _cache.inc(route=route, result="hit" if cached is not None else "miss")
+                call_span.set(**{"llm.model": params["model"], "llm.cache_hit": cached is not None})
+                if cached is not None:
+                    return ChatResult(text=cached, model=params["model"], cached=True)
+
+            messages, predicted = self._admit(route, profile, params, user_content, overrides)
+            priority = current_priority(profile.priority)
+            call_span.set(**{
+                "llm.model": params["model"], "llm.prompt_tokens_predicted": predicted, "llm.priority": priority
+            })
+            try:
+                response = await self._call(
+                    route, params["model"],
+                    lambda timeout: self.client.chat.completions.create(messages=messages, timeout=timeout, **params),
+                    hedge=True,
+                    priority=priority
+                )
+            except (CircuitOpen, *self.retryable_errors):
+                # An expired answer to the same question beats an error while OpenAI is down
+                stale = self.response_cache.get_stale(cache_key) if cache_key else None
+                if stale is None:
+                    raise
+                fallbacks.inc(route=route, source="stale_cache")
+                call_span.set(**{"llm.stale_fallback": True})
+                return ChatResult(text=stale, model=params["model"], cached=True, stale=True)
+
+            text = (response.choices[0].message.content or "").strip()
+            usage = response.usage.model_dump() if response.usage else None
+            annotate_call("chat.completions", chars=len(text), tokens=usage.get("completion_tokens") if usage else None)
+            if usage:
+                _tokens.inc(usage.get("prompt_tokens", 0), route=route, kind="prompt")
+                _tokens.inc(usage.get("completion_tokens", 0), route=route, kind="completion")
+                call_span.set(**{
+                    "llm.prompt_tokens": usage.get("prompt_tokens", 0),
+                    "llm.completion_tokens": usage.get("completion_tokens", 0)
+                })
+                charge_quota("llm_tokens", usage.get("total_tokens", 0))
+                model_router.record(
+                    route, params["model"], usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+                )
+                if usage.get("prompt_tokens"):
+                    _prediction_error.observe(abs(usage["prompt_tokens"] - predicted) / usage["prompt_tokens"], route=route)
+            if cache_key and text:
+                self.response_cache.set(cache_key, text)
+
+            return ChatResult(text=text, model=params["model"], usage=usage)
+
+    async def stream(
+        self,
+        route: str,
+        user_content: str,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        served: Optional[Dict[str, Any]] = None,
+        **overrides
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion for a named route, yielding text deltas
+
+        Pass a dict as `served` to have "model" set in it to the model that
+        answers (the routed or profile model, not necessarily the default).
+        """
+        profile = ROUTE_PROFILES[route]
+        model, overrides, decision = self._route_model(route, profile, user_content, model, overrides)
+        params = self._params(profile, model, overrides)
+        if served is not None:
+            served["model"] = params["model"]
+        cache_key = self._cache_key(route, params, user_content) if profile.cacheable and use_cache else None
+
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            _cache.inc(route=route, result="hit" if cached is not None else "miss")
+            if cached is not None:
+                yield cached
+                return
+
+        messages, predicted = self._admit(route, profile, params, user_content, overrides)
+        priority = current_priority(profile.priority)
+        parts = []
+        openai_breaker.check()
+        # The slot is held until the whole body has been read, not just the headers
+        async with openai_scheduler.slot(priority):
+            stream = await self._call(
+                route, params["model"],
+                lambda timeout: self.client.chat.completions.create(
+                    messages=messages, stream=True, timeout=timeout, **params
+                )
+            )
+
+            # Not made current: the generator may be resumed from a different context
+            body_span = start_span(
+                "openai.chat.completions.stream", KIND_CLIENT,
+                **{
+                    "llm.route": route, "llm.model": params["model"],
+                    "llm.prompt_tokens_predicted": predicted, "llm.priority": priority,
+                    **self._routing_attributes(decision)
+                }
+            )
+            started = time.perf_counter()
+            try:
+                async for chunk in iter_within_deadline(stream, "OpenAI"):
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts:
+                            body_span.set(**{"llm.first_token_ms": round((time.perf_counter() - started) * 1000, 1)})
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            except BaseException as e:
+                body_span.fail(e)
+                raise
+            finally:
+                body_span.end()
+
+        text = "".join(parts).strip()
+        # Streamed replies carry no usage block; charge the local counts instead
+        completion = token_counter.count(text, params["model"])
+        annotate_call(
+            "chat.completions", stream=True, chars=len(text), tokens=completion,
+            body_ms=round((time.perf_counter() - started) * 1000, 1)
+        )
+        _tokens.inc(predicted, route=route, kind="prompt")
+        _tokens.inc(completion, route=route, kind="completion")
+        charge_quota("llm_tokens", predicted + completion)
+        model_router.record(route, params["model"], predicted, completion)
+        if cache_key and text:
+            self.response_cache.set(cache_key, text)
+
+    def save_cache(self):
+        try:
+            self.response_cache.save()
+        except OSError as e:
+            logger.error(f"Failed to persist LLM response cache: {e}")
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+_gateway: Optional[LLMGateway] = None
+# Startup may warm the gateway from a worker thread while a request asks for it
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """The shared gateway, constructed on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+async def llm_gateway() -> LLMGateway:
+    """
+    The shared gateway for request handlers
+
+    Startup normally builds it; if that has not finished, it is built in a
+    worker thread so the SDK import and client setup never block the loop.
+
+    Raises:
+        GatewayUnavailable: If no OpenAI API key is configured
+    """
+    if _gateway is not None:
+        return _gateway
+    return await asyncio.to_thread(get_llm_gateway)
+
+
+def gateway_started() -> bool:
+    return _gateway is not None
+
+
+async def close_llm_gateway():
+    """Persist the response cache and close the connection pool, if the gateway was ever built"""
+    global _gateway
+    if _gateway is not None:
+        _gateway.save_cache()
+        await _gateway.aclose()
+        _gateway = None
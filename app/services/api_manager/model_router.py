@@ -0,0 +1,169 @@
+"""
+Latency- and cost-aware model routing
+Chooses between a fast, cheap model and the full model for each chat query
+from local features of the query (length, intent, whether a prayer is
+asked for). Borderline queries move to the fast model while the full model
+is missing the route's latency SLO, and every query does while the hour's
+estimated spend is over budget.
+"""
+
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple
+
+from app.core.config import settings, MODEL_PRICES, MODEL_ROUTING
+from app.core.metrics import metrics
+
+FAST = "fast"
+FULL = "full"
+
+_decisions = metrics.counter("llm_model_routing_total", "Routing decisions by route, tier, model and reason")
+_cost = metrics.counter("llm_cost_usd_total", "Estimated upstream spend in USD by route and model")
+_complexity = metrics.histogram(
+    "llm_query_complexity", "Estimated query complexity (0-1) by route and intent",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+_model_latency = metrics.histogram("llm_model_request_seconds", "Chat completion latency by route and model")
+
+# Checked in order; the first match is the query's intent
+_INTENTS: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("prayer", re.compile(r"\bpray(?:er|ers|ing)?\b|\bintercession\b|\bamen\b", re.IGNORECASE)),
+    ("comparison", re.compile(
+        r"\bcompar\w*|\bdifferen\w* (?:between|in)\b|\b(?:versions?|translations?)\b|\b(?:kjv|niv|esv|nlt)\b", re.IGNORECASE
+    )),
+    ("theological", re.compile(
+        r"\bwhy\b|\bexplain\w*|\bcontradict\w*|\binterpret\w*|\btheolog\w*|\bdoctrin\w*|\btrinity\b|\bsalvation\b"
+        r"|\bpredestin\w*|\bsuffering\b|\bevil\b|\bmeaning\b|\bviews?\b|\bdebate\w*",
+        re.IGNORECASE
+    )),
+    ("factual", re.compile(
+        r"^\s*(?:who|when|where|which|how many|how old|how long|name|list|what (?:is|was|are|were) the (?:name|number))\b",
+        re.IGNORECASE
+    )),
+)
+_INTENT_COMPLEXITY = {"prayer": 0.7, "comparison": 0.7, "theological": 0.55, "factual": 0.1, "general": 0.35}
+
+# Queries scoring below SIMPLE go to the fast model; between SIMPLE and COMPLEX they do only
+# while the full model is over its latency SLO
+SIMPLE = 0.35
+COMPLEX = 0.65
+
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    tier: str
+    model: str
+    reason: str
+    intent: str
+    complexity: float
+    # Lower completion cap for the fast tier, if the route sets one
+    max_tokens: Optional[int] = None
+
+
+def classify(query: str) -> Tuple[str, float]:
+    """(intent, complexity in 0-1) from the query text alone"""
+    intent = "general"
+    for name, pattern in _INTENTS:
+        if pattern.search(query):
+            intent = name
+            break
+    # Long or multi-part questions need the full model whatever they ask
+    length = min(0.4, len(query.split()) / 150)
+    parts = 0.1 * min(2, max(0, query.count("?") - 1))
+    return intent, min(1.0, _INTENT_COMPLEXITY[intent] + length + parts)
+
+
+class _HourlySpend:
+    """Estimated spend over the trailing hour"""
+
+    def __init__(self):
+        self._entries: Deque[Tuple[float, float]] = deque()
+        self.total = 0.0
+
+    def add(self, amount: float, now: float):
+        self._entries.append((now, amount))
+        self.total += amount
+
+    def current(self, now: float) -> float:
+        while self._entries and self._entries[0][0] < now - 3600.0:
+            self.total -= self._entries.popleft()[1]
+        return self.total
+
+
+class ModelRouter:
+    """Picks the model for queries on the routes listed in MODEL_ROUTING"""
+
+    def __init__(self, full_model: str, fast_model: str, budget_per_hour: float, enabled: bool = True):
+        """
+        Args:
+            full_model: The default, most capable model
+            fast_model: The low-latency model simple queries are sent to
+            budget_per_hour: Estimated USD spend per trailing hour above which every query goes to the fast model
+            enabled: When False, every query uses the full model
+        """
+        self.models = {FULL: full_model, FAST: fast_model}
+        self.budget_per_hour = budget_per_hour
+        self.enabled = enabled
+        self._spend = _HourlySpend()
+
+    def routes(self, route: str) -> bool:
+        return self.enabled and route in MODEL_ROUTING
+
+    def _over_slo(self, route: str) -> bool:
+        """Whether the full model's recent p95 on this route misses the route's SLO"""
+        policy = MODEL_ROUTING[route]
+        model = self.models[FULL]
+        if _model_latency.sample_count(route=route, model=model) < policy["min_samples"]:
+            return False
+        return _model_latency.percentile(95, route=route, model=model) > policy["slo_p95_seconds"]
+
+    def choose(self, route: str, query: str) -> RoutingDecision:
+        """Route one query; only call for routes where routes() is True"""
+        intent, complexity = classify(query)
+        _complexity.observe(complexity, route=route, intent=intent)
+        if self._spend.current(time.monotonic()) >= self.budget_per_hour:
+            tier, reason = FAST, "budget"
+        elif complexity < SIMPLE:
+            tier, reason = FAST, "simple"
+        elif complexity >= COMPLEX:
+            tier, reason = FULL, "complex"
+        elif self._over_slo(route):
+            tier, reason = FAST, "latency_slo"
+        else:
+            tier, reason = FULL, "moderate"
+        max_tokens = MODEL_ROUTING[route].get("fast_max_tokens") if tier == FAST else None
+        decision = RoutingDecision(tier, self.models[tier], reason, intent, round(complexity, 3), max_tokens)
+        _decisions.inc(route=route, tier=tier, model=decision.model, reason=reason)
+        return decision
+
+    def record(self, route: str, model: str, prompt_tokens: int, completion_tokens: int):
+        """Charge a finished call's estimated cost against the hourly budget"""
+        prices = _prices(model)
+        if prices is None:
+            return
+        cost = (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+        self._spend.add(cost, time.monotonic())
+        _cost.inc(cost, route=route, model=model)
+
+
+def _prices(model: str) -> Optional[Tuple[float, float]]:
+    """(input, output) USD per million tokens, matched by the longest model-name prefix"""
+    best = None
+    for prefix in MODEL_PRICES:
+        if model.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return MODEL_PRICES[best] if best else None
+
+
+def observe_latency(route: str, model: str, seconds: float):
+    _model_latency.observe(seconds, route=route, model=model)
+
+
+model_router = ModelRouter(
+    full_model=settings.openai_model,
+    fast_model=settings.openai_fast_model,
+    budget_per_hour=settings.llm_cost_budget_per_hour,
+    enabled=settings.llm_routing_enabled
+)
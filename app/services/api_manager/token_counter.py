@@ -0,0 +1,130 @@
+"""
+Local token counting for chat prompts
+Counts tokens with tiktoken once its encodings have been loaded by load()
+(at startup, in a worker thread: tiktoken may download its BPE files), and
+with a conservative word-piece heuristic until then or without tiktoken, so
+prompt size is known before anything is sent upstream. Counting never
+loads or fetches anything itself.
+"""
+
+import logging
+import math
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Context window sizes by model prefix (longest matching prefix wins)
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4.1": 1_000_000,
+    "gpt-4-32k": 32_768,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+# Per-message framing the chat format adds around each message, plus the reply primer
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Words, numbers and single punctuation marks; long words count one token per 4 characters
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def heuristic_count(text: str) -> int:
+    """Approximate BPE token count, erring high for long or unusual words"""
+    return sum(math.ceil(len(piece) / 4) for piece in _PIECES.findall(text))
+
+
+def context_window(model: str) -> int:
+    best = ""
+    for prefix in MODEL_CONTEXT_WINDOWS:
+        if model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return MODEL_CONTEXT_WINDOWS[best] if best else DEFAULT_CONTEXT_WINDOW
+
+
+class TokenCounter:
+    """Counts tokens per model, caching encoders and the counts of fixed texts"""
+
+    def __init__(self):
+        self._encoders: Dict[str, Optional[object]] = {}
+        self._fixed: Dict[Tuple[str, str, bool], int] = {}
+        self._lock = threading.Lock()
+
+    def _encoder(self, model: str):
+        # Models load() hasn't reached yet are counted heuristically
+        return self._encoders.get(model)
+
+    def load(self, models: Iterable[str]):
+        """
+        Load the tiktoken encodings for `models`; blocking (may download), so run it off the event loop
+
+        Set TIKTOKEN_CACHE_DIR to a directory populated at build time to keep this offline.
+        """
+        for model in models:
+            if model in self._encoders:
+                continue
+            encoder = self._load_encoder(model)
+            with self._lock:
+                self._encoders[model] = encoder
+
+    @staticmethod
+    def _load_encoder(model: str):
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base" if model.startswith(("gpt-4o", "gpt-4.1")) else "cl100k_base")
+        except Exception as e:
+            # Encoding files are fetched unless TIKTOKEN_CACHE_DIR has them; offline, stay on the heuristic
+            logger.warning(f"tiktoken unavailable for {model}, using heuristic token counts: {e}")
+            return None
+
+    def count(self, text: str, model: str) -> int:
+        encoder = self._encoder(model)
+        if encoder is None:
+            return heuristic_count(text)
+        return len(encoder.encode(text, disallowed_special=()))
+
+    def count_fixed(self, text: str, model: str) -> int:
+        """Count a text that never changes (a system prompt), once per model"""
+        # Keyed by counting method too, so heuristic counts taken before load() aren't kept after it
+        key = (model, text, model in self._encoders)
+        if key not in self._fixed:
+            self._fixed[key] = self.count(text, model)
+        return self._fixed[key]
+
+    def count_messages(self, messages: List[Dict[str, str]], model: str) -> int:
+        """Prompt tokens for a chat request; system messages are counted once and cached"""
+        total = TOKENS_PER_REPLY
+        for message in messages:
+            counter = self.count_fixed if message["role"] == "system" else self.count
+            total += TOKENS_PER_MESSAGE + counter(message["content"], model)
+        return total
+
+    def truncate(self, text: str, max_tokens: int, model: str) -> str:
+        """The longest prefix of text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        encoder = self._encoder(model)
+        if encoder is not None:
+            tokens = encoder.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else encoder.decode(tokens[:max_tokens])
+
+        used = 0
+        for match in _PIECES.finditer(text):
+            used += math.ceil(len(match.group()) / 4)
+            if used > max_tokens:
+                return text[:match.start()].rstrip()
+        return text
+
+
+token_counter = TokenCounter()
@@ -9,7 +9,7 @@ audio_router = APIRouter(prefix="/audio", tags=["Audio Generation"])
 @audio_router.post("/generate", response_model=AudioGenerationResponse)
 async def generate_audio(request: AudioGenerationRequest, http_request: Request):
     service = AudioGenerationService()
-    result = service.generate_audio(request.text)
+    result = await service.generate_audio_async(request.text)
     
     if not result["success"]:
         raise HTTPException(status_code=result["status"], detail="Failed to generate audio")
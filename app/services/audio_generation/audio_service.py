@@ -1,18 +1,40 @@
-import requests
 import uuid
 import base64
+import asyncio
+import time
+from typing import AsyncIterator
+from app.core.capture import upstream_call
+from app.core.circuit_breaker import elevenlabs_breaker
 from app.core.config import settings
+from app.core.deadline import iter_within_deadline, timeout_for, within_deadline
+from app.core.rate_limit import charge_quota
+from app.core.scheduler import elevenlabs_scheduler
+from app.core.tracing import KIND_CLIENT, span, start_span
+
+
+class TextToSpeechError(RuntimeError):
+    """ElevenLabs answered with an error status"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Text-to-speech failed with status {status_code}")
+        self.status_code = status_code
+
+
+class TextToSpeechUnavailable(RuntimeError):
+    """No ElevenLabs API key is configured"""
 
 
 class AudioGenerationService:
     
+    # Shared across instances so streaming calls reuse pooled connections
+    _http_client = None
+    
     def __init__(self):
         self.api_key = settings.elevenlabs_api_key
         self.voice_id = "pNInz6obpgDQGcFmaJgB"
-        
-    def generate_audio(self, text: str, request_id: str = None) -> dict:
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream"
-        
+        self.url = f"{settings.elevenlabs_base_url}/v1/text-to-speech/{self.voice_id}/stream"
+    
+    def _request_parts(self, text: str):
         headers = {
             "Accept": "audio/mpeg",
             "Content-Type": "application/json",
@@ -29,16 +51,31 @@ class AudioGenerationService:
                 "use_speaker_boost": True
             }
         }
+        return headers, data
+        
+    def generate_audio(self, text: str, request_id: str = None) -> dict:
+        import requests
+        
+        headers, data = self._request_parts(text)
+        charge_quota("tts_chars", len(text))
         
         try:
-            response = requests.post(url, json=data, headers=headers, stream=True)
-            
-            if response.status_code == 200:
-                audio_content = b""
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        audio_content += chunk
+            with span("elevenlabs.text_to_speech", KIND_CLIENT, **{"tts.characters": len(text)}) as tts_span:
+                response = requests.post(
+                    self.url, json=data, headers=headers, stream=True,
+                    timeout=(5.0, timeout_for(60.0))
+                )
+                tts_span.set(**{"http.status_code": response.status_code})
+                
+                if response.status_code == 200:
+                    audio_content = b""
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            audio_content += chunk
+                else:
+                    audio_content = None
                 
+            if audio_content is not None:
                 # Store in memory cache with request_id
                 if not request_id:
                     request_id = str(uuid.uuid4())
@@ -69,6 +106,90 @@ class AudioGenerationService:
                 "audio_content": None
             }
     
+    async def generate_audio_async(self, text: str, request_id: str = None) -> dict:
+        """
+        generate_audio off the event loop, holding an ElevenLabs scheduler slot
+
+        The outcome is reported to the ElevenLabs circuit breaker; while it is
+        open this raises CircuitOpen without calling out.
+        """
+        elevenlabs_breaker.check()
+        async with elevenlabs_scheduler.slot():
+            probe = elevenlabs_breaker.before_call()
+            started = time.monotonic()
+            try:
+                with upstream_call("elevenlabs", "text_to_speech") as call:
+                    # At the deadline the request gives up; the thread finishes (or times out) on its own
+                    async with within_deadline("ElevenLabs"):
+                        result = await asyncio.to_thread(self.generate_audio, text, request_id)
+                    call.update(status=result["status"], bytes=len(result["audio_content"] or b""))
+            except BaseException:
+                elevenlabs_breaker.abandon(probe)
+                raise
+            failed = result["status"] >= 500 or result["status"] == 429
+            elevenlabs_breaker.record(time.monotonic() - started, failed, probe)
+        return result
+    
+    @classmethod
+    def _async_client(cls):
+        if cls._http_client is None:
+            import httpx
+            cls._http_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+        return cls._http_client
+    
+    @classmethod
+    async def close_client(cls):
+        if cls._http_client is not None:
+            await cls._http_client.aclose()
+            cls._http_client = None
+    
+    async def stream_audio(self, text: str, chunk_size: int = 8192) -> AsyncIterator[bytes]:
+        """
+        Stream MP3 audio for text from ElevenLabs without blocking the event loop
+        
+        Yields audio chunks as they arrive; raises TextToSpeechError on a non-200
+        reply and TextToSpeechUnavailable if no API key is configured.
+        """
+        import httpx
+        
+        if not self.api_key:
+            raise TextToSpeechUnavailable("ELEVENLABS_API_KEY is not configured")
+        headers, data = self._request_parts(text)
+        charge_quota("tts_chars", len(text))
+        timeout = httpx.Timeout(timeout_for(30.0), connect=5.0)
+        # Not made current: the generator may be resumed from a different context
+        tts_span = start_span("elevenlabs.text_to_speech", KIND_CLIENT, **{"tts.characters": len(text)})
+        try:
+            elevenlabs_breaker.check()
+            async with elevenlabs_scheduler.slot():
+                client = self._async_client()
+                # The breaker judges the call by its response headers; the body streams afterwards
+                with elevenlabs_breaker.guard(), upstream_call("elevenlabs", "text_to_speech", stream=True) as call:
+                    async with within_deadline("ElevenLabs"):
+                        response = await client.send(
+                            client.build_request("POST", self.url, json=data, headers=headers, timeout=timeout),
+                            stream=True
+                        )
+                    tts_span.set(**{"http.status_code": response.status_code})
+                    if response.status_code != 200:
+                        await response.aclose()
+                        raise TextToSpeechError(response.status_code)
+                body_started = time.monotonic()
+                received = 0
+                try:
+                    async for chunk in iter_within_deadline(response.aiter_bytes(chunk_size), "ElevenLabs"):
+                        if chunk:
+                            received += len(chunk)
+                            yield chunk
+                finally:
+                    call.update(bytes=received, body_ms=round((time.monotonic() - body_started) * 1000, 1))
+                    await response.aclose()
+        except BaseException as e:
+            tts_span.fail(e)
+            raise
+        finally:
+            tts_span.end()
+    
     @staticmethod
     def get_cached_audio(request_id: str):
         cache = getattr(AudioGenerationService, '_audio_cache', {})
@@ -0,0 +1,142 @@
+from fastapi import APIRouter, File, Form, Header, HTTPException, Response, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Any, Dict, Optional
+import logging
+import os
+
+from app.core.config import settings
+from app.core.jobs import IdempotencyConflict, Job, SUCCEEDED
+from app.core.rate_limit import current_clients
+from app.services.speech_to_text.audio_ingest import AudioTooLargeError
+from app.services.speech_to_text.speech_to_text_service import stt_service
+from app.services.speech_to_text.voice_chat_pipeline import format_sse
+from .jobs_schema import JobStatusResponse, JobSubmitResponse, TextToSpeechJobRequest
+from .jobs_service import job_queue
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+jobs_router = APIRouter(
+    prefix="/jobs",
+    tags=["Background Jobs"],
+    responses={404: {"description": "Job not found"}}
+)
+
+
+async def _submit(
+    response: Response,
+    job_type: str,
+    params: Dict[str, Any],
+    idempotency_key: Optional[str],
+    attachment=None
+) -> Dict[str, Any]:
+    clients = current_clients()
+    # Keys are scoped to the submitting client so two clients can't collide on one
+    scoped_key = f"{clients[-1] if clients else 'anonymous'}:{idempotency_key}" if idempotency_key else None
+    try:
+        job, created = await job_queue.submit(job_type, params, scoped_key, clients, attachment)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    status_url = f"{settings.api_v1_prefix}/jobs/{job.id}"
+    response.status_code = 202 if created else 200
+    response.headers["Location"] = status_url
+    return {
+        "job_id": job.id,
+        "type": job.type,
+        "status": job.status,
+        "created": created,
+        "status_url": status_url,
+        "events_url": f"{status_url}/events"
+    }
+
+
+def _status(job: Job) -> Dict[str, Any]:
+    status = job.public()
+    if job.type == "tts" and job.status == SUCCEEDED:
+        status["result"] = {**status["result"], "audio_url": f"{settings.api_v1_prefix}/jobs/{job.id}/audio"}
+    return status
+
+
+@jobs_router.post("/verses", response_model=JobSubmitResponse, status_code=202)
+async def submit_verses_job(response: Response, idempotency_key: Optional[str] = Header(None)):
+    """Generate 15 verses and 15 prayers in the background (the job form of /verses/random)"""
+    return await _submit(response, "verses", {}, idempotency_key)
+
+
+@jobs_router.post("/tts", response_model=JobSubmitResponse, status_code=202)
+async def submit_tts_job(
+    request: TextToSpeechJobRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Narrate a long text in the background; the finished MP3 is at /jobs/{job_id}/audio"""
+    if not settings.elevenlabs_api_key:
+        # The job could only fail; /ready reports the same condition
+        raise HTTPException(status_code=503, detail="Text-to-speech is not configured")
+    return await _submit(response, "tts", {"text": request.text}, idempotency_key)
+
+
+@jobs_router.post("/transcribe_long", response_model=JobSubmitResponse, status_code=202)
+async def submit_transcription_job(
+    response: Response,
+    audio_file: UploadFile = File(...),
+    language: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Transcribe a long recording in the background (the job form of /stt/transcribe_long)"""
+    if not audio_file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    try:
+        audio = await stt_service.ingest_long(audio_file)
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "filename": audio.filename,
+        "format": audio.format,
+        "size": audio.size,
+        "sha256": audio.sha256,
+        "language": language
+    }
+    return await _submit(response, "transcription", params, idempotency_key, attachment=audio.file)
+
+
+@jobs_router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Poll a job's status, progress and (once finished) result or error"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _status(job)
+
+
+@jobs_router.get("/{job_id}/events")
+async def stream_job(job_id: str):
+    """Server-Sent Events: a `status` event on every change until the job finishes, then `done`"""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            yield format_sse("status", _status(job))
+        yield format_sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@jobs_router.get("/{job_id}/audio")
+async def download_job_audio(job_id: str):
+    """The MP3 produced by a finished text-to-speech job"""
+    job = await job_queue.get(job_id)
+    path = job_queue.artifact_path(job_id, "audio.mp3")
+    if job is None or job.type != "tts" or job.status != SUCCEEDED or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+    return FileResponse(path, media_type="audio/mpeg", filename=f"preacher_{job_id}.mp3")
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class TextToSpeechJobRequest(BaseModel):
+    """Text for a long text-to-speech job"""
+    text: str = Field(
+        ...,
+        min_length=1,
+        max_length=settings.jobs_tts_max_chars,
+        description="The text to narrate; long texts are synthesized sentence-aligned chunk by chunk"
+    )
+
+
+class JobSubmitResponse(BaseModel):
+    """Returned as soon as a job is accepted"""
+    job_id: str = Field(..., description="Identifier to poll or stream")
+    type: str = Field(..., description="Job type")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    created: bool = Field(..., description="False when an Idempotency-Key matched an earlier submission")
+    status_url: str = Field(..., description="Poll this URL for the job status")
+    events_url: str = Field(..., description="Server-Sent Events stream of status changes")
+
+
+class JobStatusResponse(BaseModel):
+    """The current state of a job"""
+    id: str
+    type: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    progress: float = Field(..., description="Fraction complete, 0.0 to 1.0")
+    attempts: int = Field(..., description="How many times the job has started")
+    result: Optional[Dict[str, Any]] = Field(None, description="The job output once it has succeeded")
+    error: Optional[str] = Field(None, description="Why the job failed")
+    created_at: float = Field(..., description="Unix time the job was submitted")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
@@ -0,0 +1,102 @@
+"""
+Background job types
+Registers the long-running work that can be moved off the HTTP request:
+verse batches, long text-to-speech and long-audio transcription
+"""
+
+import asyncio
+import os
+import re
+from typing import Any, Callable, Dict, List
+
+from app.core.config import settings, JOB_CONCURRENCY
+from app.core.jobs import Job, JobQueue
+from app.services.audio_generation.audio_service import AudioGenerationService
+from app.services.Daily_verse_generation.Verse_generation_services import generate_random_verses
+from app.services.speech_to_text.audio_ingest import IngestedAudio
+from app.services.speech_to_text.speech_to_text_service import stt_service
+
+job_queue = JobQueue(
+    db_path=settings.jobs_db_path,
+    artifact_dir=settings.jobs_artifact_dir,
+    max_workers=settings.jobs_max_workers,
+    concurrency=JOB_CONCURRENCY,
+    retention_seconds=settings.jobs_retention_hours * 3600
+)
+
+# Sentence ends, so TTS chunks break where a pause sounds natural
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_for_tts(text: str, max_chars: int) -> List[str]:
+    """Split text into chunks of at most max_chars, on sentence boundaries where possible"""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        # A single sentence longer than a chunk is split on whitespace
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _write(path: str, data: bytes, mode: str = "ab"):
+    with open(path, mode) as f:
+        f.write(data)
+
+
+async def run_verses_job(job: Job, progress: Callable[[float], None]) -> Dict[str, Any]:
+    return await generate_random_verses()
+
+
+async def run_tts_job(job: Job, progress: Callable[[float], None]) -> Dict[str, Any]:
+    """Narrate long text chunk by chunk into one MP3 (MP3 frames concatenate cleanly)"""
+    text = job.params["text"]
+    chunks = split_for_tts(text, settings.jobs_tts_chunk_chars)
+    path = job_queue.artifact_path(job.id, "audio.mp3")
+    partial = path + ".part"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A rerun after a restart starts the file over
+    await asyncio.to_thread(_write, partial, b"", "wb")
+
+    service = AudioGenerationService()
+    size = 0
+    for index, chunk in enumerate(chunks):
+        audio = bytearray()
+        async for part in service.stream_audio(chunk):
+            audio += part
+        await asyncio.to_thread(_write, partial, bytes(audio))
+        size += len(audio)
+        progress((index + 1) / len(chunks))
+
+    os.replace(partial, path)
+    return {"characters": len(text), "segments": len(chunks), "bytes": size}
+
+
+async def run_transcription_job(job: Job, progress: Callable[[float], None]) -> Dict[str, Any]:
+    """Transcribe an upload saved at submission time, then discard it"""
+    params = job.params
+    path = job_queue.artifact_path(job.id, "input")
+    with open(path, "rb") as f:
+        audio = IngestedAudio(
+            file=f, filename=params["filename"], format=params["format"], size=params["size"], sha256=params["sha256"]
+        )
+        result = await stt_service.transcribe_long(audio, params.get("language"))
+    os.remove(path)
+    return {**result, "filename": params["filename"]}
+
+
+job_queue.register("verses", run_verses_job)
+job_queue.register("tts", run_tts_job)
+job_queue.register("transcription", run_transcription_job)
@@ -0,0 +1,309 @@
+"""
+Scripture reference parsing and canon validation
+Parses references such as "1 Cor 13:4-7", "Ps 23", "Gen 1:1-2:3" or
+"Romans 5:8; 6:23" into ScriptureReference values and checks them against the
+canon table, so invented chapters and verses are caught locally in a few
+microseconds instead of with another model call
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.metrics import metrics
+from .canon import BOOK_ALIASES, CANON, EXTRA_VERSES
+
+_checked = metrics.counter(
+    "scripture_references_total", "Generated scripture references checked against the canon, by source and result"
+)
+
+
+class InvalidReference(ValueError):
+    """Raised when text cannot be parsed as a scripture reference"""
+
+
+@dataclass(frozen=True)
+class ScriptureReference:
+    """A verse, verse range or whole chapter(s) of one book"""
+    book: str
+    chapter: int
+    verse: Optional[int] = None
+    end_chapter: Optional[int] = None
+    end_verse: Optional[int] = None
+
+    def __str__(self) -> str:
+        text = f"{self.book} {self.chapter}"
+        if self.verse is not None:
+            text += f":{self.verse}"
+        if self.end_chapter is not None and self.end_chapter != self.chapter:
+            text += f"-{self.end_chapter}"
+            if self.end_verse is not None:
+                text += f":{self.end_verse}"
+        elif self.end_verse is not None:
+            text += f"-{self.end_verse}"
+        return text
+
+
+def _normalize(name: str) -> str:
+    return name.lower().replace(".", "").replace(" ", "")
+
+
+_NUMBER_WORDS = {
+    "1": "1", "2": "2", "3": "3", "i": "1", "ii": "2", "iii": "3",
+    "1st": "1", "2nd": "2", "3rd": "3", "first": "1", "second": "2", "third": "3",
+}
+
+
+def _build_book_index() -> Dict[str, str]:
+    """Normalized name ("1cor", "songofsongs") -> canonical book"""
+    index: Dict[str, str] = {}
+    for book, aliases in BOOK_ALIASES.items():
+        number, _, base = book.partition(" ") if book[0].isdigit() else ("", "", book)
+        for name in (base,) + aliases:
+            index.setdefault(number + _normalize(name), book)
+    return index
+
+
+_BOOK_INDEX = _build_book_index()
+
+# Book names are matched loosely here and resolved through _BOOK_INDEX, which is
+# far cheaper than an alternation of every name and abbreviation
+_BOOK = (
+    r"(?:(?:[123](?:st|nd|rd)?|iii|ii|i|first|second|third)\s*)?[a-z]+\.?(?:\s+of\s+(?:solomon|songs))?"
+)
+_DASH = r"\s*[-\u2010-\u2015]\s*"
+_VERSE = r"\d{1,3}[a-c]?"
+
+# A whole structured field: book, then chapter/verse locations separated by commas and semicolons
+_FIELD = re.compile(r"\s*(?P<book>(?:[123]\s*)?[a-z][a-z. ]*?)\s*(?P<rest>\d.*)", re.IGNORECASE | re.DOTALL)
+_LOCATION = re.compile(
+    r"(?P<chapter>\d{1,3})(?:\s*[:.]\s*(?P<verse>" + _VERSE + r"))?"
+    r"(?:" + _DASH + r"(?P<to>\d{1,3})[a-c]?(?:\s*[:.]\s*(?P<to_verse>" + _VERSE + r"))?)?\s*$"
+)
+_TRANSLATION = re.compile(r"\s*\(?\b(?:KJV|NKJV|NIV|ESV|NLT|NASB|RSV|NRSV|CSB|HCSB|AMP|MSG)\b\)?\s*$", re.IGNORECASE)
+
+# Citations inside prose are found from their "chapter:verse" (so "Mark 4 of the plan" is
+# not one), then the book is read from the few characters before it
+_ANCHOR = re.compile(r"(?<![\d:])(\d{1,3})\s*:\s*(?=\d)")
+_BOOK_BEFORE = re.compile(r"(?<![\w])(?P<book>" + _BOOK + r")\s*$", re.IGNORECASE)
+_VERSES = re.compile(
+    _VERSE + r"(?:" + _DASH + r"\d{1,3}(?::\d{1,3})?[a-c]?)?"
+    r"(?:\s*,\s*\d{1,3}[a-c]?(?:" + _DASH + r"\d{1,3}[a-c]?)?(?![\d:]))*"
+)
+_BOOK_WINDOW = 24
+
+
+def resolve_book(name: str) -> Optional[str]:
+    """Canonical book name for a name or abbreviation ("1 Cor", "II Kings", "Ps"), or None"""
+    name = name.strip().rstrip(".")
+    number, _, rest = name.partition(" ")
+    prefix = _NUMBER_WORDS.get(number.lower()) if rest else None
+    if prefix is None:
+        match = re.match(r"([123])(?:st|nd|rd)?(\D.*)", name, re.IGNORECASE)
+        if match:
+            prefix, rest = match.group(1), match.group(2)
+        else:
+            prefix, rest = "", name
+    return _BOOK_INDEX.get(prefix + _normalize(rest))
+
+
+def verse_count(book: str, chapter: int) -> int:
+    """Verses in a chapter (0 if the book has no such chapter)"""
+    chapters = CANON[book]
+    if not 1 <= chapter <= len(chapters):
+        return 0
+    return max(chapters[chapter - 1], EXTRA_VERSES.get((book, chapter), 0))
+
+
+def is_valid(reference: ScriptureReference) -> bool:
+    """Whether every chapter and verse the reference names exists, and any range runs forwards"""
+    start_verses = verse_count(reference.book, reference.chapter)
+    if not start_verses or (reference.verse is not None and not 1 <= reference.verse <= start_verses):
+        return False
+    end_chapter = reference.end_chapter if reference.end_chapter is not None else reference.chapter
+    if end_chapter < reference.chapter:
+        return False
+    end_verses = verse_count(reference.book, end_chapter)
+    if not end_verses:
+        return False
+    if reference.end_verse is not None:
+        if not 1 <= reference.end_verse <= end_verses:
+            return False
+        if end_chapter == reference.chapter and reference.end_verse < (reference.verse or 1):
+            return False
+    return True
+
+
+def _verse(text: Optional[str]) -> Optional[int]:
+    # Partial-verse suffixes ("16a") refer to the verse itself
+    return int(text.rstrip("abc")) if text else None
+
+
+def _location(book: str, text: str, chapter: Optional[int]) -> ScriptureReference:
+    """
+    One location after a book: "3:16", "3:16-18", "1:1-2:3", "23", "1-3", or
+    (with `chapter` carried over from a preceding comma list) a bare verse "18"
+    """
+    match = _LOCATION.match(text.lstrip())
+    if not match:
+        raise InvalidReference(f"Unrecognised reference location: {text.strip()!r}")
+    first, verse, to, to_verse = match.groups()
+    first, verse, to, to_verse = int(first), _verse(verse), int(to) if to else None, _verse(to_verse)
+
+    if verse is None and chapter is not None:
+        # "John 3:16, 18" or "John 3:16, 18-20": bare numbers continue the chapter's verse list
+        return ScriptureReference(book, chapter, first, None, to)
+    if verse is None and len(CANON[book]) == 1:
+        # Single-chapter books are cited by verse alone ("Jude 3", "Philemon 4-6")
+        return ScriptureReference(book, 1, first, None, to)
+    if verse is None:
+        return ScriptureReference(book, first, None, to if to != first else None, None)
+    if to_verse is not None:
+        return ScriptureReference(book, first, verse, to, to_verse)
+    return ScriptureReference(book, first, verse, None, to)
+
+
+def _locations(book: str, text: str) -> List[ScriptureReference]:
+    """A chapter's comma-separated locations ("3:16, 18-20")"""
+    references = []
+    chapter = None
+    for piece in text.split(","):
+        reference = _location(book, piece, chapter)
+        references.append(reference)
+        if reference.verse is not None:
+            chapter = reference.end_chapter or reference.chapter
+    return references
+
+
+def parse_references(text: str) -> List[ScriptureReference]:
+    """
+    Parse a reference field into one or more references
+
+    Semicolons separate references, and may omit a repeated book
+    ("Romans 5:8; 6:23"); commas separate verses or ranges within a chapter
+    ("John 3:16, 18"). A trailing translation ("(NIV)") is ignored.
+
+    Raises:
+        InvalidReference: If a part cannot be parsed or names an unknown book
+    """
+    references: List[ScriptureReference] = []
+    book: Optional[str] = None
+    text = text.rstrip()
+    if text[-1:].isalpha() or text.endswith(")"):
+        text = _TRANSLATION.sub("", text)
+    for part in text.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        if not part[0].isdigit() or (part[1:2].isspace() and part[2:3].isalpha()) or part[1:3].isalpha():
+            match = _FIELD.match(part)
+            book = resolve_book(match.group("book")) if match else None
+            if book is None:
+                raise InvalidReference(f"No known book in {part!r}")
+            part = match.group("rest")
+        elif book is None:
+            raise InvalidReference(f"No book in {part!r}")
+        references += _locations(book, part)
+    if not references:
+        raise InvalidReference("Empty reference")
+    return references
+
+
+def check_reference(text: str, source: str = "other") -> Optional[str]:
+    """
+    Validate a generated reference field
+
+    Args:
+        text: The reference as written, e.g. "Hab 3:17-18 (ESV)"
+        source: Metrics label for where the reference came from
+
+    Returns:
+        The canonical form ("Habakkuk 3:17-18") if every part exists, otherwise None
+    """
+    try:
+        references = parse_references(text)
+    except InvalidReference:
+        _checked.inc(source=source, result="unparsed")
+        return None
+    if not all(is_valid(reference) for reference in references):
+        _checked.inc(source=source, result="invalid")
+        return None
+    _checked.inc(source=source, result="valid")
+    return "; ".join(str(reference) for reference in references)
+
+
+@dataclass
+class Citation:
+    """A chapter:verse citation found in prose"""
+    start: int
+    end: int
+    text: str
+    book: str
+    written_book: str
+    references: List[ScriptureReference]
+    valid: List[bool]
+
+
+def find_citations(text: str) -> List[Citation]:
+    """Every "Book chapter:verse" citation in free text, with per-reference validity"""
+    citations = []
+    position = 0
+    for anchor in _ANCHOR.finditer(text):
+        if anchor.start() < position:
+            continue
+        book_match = _BOOK_BEFORE.search(text, max(position, anchor.start() - _BOOK_WINDOW), anchor.start())
+        # Book names are capitalised in prose; this skips "the job 3:00 slot"
+        if book_match is None or not (text[book_match.start()].isupper() or text[book_match.start()].isdigit()):
+            continue
+        book = resolve_book(book_match.group("book"))
+        verses = _VERSES.match(text, anchor.end())
+        if book is None or verses is None:
+            continue
+        try:
+            references = _locations(book, f"{anchor.group(1)}:{verses.group(0)}")
+        except InvalidReference:
+            continue
+        position = verses.end()
+        citations.append(Citation(
+            start=book_match.start(), end=position, text=text[book_match.start():position],
+            book=book, written_book=book_match.group("book"),
+            references=references, valid=[is_valid(reference) for reference in references]
+        ))
+    return citations
+
+
+def strip_invalid_citations(text: str, source: str = "chat") -> Tuple[str, List[str]]:
+    """
+    Remove citations of chapters or verses that don't exist from an answer
+
+    A citation with some valid parts keeps just those; one with none is cut
+    back to its book name ("Obadiah 3:5 says" becomes "Obadiah says"), or
+    dropped with its parentheses when it stood alone in them.
+
+    Returns:
+        The cleaned text and the citations that were removed
+    """
+    citations = find_citations(text)
+    removed: List[str] = []
+    parts: List[str] = []
+    position = 0
+    for citation in citations:
+        for valid in citation.valid:
+            _checked.inc(source=source, result="valid" if valid else "invalid")
+        if all(citation.valid):
+            continue
+        removed.append(citation.text)
+        kept = [str(ref) for ref, valid in zip(citation.references, citation.valid) if valid]
+        start, end = citation.start, citation.end
+        replacement = "; ".join(kept) if kept else citation.written_book
+        if not kept and text[start - 1:start] == "(" and text[end:end + 1] == ")":
+            start, end, replacement = start - 1, end + 1, ""
+            while start > position and text[start - 1] == " ":
+                start -= 1
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    if not removed:
+        return text, removed
+    parts.append(text[position:])
+    return "".join(parts), removed
@@ -0,0 +1,110 @@
+"""
+Streaming ingestion for uploaded audio
+Reads uploads in fixed-size chunks, sniffs the real container format from the
+first chunk, enforces the size cap as soon as it is crossed and hashes the
+bytes on the way through
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+
+class AudioTooLargeError(ValueError):
+    """Raised when an upload crosses the configured size cap"""
+
+
+@dataclass
+class IngestedAudio:
+    """An upload that passed size and format checks, rewound and ready to send"""
+    file: BinaryIO
+    filename: str
+    format: str
+    size: int
+    sha256: str
+
+
+def detect_audio_format(head: bytes) -> Optional[str]:
+    """
+    Identify the audio container from its leading magic bytes
+
+    Args:
+        head: The first bytes of the file (at least 12 for MP4 brands)
+
+    Returns:
+        One of 'wav', 'mp3', 'm4a', 'mp4', 'webm', or None if unrecognised
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    # MPEG audio frame sync; layer bits 00 would be AAC ADTS, which Whisper won't take as MP3
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0 and head[1] & 0x06):
+        return "mp3"
+    if head[4:8] == b"ftyp":
+        return "m4a" if head[8:11] == b"M4A" else "mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    return None
+
+
+def normalized_filename(filename: str, audio_format: str) -> str:
+    """Give the upload the extension of its real format; Whisper keys decoding off it"""
+    stem = filename.rsplit(".", 1)[0] if "." in filename else filename
+    return f"{stem or 'audio'}.{audio_format}"
+
+
+async def ingest_upload(
+    upload: UploadFile,
+    max_bytes: int,
+    allowed_formats: set,
+    chunk_size: int = 64 * 1024
+) -> IngestedAudio:
+    """
+    Validate an upload chunk by chunk without materialising it in memory
+
+    Args:
+        upload: The multipart upload (already spooled by Starlette)
+        max_bytes: Reject as soon as more than this many bytes have been read
+        allowed_formats: Container formats accepted by the caller
+        chunk_size: Read buffer size; bounds per-upload memory
+
+    Returns:
+        IngestedAudio with the file rewound to the start
+
+    Raises:
+        AudioTooLargeError: If the upload exceeds max_bytes
+        ValueError: If the upload is empty or not a supported audio format
+    """
+    digest = hashlib.sha256()
+    size = 0
+    audio_format = None
+
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+
+        if audio_format is None:
+            audio_format = detect_audio_format(chunk[:16])
+            if audio_format not in allowed_formats:
+                raise ValueError("Unsupported format: file content is not WAV, MP3, MP4/M4A or WebM audio")
+
+        size += len(chunk)
+        if size > max_bytes:
+            raise AudioTooLargeError(
+                f"File too large: exceeds {max_bytes / (1024 * 1024):.0f}MB limit"
+            )
+        digest.update(chunk)
+
+    if size == 0:
+        raise ValueError("Empty audio file")
+
+    await upload.seek(0)
+    return IngestedAudio(
+        file=upload.file,
+        filename=normalized_filename(upload.filename or "audio", audio_format),
+        format=audio_format,
+        size=size,
+        sha256=digest.hexdigest()
+    )
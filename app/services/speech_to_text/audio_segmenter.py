@@ -0,0 +1,162 @@
+"""
+Long-audio segmentation and transcript stitching
+Splits PCM WAV recordings into overlapping segments that fit under the Whisper
+upload limit, preferring quiet points as cut positions, and joins the
+per-segment transcripts back together with the duplicated overlap removed
+"""
+
+import io
+import re
+import wave
+from array import array
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List
+
+
+@dataclass
+class AudioSegment:
+    """One WAV-encoded slice of a longer recording"""
+    index: int
+    start_seconds: float
+    end_seconds: float
+    data: bytes
+
+
+def wav_duration_seconds(file: BinaryIO) -> float:
+    """Duration of a PCM WAV file, leaving the file rewound"""
+    try:
+        with wave.open(file, "rb") as reader:
+            return reader.getnframes() / float(reader.getframerate())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Unreadable WAV file: {e}")
+    finally:
+        file.seek(0)
+
+
+def encode_wav(frames: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Wrap raw little-endian PCM frames in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(sample_width)
+        writer.setframerate(sample_rate)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _quietest_frame(reader, params, lo: int, hi: int, block_frames: int) -> int:
+    """
+    Find the centre of the lowest-energy block between frames lo and hi
+
+    Only 16-bit PCM is analysed; other sample widths fall back to the midpoint.
+    """
+    if params.sampwidth != 2 or hi - lo < block_frames:
+        return (lo + hi) // 2
+
+    reader.setpos(lo)
+    samples = array("h")
+    samples.frombytes(reader.readframes(hi - lo))
+    block = block_frames * params.nchannels
+
+    best_pos, best_energy = (lo + hi) // 2, None
+    for offset in range(0, len(samples) - block + 1, block):
+        energy = sum(s * s for s in samples[offset:offset + block])
+        if best_energy is None or energy < best_energy:
+            best_energy = energy
+            best_pos = lo + (offset + block // 2) // params.nchannels
+    return best_pos
+
+
+def iter_wav_segments(
+    file: BinaryIO,
+    segment_seconds: float,
+    overlap_seconds: float,
+    silence_search_seconds: float,
+    max_segment_bytes: int
+) -> Iterator[AudioSegment]:
+    """
+    Lazily split a PCM WAV file into overlapping, self-contained WAV segments
+
+    Each cut lands on the quietest 20 ms block within silence_search_seconds of
+    the target position, and every segment after the first also repeats the
+    last overlap_seconds of its predecessor so words split by a cut are heard
+    whole at least once. Segments are read from the file one at a time.
+
+    Args:
+        file: Seekable WAV file object
+        segment_seconds: Target segment length before overlap
+        overlap_seconds: Audio repeated at the start of each following segment
+        silence_search_seconds: Window either side of the target cut to search
+        max_segment_bytes: Hard cap on encoded segment size
+
+    Raises:
+        ValueError: If the file is not PCM WAV
+    """
+    try:
+        reader = wave.open(file, "rb")
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Unreadable WAV file: {e}")
+
+    with reader:
+        params = reader.getparams()
+        rate = params.framerate
+        frame_bytes = params.sampwidth * params.nchannels
+        total = params.nframes
+
+        overlap = int(overlap_seconds * rate)
+        search = int(silence_search_seconds * rate)
+        max_frames = (max_segment_bytes - 64) // frame_bytes
+        step = min(int(segment_seconds * rate), max_frames - overlap - search)
+        if step <= search:
+            raise ValueError("Segment settings leave no room for audio; lower the overlap or search window")
+        block = max(1, rate // 50)
+
+        index, start = 0, 0
+        while start < total:
+            target = start + step
+            if target >= total:
+                end = total
+            else:
+                end = _quietest_frame(reader, params, target - search, min(target + search, total), block)
+
+            seg_start = max(0, start - overlap)
+            reader.setpos(seg_start)
+            frames = reader.readframes(end - seg_start)
+            yield AudioSegment(
+                index=index,
+                start_seconds=seg_start / rate,
+                end_seconds=end / rate,
+                data=encode_wav(frames, rate, params.nchannels, params.sampwidth)
+            )
+            index += 1
+            start = end
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(parts: List[str], max_overlap_words: int = 40, min_match_words: int = 2) -> str:
+    """
+    Join ordered segment transcripts, dropping words repeated across the overlap
+
+    The longest run of words that ends one transcript and starts the next
+    (compared case- and punctuation-insensitively) is kept only once.
+    """
+    words: List[str] = []
+    for part in parts:
+        incoming = part.split()
+        if not words:
+            words.extend(incoming)
+            continue
+
+        tail = [_normalize_word(w) for w in words[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in incoming[:max_overlap_words]]
+        duplicated = 0
+        for k in range(min(len(tail), len(head)), min_match_words - 1, -1):
+            if tail[-k:] == head[:k]:
+                duplicated = k
+                break
+        words.extend(incoming[duplicated:])
+
+    return " ".join(words)
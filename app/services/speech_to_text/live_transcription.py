@@ -0,0 +1,87 @@
+"""
+Live transcription sessions for the streaming STT WebSocket
+Segments incoming PCM as it arrives and transcribes finished segments
+concurrently, reporting partial transcripts while the user is still speaking
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+from app.services.speech_to_text.audio_segmenter import stitch_transcripts
+from app.services.speech_to_text.speech_to_text_service import stt_service
+from app.services.speech_to_text.stream_segmenter import LiveSegment, StreamingSegmenter
+
+logger = logging.getLogger(__name__)
+
+
+class LiveTranscriptionSession:
+    """One client's live audio stream"""
+
+    def __init__(
+        self,
+        send_json: Callable[[dict], Awaitable[None]],
+        sample_rate: int,
+        channels: int,
+        language: Optional[str] = None
+    ):
+        self.send_json = send_json
+        self.language = language
+        self.segmenter = StreamingSegmenter(
+            sample_rate=sample_rate,
+            channels=channels,
+            min_segment_seconds=settings.stt_stream_min_segment_seconds,
+            max_segment_seconds=settings.stt_stream_max_segment_seconds,
+            pause_seconds=settings.stt_stream_pause_seconds,
+            silence_rms=settings.stt_stream_silence_rms,
+            overlap_seconds=settings.stt_stream_overlap_seconds
+        )
+        self.tasks: List[asyncio.Task] = []
+        # Per segment: whether it repeats the end of the previous one
+        self.overlapped: List[bool] = []
+        # When this many segments are awaiting Whisper, stop reading from the
+        # socket so a slow upstream pushes back on the client instead of piling up audio
+        self._pending = asyncio.Semaphore(settings.stt_stream_max_pending_segments)
+
+    async def feed(self, data: bytes):
+        """Buffer a PCM chunk and start transcribing any segment it completes"""
+        for segment in self.segmenter.feed(data):
+            await self._submit(segment)
+
+    async def _submit(self, segment: LiveSegment):
+        await self._pending.acquire()
+        index = len(self.tasks)
+        self.overlapped.append(segment.overlapped)
+        self.tasks.append(asyncio.create_task(self._transcribe(index, segment.data)))
+
+    async def _transcribe(self, index: int, segment: bytes) -> str:
+        try:
+            text = await stt_service.transcribe(segment, f"live{index:04d}.wav", self.language)
+            await self.send_json({"type": "partial", "segment": index, "text": text})
+            return text
+        except Exception as e:
+            logger.error(f"Live transcription failed for segment {index}: {e}")
+            await self.send_json({"type": "error", "segment": index, "message": "Segment could not be transcribed"})
+            return ""
+        finally:
+            self._pending.release()
+
+    async def finish(self) -> str:
+        """Transcribe the trailing audio and return the stitched transcript"""
+        final = self.segmenter.flush()
+        if final:
+            await self._submit(final)
+        parts = await asyncio.gather(*self.tasks)
+        # Only segments cut mid-speech repeat audio; stitching a pause cut could drop a genuinely repeated phrase
+        runs: List[List[str]] = []
+        for part, overlapped in zip(parts, self.overlapped):
+            if overlapped and runs:
+                runs[-1].append(part)
+            else:
+                runs.append([part])
+        return " ".join(filter(None, (stitch_transcripts([part for part in run if part]) for run in runs)))
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
@@ -1,20 +1,33 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import logging
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.services.api_manager.llm_gateway import GatewayUnavailable
 from app.services.speech_to_text.speech_to_text_service import stt_service
+from app.services.speech_to_text.audio_ingest import AudioTooLargeError
+from app.services.speech_to_text.speech_to_text_schema import LongTranscriptionResponse
+from app.services.speech_to_text.voice_chat_pipeline import voice_chat_events
+from app.services.speech_to_text.live_transcription import LiveTranscriptionSession
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Speech-to-Text"], prefix="/stt")
 
 @router.post("/bible_ai_chat")
-async def transcribe_and_respond(audio_file: UploadFile = File(...)):
+async def transcribe_and_respond(audio_file: UploadFile = File(...), language: Optional[str] = Form(None)):
     """Transcribe audio file and send to GPT-4 for chatbot response"""
     if not audio_file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
     try:
-        # Read file content
-        content = await audio_file.read()
+        # Validate the upload in chunks instead of reading it all into memory
+        audio = await stt_service.ingest(audio_file)
         
         # Transcribe the audio to text
-        transcribed_text = await stt_service.transcribe(content, audio_file.filename)
+        transcribed_text = await stt_service.transcribe(audio.file, audio.filename, language, audio.sha256)
         
         # Send the transcribed text to GPT-4 for a Bible-focused chatbot response
         chatbot_response = await stt_service.get_bible_gpt_response(transcribed_text)
@@ -26,7 +39,130 @@ async def transcribe_and_respond(audio_file: UploadFile = File(...)):
             "filename": audio_file.filename
         }
     
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Speech-to-text is unavailable: OPEN_AI_API_KEY is not configured")
     except Exception as e:
+        logger.error(f"Voice chat for {audio_file.filename} failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing audio or generating response")
+
+
+@router.post("/transcribe_long", response_model=LongTranscriptionResponse)
+async def transcribe_long(audio_file: UploadFile = File(...), language: Optional[str] = Form(None)):
+    """Transcribe long recordings (sermons, prayer journals) by segmenting WAV audio"""
+    if not audio_file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    try:
+        audio = await stt_service.ingest_long(audio_file)
+        result = await stt_service.transcribe_long(audio, language)
+
+        return LongTranscriptionResponse(
+            success=True,
+            filename=audio_file.filename,
+            **result
+        )
+
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Speech-to-text is unavailable: OPEN_AI_API_KEY is not configured")
+    except Exception as e:
+        logger.error(f"Long transcription of {audio_file.filename} failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error transcribing long audio")
+
+
+@router.post("/voice_chat")
+async def voice_chat(audio_file: UploadFile = File(...), language: Optional[str] = Form(None)):
+    """
+    Voice-to-voice Bible chat over Server-Sent Events
+
+    Streams the transcript, then chat tokens as they are generated, then MP3
+    audio for each finished sentence while later sentences are still being
+    written, so playback can start long before the full answer exists.
+    """
+    if not audio_file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    try:
+        audio = await stt_service.ingest(audio_file)
+        transcribed_text = await stt_service.transcribe(audio.file, audio.filename, language, audio.sha256)
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except GatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Speech-to-text is unavailable: OPEN_AI_API_KEY is not configured")
+    except Exception as e:
+        logger.error(f"Transcribing {audio_file.filename} for voice chat failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error processing audio")
+
+    return StreamingResponse(
+        voice_chat_events(transcribed_text),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/stream")
+async def stream_transcription(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    channels: int = 1,
+    language: Optional[str] = None
+):
+    """
+    Real-time transcription over a WebSocket
+
+    Send raw 16-bit little-endian PCM as binary frames while the user speaks,
+    then a text frame "end" (or {"type": "end"}). Finished segments are
+    transcribed while audio is still arriving and reported as
+    {"type": "partial", "segment": n, "text": ...}; the stitched transcript
+    follows as {"type": "final", "text": ...}.
+    """
+    if not 8000 <= sample_rate <= 48000 or channels not in (1, 2):
+        await websocket.close(code=1003)
+        return
+
+    await websocket.accept()
+    session = LiveTranscriptionSession(websocket.send_json, sample_rate, channels, language)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                session.cancel()
+                return
+
+            if message.get("bytes"):
+                if len(message["bytes"]) > settings.stt_stream_max_chunk_bytes:
+                    session.cancel()
+                    await websocket.close(code=1009)
+                    return
+                await session.feed(message["bytes"])
+            elif message.get("text"):
+                text = message["text"].strip()
+                try:
+                    command = json.loads(text).get("type") if text.startswith("{") else text
+                except ValueError:
+                    command = None
+                if command == "end":
+                    break
+
+        transcript = await session.finish()
+        await websocket.send_json({"type": "final", "text": transcript})
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        session.cancel()
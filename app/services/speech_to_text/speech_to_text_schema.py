@@ -6,4 +6,11 @@ class SpeechToTextRequest(BaseModel):
     language: str = Field(..., description="The language of the audio")
 
 class SpeechToTextResponse(BaseModel):
-    transcription: str = Field(..., description="The transcribed text")
\ No newline at end of file
+    transcription: str = Field(..., description="The transcribed text")
+
+class LongTranscriptionResponse(BaseModel):
+    success: bool = Field(..., description="Whether the transcription succeeded")
+    transcription: str = Field(..., description="The stitched transcript of the whole recording")
+    segments: int = Field(..., description="Number of segments the recording was split into")
+    duration_seconds: Optional[float] = Field(None, description="Recording length, when known")
+    filename: str = Field(..., description="The uploaded file name")
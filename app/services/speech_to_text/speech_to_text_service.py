@@ -1,102 +1,242 @@
-import openai
-from openai import AsyncOpenAI
-import tempfile
-import os
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Union
+from fastapi import UploadFile
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.capture import upstream_call
+from app.core.deadline import timeout_for, within_deadline
+from app.core.circuit_breaker import openai_breaker
+from app.core.scheduler import openai_scheduler
+from app.core.tracing import KIND_CLIENT, span
+from app.services.api_manager.llm_gateway import llm_gateway
+from app.services.scripture.references import strip_invalid_citations
+from app.services.speech_to_text.audio_ingest import (
+    IngestedAudio,
+    detect_audio_format,
+    ingest_upload,
+    normalized_filename,
+)
+from app.services.speech_to_text.audio_segmenter import (
+    AudioSegment,
+    iter_wav_segments,
+    stitch_transcripts,
+    wav_duration_seconds,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
 class STTService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.sync_client = openai.OpenAI(api_key=settings.openai_api_key)  # For transcription which doesn't have async support yet
+        # The gateway's pooled OpenAI client, shared rather than opening a second pool
+        self.client = None
         self.model = "whisper-1"
         self.supported_formats = {'mp3', 'mp4', 'wav', 'm4a', 'webm'}
-        self.max_size_mb = 25
+        self.max_size_mb = settings.stt_max_upload_mb
+        self.chunk_size = settings.stt_ingest_chunk_size
+        # Bound in-flight Whisper calls so a burst of uploads can't exhaust the connection pool
+        self.max_concurrency = settings.stt_max_concurrency
+        self._transcription_slots = asyncio.Semaphore(self.max_concurrency)
+        # Retries and kiosk devices resend identical audio; key on content, not filename
+        self.transcript_cache = TTLCache(
+            max_entries=settings.transcript_cache_max_entries,
+            ttl_seconds=settings.transcript_cache_ttl_seconds,
+            persist_path=settings.transcript_cache_path
+        )
+
+    async def openai_client(self):
+        """
+        The OpenAI client Whisper calls go through, taken from the gateway on first use
 
-    async def transcribe(self, audio_data: bytes, filename: str) -> str:
-        """Transcribe audio to text using OpenAI Whisper"""
-        try:
-            # Validate file size
-            size_mb = len(audio_data) / (1024 * 1024)
-            if size_mb > self.max_size_mb:
-                raise ValueError(f"File too large: {size_mb:.1f}MB (max: {self.max_size_mb}MB)")
+        Raises:
+            GatewayUnavailable: If no OpenAI API key is configured
+        """
+        if self.client is None:
+            self.client = (await llm_gateway()).client
+        return self.client
 
-            # Validate format
-            ext = filename.split('.')[-1].lower() if '.' in filename else ''
-            if ext not in self.supported_formats:
-                raise ValueError(f"Unsupported format: {ext}")
+    def save_cache(self):
+        """Persist the transcript cache (no-op when no path is configured)"""
+        try:
+            self.transcript_cache.save()
+        except OSError as e:
+            logger.error(f"Failed to persist transcript cache: {e}")
+
+    async def ingest(self, upload: UploadFile) -> IngestedAudio:
+        """Stream-validate an upload: size cap, magic-byte format check and content hash"""
+        with span("stt.ingest"):
+            return await ingest_upload(
+                upload,
+                max_bytes=self.max_size_mb * 1024 * 1024,
+                allowed_formats=self.supported_formats,
+                chunk_size=self.chunk_size
+            )
 
-            # Create temp file and transcribe
-            with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as tmp:
-                tmp.write(audio_data)
-                tmp_path = tmp.name
+    async def ingest_long(self, upload: UploadFile) -> IngestedAudio:
+        """Like ingest(), but with the larger cap used by long-audio mode"""
+        with span("stt.ingest", **{"stt.long": True}):
+            return await ingest_upload(
+                upload,
+                max_bytes=settings.stt_long_max_upload_mb * 1024 * 1024,
+                allowed_formats=self.supported_formats,
+                chunk_size=self.chunk_size
+            )
 
-            try:
-                with open(tmp_path, 'rb') as audio_file:
-                    response = self.sync_client.audio.transcriptions.create(
-                        model=self.model,
-                        file=audio_file
-                    )
-                return response.text
-            finally:
-                os.unlink(tmp_path)
+    async def transcribe(
+        self,
+        audio_data: Union[bytes, BinaryIO],
+        filename: str,
+        language: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> str:
+        """
+        Transcribe audio to text using OpenAI Whisper
+
+        Args:
+            audio_data: Raw bytes, or a file object already validated by ingest()
+            filename: Name sent to Whisper; its extension selects the decoder
+            language: Optional ISO-639-1 hint passed through to Whisper
+            content_hash: SHA-256 of the audio (from ingest()); enables the transcript
+                cache for file objects. Computed here for raw bytes.
+        """
+        try:
+            if isinstance(audio_data, (bytes, bytearray)):
+                # Validate file size
+                size_mb = len(audio_data) / (1024 * 1024)
+                if size_mb > self.max_size_mb:
+                    raise ValueError(f"File too large: {size_mb:.1f}MB (max: {self.max_size_mb}MB)")
+
+                # Validate format from the content, not the extension
+                audio_format = detect_audio_format(audio_data[:16])
+                if audio_format not in self.supported_formats:
+                    raise ValueError("Unsupported format: file content is not WAV, MP3, MP4/M4A or WebM audio")
+                filename = normalized_filename(filename, audio_format)
+                content_hash = content_hash or hashlib.sha256(audio_data).hexdigest()
+
+            cache_key = f"{content_hash}:{self.model}:{language or 'auto'}" if content_hash else None
+            if cache_key:
+                cached = self.transcript_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            options = {"language": language} if language else {}
+
+            # Send a (filename, content) tuple on the async client: no temp file
+            # round-trip and no blocking of the event loop
+            client = await self.openai_client()
+            openai_breaker.check()
+            async with self._transcription_slots, openai_scheduler.slot():
+                with openai_breaker.guard(), span(
+                    "openai.audio.transcriptions", KIND_CLIENT, **{"stt.model": self.model, "stt.filename": filename}
+                ), upstream_call("openai", "audio.transcriptions") as call:
+                    async with within_deadline("Whisper"):
+                        response = await client.audio.transcriptions.create(
+                            model=self.model,
+                            file=(filename, audio_data),
+                            timeout=timeout_for(settings.openai_timeout_seconds),
+                            **options
+                        )
+                    call["chars"] = len(response.text)
+            if cache_key:
+                self.transcript_cache.set(cache_key, response.text)
+            return response.text
 
         except Exception as e:
             logger.error(f"Transcription failed: {e}")
             raise
 
-    async def get_bible_gpt_response(self, transcribed_text: str) -> str:
-        """Generate Bible-related response using GPT-4 model"""
-        BIBLE_SYSTEM_PROMPT = """
-            You are a knowledgeable Bible assistant with expertise in multiple Bible versions (KJV, NIV, ESV, NLT).
-            Your sole purpose is to answer questions, provide guidance, and offer teachings rooted strictly in biblical principles and Christian theology.
-            You will not provide responses outside of Bible-related topics or ventures beyond biblical content.
-
-            Your role is to:
-
-            1. Answer questions about the Bible with accuracy and wisdom.
-            2. Generate prayers based on biblical principles and scriptural foundation.
-            3. Provide scripture references when relevant, citing book, chapter, and verse.
-            4. Compare different Bible versions when appropriate (KJV, NIV, ESV, NLT).
-            5. Acknowledge contradictions or differing interpretations when they exist – be honest about them, and respectfully provide clarity.
-            6. Maintain a respectful, spiritual tone throughout all responses, keeping in line with biblical teachings.
-            7. Draw from biblical knowledge to provide meaningful, contextual responses that align with Christian teachings.
-            8. Address theological questions with balanced perspectives, staying within the framework of biblical doctrine.
-
-            When responding:
-
-            - Always cite relevant scripture verses with full references (book, chapter:verse).
-            - If there are different interpretations or contradictions, acknowledge them honestly and respectfully while maintaining a balanced view.
-            - For prayer requests, create biblically-grounded prayers using scriptural language and principles, ensuring they align with Christian doctrine.
-            - Be truthful about theological debates, uncertainties, or controversial topics, but always keep responses rooted in scripture.
-            - **Strictly focus on Bible-related content and Christian teachings**—do not answer any questions that stray from these areas.
-            - Reference multiple Bible versions (KJV, NIV, ESV, NLT) when helpful for understanding.
-            - Provide context for difficult passages or apparent contradictions within the Bible itself.
-            - Maintain reverence while being educational, compassionate, and helpful, guided by the principles of the Word of God.
+    async def transcribe_long(self, audio: IngestedAudio, language: Optional[str] = None) -> Dict[str, Any]:
         """
-        try:
-            # Prepare messages in the new chat format
-            messages = [
-                {"role": "system", "content": BIBLE_SYSTEM_PROMPT},
-                {"role": "user", "content": transcribed_text}
-            ]
-
-            # Send the request to GPT-4 using the new chat completions API
-            response = await self.client.chat.completions.create(
-                model=settings.openai_model,  # Use the configured model
-                messages=messages,
-                max_tokens=512,
-                temperature=0.7
+        Transcribe a recording of any length
+
+        Uploads that fit under the Whisper limit go through in one call. Longer
+        WAV recordings are split into overlapping segments that are transcribed
+        concurrently (bounded by the service semaphore) and stitched back
+        together, so wall-clock time tracks one segment rather than the sum.
+
+        Args:
+            audio: An upload validated by ingest_long()
+            language: Optional language hint for every segment
+
+        Returns:
+            Dict with the stitched transcription, segment count and duration
+        """
+        duration = wav_duration_seconds(audio.file) if audio.format == "wav" else None
+
+        if audio.size <= self.max_size_mb * 1024 * 1024:
+            text = await self.transcribe(audio.file, audio.filename, language, audio.sha256)
+            return {"transcription": text, "segments": 1, "duration_seconds": duration}
+
+        if audio.format != "wav":
+            raise ValueError(
+                f"Recordings over {self.max_size_mb}MB must be uncompressed WAV to be segmented"
             )
 
-            return response.choices[0].message.content.strip()
+        # Read ahead at most one segment per free transcription slot so memory
+        # stays bounded by the concurrency limit rather than the recording length
+        read_ahead = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(segment: AudioSegment) -> str:
+            try:
+                return await self.transcribe(segment.data, f"segment{segment.index:04d}.wav", language)
+            finally:
+                read_ahead.release()
+
+        segments = iter_wav_segments(
+            audio.file,
+            segment_seconds=settings.stt_segment_seconds,
+            overlap_seconds=settings.stt_segment_overlap_seconds,
+            silence_search_seconds=settings.stt_silence_search_seconds,
+            max_segment_bytes=self.max_size_mb * 1024 * 1024
+        )
+        tasks = []
+        try:
+            while True:
+                await read_ahead.acquire()
+                # Reading a segment and scanning it for a quiet cut point is blocking work
+                segment = await asyncio.to_thread(next, segments, None)
+                if segment is None:
+                    read_ahead.release()
+                    break
+                tasks.append(asyncio.create_task(run(segment)))
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return {
+            "transcription": stitch_transcripts(parts),
+            "segments": len(parts),
+            "duration_seconds": duration
+        }
+
+    async def get_bible_gpt_response(self, transcribed_text: str) -> str:
+        """
+        Generate Bible-related response using GPT-4 model
+
+        Answers are cached by the gateway, so a repeated voice question (a
+        transcript cache hit) is answered without any upstream call.
+        """
+        try:
+            gateway = await llm_gateway()
+            result = await gateway.complete("voice_chat", transcribed_text)
+            text, removed = strip_invalid_citations(result.text, source="voice_chat")
+            if removed:
+                logger.info(f"Removed citations of nonexistent verses from voice answer: {removed}")
+            return text
 
         except Exception as e:
             logger.error(f"Error generating Bible response: {e}")
             raise
 
+    async def stream_bible_gpt_response(self, transcribed_text: str) -> AsyncIterator[str]:
+        """Stream a Bible-related response token by token as the model generates it"""
+        gateway = await llm_gateway()
+        async for token in gateway.stream("voice_chat", transcribed_text):
+            yield token
+
 
 # Create service instance
 stt_service = STTService()
\ No newline at end of file
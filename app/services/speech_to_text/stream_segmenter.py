@@ -0,0 +1,176 @@
+"""
+Incremental segmentation for live PCM audio
+Buffers 16-bit PCM chunks in a fixed-size ring buffer and cuts a segment as
+soon as the speaker pauses (or the segment reaches its maximum length), so
+finished segments can be transcribed while the user is still talking
+"""
+
+import operator
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, List, Optional
+
+from app.services.speech_to_text.audio_segmenter import encode_wav
+
+
+@dataclass
+class LiveSegment:
+    """One WAV segment cut from a live stream"""
+    data: bytes
+    # Starts with audio repeated from the end of the previous segment (a forced cut)
+    overlapped: bool = False
+
+
+class PcmRingBuffer:
+    """Fixed-capacity FIFO byte buffer; never grows past its initial allocation"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, data: bytes):
+        """Append data; raises BufferError if it does not fit"""
+        if len(data) > self.free:
+            raise BufferError("Ring buffer overflow")
+        end = (self._start + self._size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._buffer[end:end + first] = data[:first]
+        self._buffer[:len(data) - first] = data[first:]
+        self._size += len(data)
+
+    def read(self, count: int, offset: int = 0) -> bytes:
+        """Copy count bytes starting offset bytes after the oldest, without consuming"""
+        count = min(count, self._size - offset)
+        begin = (self._start + offset) % self.capacity
+        first = min(count, self.capacity - begin)
+        return bytes(self._buffer[begin:begin + first]) + bytes(self._buffer[:count - first])
+
+    def consume(self, count: int):
+        """Drop the oldest count bytes"""
+        count = min(count, self._size)
+        self._start = (self._start + count) % self.capacity
+        self._size -= count
+
+
+class StreamingSegmenter:
+    """
+    Turns a stream of 16-bit little-endian PCM chunks into WAV segments
+
+    A segment is cut when at least min_segment_seconds are buffered and the
+    trailing pause_seconds fall below silence_rms, or unconditionally at
+    max_segment_seconds. Forced cuts keep overlap_seconds of audio to start the
+    next segment so a word split mid-way is heard whole; pause cuts need none.
+
+    Sizes are rounded to whole 20 ms blocks. Each block's energy is computed
+    once, when it fills, so checking for a pause costs a sum over the recent
+    blocks rather than a pass over their samples.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        min_segment_seconds: float,
+        max_segment_seconds: float,
+        pause_seconds: float,
+        silence_rms: int,
+        overlap_seconds: float
+    ):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        self.block_bytes = max(1, sample_rate // 50) * self.frame_bytes
+        self.block_samples = self.block_bytes // 2
+        blocks_per_second = sample_rate / max(1, sample_rate // 50)
+
+        self.min_bytes = int(min_segment_seconds * blocks_per_second) * self.block_bytes
+        self.max_bytes = max(1, int(max_segment_seconds * blocks_per_second)) * self.block_bytes
+        self.pause_blocks = max(1, int(pause_seconds * blocks_per_second))
+        overlap_blocks = min(int(overlap_seconds * blocks_per_second), self.max_bytes // self.block_bytes - 1)
+        self.overlap_bytes = overlap_blocks * self.block_bytes
+        self.silence_energy = silence_rms * silence_rms
+        self.buffer = PcmRingBuffer(self.max_bytes + self.frame_bytes)
+        # Sum of squared samples of every complete block in the buffer, oldest first, and their total
+        self._energies: Deque[int] = deque()
+        self._energy = 0
+        # Bytes received since the last cut; overlap carried forward doesn't count
+        self._fresh = 0
+        self._overlapped = False
+
+    def _align(self, size: int) -> int:
+        return size - size % self.frame_bytes
+
+    def _measure(self):
+        """Record the energy of every block completed since the last call"""
+        scanned = len(self._energies) * self.block_bytes
+        while len(self.buffer) - scanned >= self.block_bytes:
+            samples = array("h")
+            samples.frombytes(self.buffer.read(self.block_bytes, scanned))
+            energy = sum(map(operator.mul, samples, samples))
+            self._energies.append(energy)
+            self._energy += energy
+            scanned += self.block_bytes
+
+    def _is_silent(self, blocks: int) -> bool:
+        """Whether the newest `blocks` complete blocks are below the silence threshold"""
+        if blocks <= 0 or blocks > len(self._energies):
+            return False
+        if blocks == len(self._energies):
+            energy = self._energy
+        else:
+            energy = sum(islice(reversed(self._energies), blocks))
+        return energy < self.silence_energy * blocks * self.block_samples
+
+    def _drop(self, size: int, keep_blocks: int = 0):
+        """Consume size bytes, keeping the energies of the newest keep_blocks blocks"""
+        self.buffer.consume(size)
+        while len(self._energies) > keep_blocks:
+            self._energy -= self._energies.popleft()
+        self._fresh = 0
+
+    def _cut(self, keep: int) -> LiveSegment:
+        size = self._align(len(self.buffer))
+        segment = LiveSegment(encode_wav(self.buffer.read(size), self.sample_rate, self.channels), self._overlapped)
+        # keep is whole blocks, and a forced cut happens with exactly max_bytes (whole blocks) buffered
+        self._drop(size - keep, keep // self.block_bytes)
+        self._overlapped = keep > 0
+        return segment
+
+    def feed(self, data: bytes) -> List[LiveSegment]:
+        """Buffer a chunk and return any WAV segments completed by it"""
+        segments = []
+        view = memoryview(data)
+        while view:
+            room = min(len(view), self.max_bytes - len(self.buffer))
+            self.buffer.write(view[:room])
+            view = view[room:]
+            self._fresh += room
+            self._measure()
+
+            if len(self.buffer) >= self.max_bytes:
+                segments.append(self._cut(keep=self.overlap_bytes))
+            elif len(self.buffer) >= self.min_bytes and self._is_silent(self.pause_blocks):
+                if self._is_silent(len(self._energies)):
+                    # Nothing but silence: drop it rather than send Whisper an empty clip
+                    self._drop(self._align(len(self.buffer)))
+                    self._overlapped = False
+                else:
+                    segments.append(self._cut(keep=0))
+        return segments
+
+    def flush(self) -> Optional[LiveSegment]:
+        """Return the remaining audio as a final segment, if any"""
+        if self._fresh < self.frame_bytes:
+            return None
+        return self._cut(keep=0)
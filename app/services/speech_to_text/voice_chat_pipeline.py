@@ -0,0 +1,156 @@
+"""
+Pipelined voice-to-voice Bible chat
+Transcribes the question, streams chat tokens as they are generated and starts
+text-to-speech for each finished sentence while the model is still writing,
+emitting everything as Server-Sent Events on a single connection
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import re
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import settings
+from app.services.audio_generation.audio_service import AudioGenerationService
+from app.services.speech_to_text.speech_to_text_service import stt_service
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! ? (optionally followed by a closing quote or bracket) and whitespace
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s")
+
+_DONE = object()
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class SentenceBuffer:
+    """Accumulates streamed tokens and releases complete sentences"""
+
+    def __init__(self, min_chars: int):
+        self.min_chars = min_chars
+        self._text = ""
+
+    def feed(self, token: str) -> List[str]:
+        """Add a token and return any sentences that are now complete"""
+        self._text += token
+        sentences = []
+        search_from = 0
+        while True:
+            match = _SENTENCE_END.search(self._text, search_from)
+            if not match:
+                break
+            # Merge very short sentences (e.g. "Amen." or "Rom. 5:8") with what follows
+            if match.end() < self.min_chars:
+                search_from = match.end()
+                continue
+            sentences.append(self._text[:match.end()].strip())
+            self._text = self._text[match.end():]
+            search_from = 0
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text remains once the stream has finished"""
+        rest, self._text = self._text.strip(), ""
+        return rest or None
+
+
+async def voice_chat_events(transcript: str) -> AsyncIterator[str]:
+    """
+    Run the chat and speech stages for a transcribed question and yield SSE frames
+
+    The transcription happens in the route, while the upload is still open, so
+    the first frame can be sent as soon as it completes.
+
+    Events, in order of first appearance:
+        transcript - the transcribed question
+        token      - a chunk of the chat answer
+        audio      - a base64 MP3 chunk for sentence N (sentences arrive in order)
+        text_done  - the complete chat answer
+        error      - the chat stage failed, or TTS failed for one sentence
+        done       - the pipeline finished; always the last event
+    """
+    yield format_sse("transcript", {"text": transcript})
+
+    tts = AudioGenerationService()
+    tts_slots = asyncio.Semaphore(settings.voice_tts_max_concurrency)
+    events: asyncio.Queue = asyncio.Queue()
+    sentence_queues: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+
+    async def synthesize(index: int, sentence: str, chunks: asyncio.Queue):
+        try:
+            async with tts_slots:
+                async for chunk in tts.stream_audio(sentence):
+                    await chunks.put(chunk)
+        except Exception as e:
+            logger.error(f"Voice chat TTS failed for sentence {index}: {e}")
+            await chunks.put(e)
+        finally:
+            await chunks.put(_DONE)
+
+    def start_sentence(index: int, sentence: str):
+        chunks: asyncio.Queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(synthesize(index, sentence, chunks)))
+        sentence_queues.put_nowait((index, sentence, chunks))
+
+    async def generate_text():
+        buffer = SentenceBuffer(settings.voice_min_sentence_chars)
+        answer = []
+        index = 0
+        try:
+            async for token in stt_service.stream_bible_gpt_response(transcript):
+                answer.append(token)
+                await events.put(("token", {"text": token}))
+                for sentence in buffer.feed(token):
+                    start_sentence(index, sentence)
+                    index += 1
+            rest = buffer.flush()
+            if rest:
+                start_sentence(index, rest)
+            await events.put(("text_done", {"response": "".join(answer)}))
+        except Exception as e:
+            logger.error(f"Voice chat generation failed: {e}")
+            await events.put(("error", {"stage": "chat", "message": "Could not generate a response"}))
+        finally:
+            sentence_queues.put_nowait(_DONE)
+
+    async def relay_audio():
+        # Drain sentences strictly in order so clients can play chunks as received
+        while True:
+            item = await sentence_queues.get()
+            if item is _DONE:
+                break
+            index, sentence, chunks = item
+            while True:
+                chunk = await chunks.get()
+                if chunk is _DONE:
+                    break
+                if isinstance(chunk, Exception):
+                    await events.put(("error", {"stage": "tts", "sentence_index": index}))
+                    continue
+                await events.put(("audio", {
+                    "sentence_index": index,
+                    "text": sentence,
+                    "audio": base64.b64encode(chunk).decode("ascii")
+                }))
+        await events.put(("done", {}))
+
+    tasks.append(asyncio.create_task(generate_text()))
+    tasks.append(asyncio.create_task(relay_audio()))
+
+    try:
+        while True:
+            event, data = await events.get()
+            yield format_sse(event, data)
+            if event == "done":
+                break
+    finally:
+        # Client went away or we finished: stop any upstream work still running
+        for task in tasks:
+            task.cancel()
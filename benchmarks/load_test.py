@@ -0,0 +1,251 @@
+"""
+Async open-loop load generator for the Bible AI service
+
+Fires requests at a fixed target rate (independent of how fast responses come
+back, so queueing shows up as latency rather than as reduced offered load)
+across a weighted mix of routes, then reports per-route p50/p95/p99 latency,
+achieved throughput, errors, and the server's event-loop lag as published
+on /metrics.
+
+Every request comes from one IP, so the app must run with RATE_LIMIT_ENABLED=false
+or the per-IP limit turns most of the offered load into 429s.
+
+Usage (against an app wired to benchmarks.mock_upstream):
+    RATE_LIMIT_ENABLED=false OPENAI_BASE_URL=http://127.0.0.1:9100/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:9100 \\
+        uvicorn app.main:app --port 8065
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8065 --rps 20 --duration 60 \\
+        --mix chat=5,verses=1,stt=2,audio=2 --json results.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import statistics
+import time
+import wave
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+
+QUESTIONS = [
+    "What does the Bible say about love?",
+    "Who wrote the book of Romans?",
+    "Can you generate a prayer for healing?",
+    "Compare John 3:16 in KJV, NIV, ESV, and NLT",
+    "What does the Bible teach about forgiveness?",
+    "Explain the Trinity from a biblical perspective",
+    "Write a prayer of thanksgiving",
+    "What is the Gospel?",
+]
+
+
+def make_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    samples = array("h", (int(6000 * math.sin(2 * math.pi * 220 * i / rate)) for i in range(int(seconds * rate))))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, unique: bool):
+        self.client = client
+        self.unique = unique
+        self.wav = make_wav()
+
+    def _question(self) -> str:
+        question = random.choice(QUESTIONS)
+        # A unique suffix defeats response caches when measuring upstream-bound paths
+        return f"{question} ({random.getrandbits(32):08x})" if self.unique else question
+
+    async def chat(self) -> int:
+        response = await self.client.post(f"{API}/bible-chat/query", json={"query": self._question()})
+        return response.status_code
+
+    async def verses(self) -> int:
+        response = await self.client.get(f"{API}/verses/random")
+        return response.status_code
+
+    async def stt(self) -> int:
+        audio = self.wav + (random.getrandbits(64).to_bytes(8, "little") if self.unique else b"")
+        response = await self.client.post(
+            f"{API}/stt/bible_ai_chat",
+            files={"audio_file": ("question.wav", audio, "audio/wav")}
+        )
+        return response.status_code
+
+    async def audio(self) -> int:
+        response = await self.client.post(f"{API}/audio/generate", json={"text": self._question()})
+        if response.status_code != 200:
+            return response.status_code
+        request_id = response.json()["audio_url"].rsplit("/", 1)[-1]
+        download = await self.client.get(f"{API}/audio/download/{request_id}")
+        return download.status_code
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+async def client_loop_lag(stop: asyncio.Event, lags: List[float]):
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.05
+        await asyncio.sleep(0.05)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(base_url: str, rps: float, duration: float, mix: Dict[str, float], unique: bool,
+              max_in_flight: int, timeout: float) -> dict:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    dropped = 0
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        scenarios = Scenarios(client, unique)
+        names = list(mix)
+        weights = [mix[name] for name in names]
+
+        async def one(name: str):
+            started = time.perf_counter()
+            try:
+                status = str(await getattr(scenarios, name)())
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            finally:
+                in_flight.release()
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][status] += 1
+
+        lags: List[float] = []
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(client_loop_lag(stop, lags))
+
+        tasks = []
+        started = time.perf_counter()
+        total = int(rps * duration)
+        for i in range(total):
+            # Open loop: request i is due at i / rps regardless of earlier responses
+            delay = started + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight.locked():
+                dropped += 1
+                continue
+            await in_flight.acquire()
+            tasks.append(asyncio.create_task(one(random.choices(names, weights)[0])))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await lag_task
+
+        server_lag = None
+        try:
+            snapshot = (await client.get("/metrics", params={"format": "json"})).json()
+            server_lag = snapshot.get("event_loop_lag_seconds", {}).get("total")
+        except (httpx.HTTPError, ValueError):
+            pass
+
+    routes = {}
+    for name in names:
+        values = latencies.get(name, [])
+        routes[name] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+            "mean_ms": _ms(statistics.fmean(values)) if values else None,
+            "statuses": dict(statuses.get(name, {})),
+        }
+
+    completed = sum(len(v) for v in latencies.values())
+    return {
+        "target_rps": rps,
+        "duration_s": round(elapsed, 2),
+        "completed": completed,
+        "throughput_rps": round(completed / elapsed, 2),
+        "dropped_at_client": dropped,
+        "routes": routes,
+        "server_event_loop_lag": server_lag,
+        "client_event_loop_lag_p99_ms": _ms(percentile(lags, 99)),
+    }
+
+
+def warn_if_rate_limited(routes: Dict[str, dict]):
+    """The app only answers 429 from its own rate limiter, which makes a benchmark meaningless"""
+    limited = sum(route["statuses"].get("429", 0) for route in routes.values())
+    if limited:
+        print(f"WARNING: {limited} requests were rate limited (429); "
+              f"restart the app with RATE_LIMIT_ENABLED=false and run again")
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def print_report(report: dict):
+    print(f"\n{report['completed']} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} rps achieved, target {report['target_rps']}, "
+          f"{report['dropped_at_client']} dropped at client)")
+    print(f"{'route':<8} {'reqs':>6} {'rps':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}  statuses")
+    for name, route in report["routes"].items():
+        print(f"{name:<8} {route['requests']:>6} {route['throughput_rps']:>7} "
+              f"{route['p50_ms'] or '-':>8} {route['p95_ms'] or '-':>8} {route['p99_ms'] or '-':>8}  {route['statuses']}")
+    lag = report["server_event_loop_lag"]
+    if lag:
+        print(f"server event-loop lag: p50 {_ms(lag['p50'])}ms p95 {_ms(lag['p95'])}ms p99 {_ms(lag['p99'])}ms")
+    print(f"client event-loop lag p99: {report['client_event_loop_lag_p99_ms']}ms "
+          f"(high values mean the load generator itself is saturated)")
+    warn_if_rate_limited(report["routes"])
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("chat", "verses", "stt", "audio"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8065")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=5,verses=1,stt=2,audio=2"))
+    parser.add_argument("--unique", action="store_true", help="make every payload unique to bypass caches")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.base_url, args.rps, args.duration, args.mix, args.unique,
+                             args.max_in_flight, args.timeout))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
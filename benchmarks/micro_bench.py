@@ -0,0 +1,235 @@
+"""
+Micro-benchmarks for CPU-bound hot paths
+
+Times the in-process work done per request, with realistic payload sizes:
+
+    verse_json_parse          parse_json_array on a 5-verse batch reply
+    verse_json_parse_fenced   the same reply wrapped in a ```json fence
+    verse_response_build      build_verse_response for 15 verses + 15 prayers
+    verse_response_validate   VerseGenerationResponse(**payload)
+    verse_response_dump       VerseGenerationResponse.model_dump_json()
+    chat_response_validate    BibleChatResponse(**payload) for a ~1500-token answer
+    chat_response_dump        BibleChatResponse.model_dump_json()
+    chat_request_validate     BibleChatRequest(**payload)
+    chat_query_validate       BibleChatService.validate_query
+    audio_cache_hit           AudioGenerationService.get_cached_audio, 1000 entries cached
+    examples_rebuild          /bible-chat/examples as it was: JSONResponse(content=dict) per request
+    examples_precomputed      /bible-chat/examples now: PrecomputedResponse lookup (gzip accepted)
+    examples_not_modified     /bible-chat/examples revalidated with a matching If-None-Match
+    verse_render_json         a 15+15 verse payload through the stdlib JSONResponse
+    verse_render_default      the same payload through DefaultJSONResponse (orjson when installed)
+    verse_gzip                gzip of the rendered verse payload
+    verse_brotli              brotli of the rendered verse payload (only if brotli is installed)
+    rate_limit_check          RateLimitMiddleware client identification + RateLimiter.check
+    prompt_token_count        TokenCounter.count_messages for the bible_chat system prompt + a 2,000-char query
+    trace_span_unsampled      a `with span(...)` block outside any sampled trace (the cost when tracing is off)
+    trace_request_sampled     a sampled root span with three child spans (export serialisation excluded)
+    reference_check           check_reference on a generated "1 Cor 13:4-7" reference field
+    citation_scan             strip_invalid_citations over a ~1500-token answer with 120 citations
+    model_routing             ModelRouter.choose for a typical bible_chat question
+
+Each case is run for ~0.2 s per repeat; the fastest repeat is reported as ns/op
+(the least noisy estimate of intrinsic cost).
+
+Usage:
+    python -m benchmarks.micro_bench --save benchmarks/baseline.json
+    python -m benchmarks.micro_bench --compare benchmarks/baseline.json --threshold 0.15
+
+--compare exits with status 1 if any case is slower than baseline by more than
+the threshold, so it can gate a deploy.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+# Settings are read at import time; no real keys are needed to time local code
+os.environ.setdefault("OPEN_AI_API_KEY", "benchmark")
+os.environ.setdefault("ELEVENLABS_API_KEY", "benchmark")
+
+from app.services.Bible_Chat_Service.Bible_chat_schema import BibleChatRequest, BibleChatResponse  # noqa: E402
+from app.services.Bible_Chat_Service.Bible_chat_service import BibleChatService  # noqa: E402
+from app.services.Daily_verse_generation.Verse_generation_schema import VerseGenerationResponse  # noqa: E402
+from app.services.Daily_verse_generation.Verse_generation_services import (  # noqa: E402
+    build_verse_response,
+    parse_json_array,
+)
+from app.services.audio_generation.audio_service import AudioGenerationService  # noqa: E402
+from app.services.Bible_Chat_Service.Bible_chat_route import _examples_response  # noqa: E402
+from app.core.responses import DefaultJSONResponse, brotli, compress  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware, TokenBucketTable  # noqa: E402
+from app.core.config import BIBLE_SYSTEM_PROMPT  # noqa: E402
+from app.services.api_manager.model_router import model_router  # noqa: E402
+from app.services.api_manager.token_counter import token_counter  # noqa: E402
+from app.core.tracing import end_trace, span, start_trace  # noqa: E402
+from app.services.scripture.references import check_reference, strip_invalid_citations  # noqa: E402
+
+_VERSE = [
+    "Though the fig tree shall not blossom, neither shall fruit be in the vines; the labour of the olive "
+    "shall fail, and the fields shall yield no meat; yet I will rejoice in the LORD, I will joy in the God of my salvation.",
+    "Habakkuk declares that his joy rests in God himself rather than in prosperity, teaching steadfast faith "
+    "when every visible source of provision has failed.",
+    "Habakkuk 3:17-18",
+]
+_PRAYER = [
+    "Prayer for Strength in Weariness",
+    "Heavenly Father, I come to You tired and worn. Renew my strength as You promised in Isaiah 40:31. "
+    "Help me to wait on You and not lean on my own understanding. Carry me through this day, and let me "
+    "find rest in Your presence. In Jesus' name, Amen.",
+]
+_ANSWER = " ".join(
+    ["The Bible teaches about forgiveness in many passages, for example Matthew 6:12 and Ephesians 4:32."] * 60
+)
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    batch_reply = json.dumps([_VERSE] * 5)
+    fenced_reply = f"```json\n{batch_reply}\n```"
+    verse_rows = [_VERSE] * 15
+    prayer_rows = [_PRAYER] * 15
+    verse_payload = build_verse_response(verse_rows, prayer_rows)
+    verse_model = VerseGenerationResponse(**verse_payload)
+    chat_payload = {"success": True, "response": _ANSWER, "timestamp": "2025-07-21T10:30:00"}
+    chat_model = BibleChatResponse(**chat_payload)
+    request_payload = {"query": "What does the Bible say about forgiveness when someone keeps hurting me?"}
+    service = BibleChatService()
+
+    verse_json = verse_model.model_dump(mode="json")
+    verse_body = DefaultJSONResponse(verse_json).body
+    examples_payload = json.loads(_examples_response.bodies[None])
+    gzip_request = _request({b"accept-encoding": b"gzip, deflate"})
+    revalidate_request = _request({b"accept-encoding": b"gzip", b"if-none-match": _examples_response.etag.encode()})
+
+    # A bucket large enough that the timed loop is never rejected
+    limiter = RateLimiter()
+    limiter.requests = TokenBucketTable(rate=1e9, burst=1e12)
+    limit_middleware = RateLimitMiddleware(None, limiter)
+    limit_scope = {
+        "type": "http", "method": "POST", "path": "/api/v1/bible-chat/query", "client": ("203.0.113.7", 50000),
+        "headers": [(b"host", b"api"), (b"user-agent", b"bench"), (b"content-type", b"application/json")]
+    }
+
+    # As at app startup: tiktoken when its encodings are available, else the heuristic
+    token_counter.load(["gpt-4o-2024-08-06"])
+    prompt_messages = [
+        {"role": "system", "content": BIBLE_SYSTEM_PROMPT},
+        {"role": "user", "content": (request_payload["query"] + " ") * 27},
+    ]
+
+    def unsampled_span():
+        with span("verses.parse"):
+            pass
+
+    def sampled_request():
+        root, token = start_trace("GET /bench", force=True)
+        for name in ("llm.complete", "openai.chat.completions", "verses.parse"):
+            with span(name, **{"llm.route": "verse_batch"}):
+                pass
+        end_trace(root, token)
+
+    AudioGenerationService._audio_cache = {str(uuid.uuid4()): b"\xff\xfb" * 8192 for _ in range(1000)}
+    audio_key = next(iter(AudioGenerationService._audio_cache))
+
+    return [
+        ("verse_json_parse", lambda: parse_json_array(batch_reply)),
+        ("verse_json_parse_fenced", lambda: parse_json_array(fenced_reply)),
+        ("verse_response_build", lambda: build_verse_response(verse_rows, prayer_rows)),
+        ("verse_response_validate", lambda: VerseGenerationResponse(**verse_payload)),
+        ("verse_response_dump", verse_model.model_dump_json),
+        ("chat_response_validate", lambda: BibleChatResponse(**chat_payload)),
+        ("chat_response_dump", chat_model.model_dump_json),
+        ("chat_request_validate", lambda: BibleChatRequest(**request_payload)),
+        ("chat_query_validate", lambda: service.validate_query(request_payload["query"])),
+        ("audio_cache_hit", lambda: AudioGenerationService.get_cached_audio(audio_key)),
+        ("examples_rebuild", lambda: JSONResponse(content=examples_payload)),
+        ("examples_precomputed", lambda: _examples_response(gzip_request)),
+        ("examples_not_modified", lambda: _examples_response(revalidate_request)),
+        ("verse_render_json", lambda: JSONResponse(content=verse_json)),
+        ("verse_render_default", lambda: DefaultJSONResponse(content=verse_json)),
+        ("verse_gzip", lambda: compress(verse_body, "gzip")),
+        ("prompt_token_count", lambda: token_counter.count_messages(prompt_messages, "gpt-4o-2024-08-06")),
+        ("rate_limit_check", lambda: limiter.check(
+            limit_middleware._clients(limit_scope), limit_scope["path"], time.monotonic()
+        )),
+        ("trace_span_unsampled", unsampled_span),
+        ("trace_request_sampled", sampled_request),
+        ("reference_check", lambda: check_reference("1 Cor 13:4-7", source="bench")),
+        ("citation_scan", lambda: strip_invalid_citations(_ANSWER, source="bench")),
+        ("model_routing", lambda: model_router.choose("bible_chat", request_payload["query"])),
+    ] + ([("verse_brotli", lambda: compress(verse_body, "br"))] if brotli is not None else [])
+
+
+def _request(headers: Dict[bytes, bytes]) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers.items())})
+
+
+def measure(fn: Callable[[], object], repeats: int, target_seconds: float = 0.2) -> float:
+    """Fastest of `repeats` runs, in nanoseconds per call"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * target_seconds / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeats, number=number)) / number * 1e9
+
+
+def run(selected: List[str], repeats: int) -> Dict[str, float]:
+    results = {}
+    for name, fn in build_cases():
+        if selected and name not in selected:
+            continue
+        results[name] = measure(fn, repeats)
+        print(f"{name:<26} {results[name]:>12,.0f} ns/op")
+    return results
+
+
+def compare(results: Dict[str, float], baseline_path: str, threshold: float) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    ok = True
+    print(f"\n{'case':<26} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<26} {'-':>12} {current:>12,.0f}      new")
+            continue
+        change = (current - before) / before
+        flag = "  REGRESSION" if change > threshold else ""
+        ok = ok and not flag
+        print(f"{name:<26} {before:>12,.0f} {current:>12,.0f} {change:>+7.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", nargs="*", help="only run these cases")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before failing (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = run(args.cases, args.repeats)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "machine": platform.machine(),
+                "results": results
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Local stand-in for the OpenAI and ElevenLabs APIs
+
+Implements just enough of each upstream for the service to run end to end
+without spending money:
+
+    POST /v1/chat/completions                   (plain and stream=true)
+    POST /v1/audio/transcriptions
+    POST /v1/text-to-speech/{voice_id}/stream   (ElevenLabs)
+
+Latency for each endpoint is drawn from a lognormal distribution with a
+configurable median and spread, and a configurable fraction of requests fail
+with 500 or are throttled with 429 + Retry-After.
+
+Usage:
+    python -m benchmarks.mock_upstream --port 9100 --chat-median-ms 800 --error-rate 0.01 --throttle-rate 0.02
+
+Then start the app against it:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:9100 \\
+        uvicorn app.main:app --port 8065
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class LatencyProfile:
+    """Lognormal latency: half of requests take less than median_ms"""
+    median_ms: float
+    sigma: float = 0.5
+
+    def sample(self) -> float:
+        return self.median_ms / 1000.0 * math.exp(random.gauss(0.0, self.sigma))
+
+
+@dataclass
+class MockConfig:
+    chat: LatencyProfile
+    transcription: LatencyProfile
+    tts: LatencyProfile
+    token_interval_ms: float = 15.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_seconds: int = 1
+
+
+_VERSE_REPLY = json.dumps([
+    ["The LORD is my shepherd; I shall not want.", "God provides for and guides His people.", "Psalm 23:1"],
+    ["Though the fig tree shall not blossom, yet I will rejoice in the LORD.", "Joy rests in God, not circumstances.", "Habakkuk 3:17"],
+    ["The LORD thy God in the midst of thee is mighty.", "God is present and strong to save.", "Zephaniah 3:17"],
+    ["For I am the LORD, I change not.", "God's character is constant.", "Malachi 3:6"],
+    ["Grace to you and peace from God our Father.", "A greeting of grace and peace.", "Philemon 1:3"],
+])
+
+_PRAYER_REPLY = json.dumps([
+    ["Prayer for Guidance", "Lord, direct my steps today. Give me wisdom in every choice. Amen."],
+    ["Prayer for Strength", "Father, renew my strength when I am weary. Hold me up. Amen."],
+    ["Prayer for Peace", "Prince of Peace, quiet my anxious heart. Let your peace guard me. Amen."],
+    ["Prayer for Healing", "Great Physician, bring healing to body and soul. Amen."],
+    ["Prayer for Forgiveness", "Merciful God, forgive my sins as I forgive others. Amen."],
+])
+
+_CHAT_REPLY = (
+    "The Bible teaches that love is patient and kind (1 Corinthians 13:4, NIV). "
+    "Jesus said that the greatest commandments are to love God and to love our neighbour (Matthew 22:37-39). "
+    "John reminds us that God is love, and whoever lives in love lives in God (1 John 4:16). "
+    "May you walk in that love today."
+)
+
+
+def create_mock_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock upstream")
+
+    def injected_failure():
+        roll = random.random()
+        if roll < config.throttle_rate:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "requests"}},
+                headers={"Retry-After": str(config.retry_after_seconds)}
+            )
+        if roll < config.throttle_rate + config.error_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+        return None
+
+    def reply_for(messages) -> str:
+        user = messages[-1]["content"] if messages else ""
+        if "unique Bible verses" in user:
+            return _VERSE_REPLY
+        if "unique prayers" in user:
+            return _PRAYER_REPLY
+        return _CHAT_REPLY
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        text = reply_for(body.get("messages", []))
+        model = body.get("model", "mock-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        completion_tokens = len(text) // 4
+
+        if body.get("stream"):
+            async def events():
+                # Time to first token is the sampled latency; the rest trickles out
+                await asyncio.sleep(config.chat.sample())
+                for word in text.split(" "):
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(config.token_interval_ms / 1000.0)
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(config.chat.sample())
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        # Drain the upload so request sizes and transfer time are realistic
+        await request.body()
+        failure = injected_failure()
+        if failure:
+            return failure
+        await asyncio.sleep(config.transcription.sample())
+        return {"text": "What does the Bible say about hope?"}
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        # Roughly 1 KB of "audio" per 15 characters, in 4 KB chunks
+        total = max(4096, len(body.get("text", "")) * 1024 // 15)
+
+        async def audio():
+            await asyncio.sleep(config.tts.sample())
+            sent = 0
+            while sent < total:
+                size = min(4096, total - sent)
+                yield b"\xff\xfb" + bytes(size - 2)
+                sent += size
+                await asyncio.sleep(0.005)
+
+        return StreamingResponse(audio(), media_type="audio/mpeg")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--chat-median-ms", type=float, default=800.0)
+    parser.add_argument("--transcription-median-ms", type=float, default=600.0)
+    parser.add_argument("--tts-median-ms", type=float, default=300.0)
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal spread for every endpoint")
+    parser.add_argument("--token-interval-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        chat=LatencyProfile(args.chat_median_ms, args.sigma),
+        transcription=LatencyProfile(args.transcription_median_ms, args.sigma),
+        tts=LatencyProfile(args.tts_median_ms, args.sigma),
+        token_interval_ms=args.token_interval_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after_seconds=args.retry_after
+    )
+    uvicorn.run(create_mock_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
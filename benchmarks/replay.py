@@ -0,0 +1,462 @@
+"""
+Replay captured traffic against the Bible AI service
+
+Captures come from the traffic capture middleware (CAPTURE_ENABLED=true;
+JSONL files under CAPTURE_DIR). Request bodies are rebuilt from their
+recorded shape: every string becomes prose of the recorded length that
+starts each sentence with a marker derived from the request's fingerprint,
+so identical production requests stay identical (and hit the same caches)
+and the stand-in upstream can tell which request an OpenAI or ElevenLabs
+call belongs to. Uploads become WAV files of the recorded size.
+
+    upstream   serve OpenAI and ElevenLabs from a capture: each call is answered
+               with the status, latency and reply size recorded for the request
+               that made it (or one drawn from the same operation when the build
+               under test calls out where production did not)
+    run        send the captured requests at their original spacing, or --speed
+               times faster, and report per-route latency and throughput
+    compare    compare two run reports, e.g. the current build against a change
+
+A replay sends every captured client's requests from one IP, so the app
+under test must run with RATE_LIMIT_ENABLED=false.
+
+Usage:
+    python -m benchmarks.replay upstream data/captures/*.jsonl --port 9100
+    RATE_LIMIT_ENABLED=false OPENAI_BASE_URL=http://127.0.0.1:9100/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:9100 \\
+        uvicorn app.main:app --port 8065
+    python -m benchmarks.replay run data/captures/*.jsonl --speed 2 --json base.json
+    (check out the candidate build; restart the app and the upstream so caches start cold)
+    python -m benchmarks.replay run data/captures/*.jsonl --speed 2 --json candidate.json
+    python -m benchmarks.replay compare base.json candidate.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+import wave
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.load_test import percentile, warn_if_rate_limited
+from benchmarks.mock_upstream import _CHAT_REPLY, _PRAYER_REPLY, _VERSE_REPLY
+
+_MARKER = re.compile(r"\brp([0-9a-f]{12})\b")
+_SENTENCES = re.split(r"(?<=[.!?]) ", _CHAT_REPLY)
+# Multipart boundaries and part headers around an uploaded file
+_MULTIPART_OVERHEAD = 300
+# Statuses recorded as exception names: our own cancellations are not upstream replies
+_NOT_REPLIES = {"CancelledError", "DeadlineExceeded"}
+
+
+def load_capture(paths: List[str]) -> List[Dict[str, Any]]:
+    """Captured requests from every file, in start order, with "at" seconds from the first"""
+    records = []
+    for path in paths:
+        started_at = 0.0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "capture" in record:
+                    started_at = record["started_at"]
+                    continue
+                record["at"] = started_at + record["t"]
+                records.append(record)
+    records.sort(key=lambda record: record["at"])
+    if records:
+        first = records[0]["at"]
+        for record in records:
+            record["at"] -= first
+    return records
+
+
+def marker_for(record: Dict[str, Any]) -> str:
+    return f"rp{record.get('fp', '0' * 12)}"
+
+
+def synthetic_text(length: int, marker: str) -> str:
+    """Prose of exactly `length` characters whose every sentence starts with `marker`"""
+    unit = " ".join(f"{marker} {sentence}" for sentence in _SENTENCES) + " "
+    return (unit * (length // len(unit) + 1))[:length]
+
+
+def synthesize(shape: Any, marker: str) -> Any:
+    """A JSON value with the recorded shape (see app.core.capture.shape)"""
+    if isinstance(shape, dict):
+        if "$s" in shape:
+            return synthetic_text(shape["$s"], marker)
+        return {key: synthesize(value, marker) for key, value in shape.items()}
+    if isinstance(shape, list):
+        return [synthesize(item, marker) for item in shape]
+    return shape
+
+
+def synthetic_wav(size: int, rate: int = 16000) -> bytes:
+    """A quiet 16-bit mono WAV of about `size` bytes"""
+    frames = max(rate // 10, (size - 44) // 2)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(bytes(frames * 2))
+    return buffer.getvalue()
+
+
+# --- upstream ---------------------------------------------------------------------------------
+
+
+class RecordedUpstream:
+    """Recorded upstream calls, queued per (operation, request fingerprint) in capture order"""
+
+    def __init__(self, records: List[Dict[str, Any]], seed: int = 0):
+        self.queues: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.pools: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.random = random.Random(seed)
+        self.matched = 0
+        self.drawn = 0
+        for record in records:
+            for call in record.get("up", ()):
+                if call["status"] in _NOT_REPLIES:
+                    continue
+                self.queues[(call["op"], record.get("fp", "0" * 12))].append(call)
+                self.pools[call["op"]].append(call)
+
+    def next_call(self, operation: str, text: str) -> Tuple[Dict[str, Any], str]:
+        """The recorded call answering this one, and the marker to put in the reply"""
+        match = _MARKER.search(text)
+        fp = match.group(1) if match else "0" * 12
+        queue = self.queues.get((operation, fp))
+        if queue:
+            self.matched += 1
+            return queue.popleft(), f"rp{fp}"
+        self.drawn += 1
+        pool = self.pools.get(operation)
+        return (self.random.choice(pool) if pool else {"status": 200, "ms": 500.0}), f"rp{fp}"
+
+
+def _status(call: Dict[str, Any]) -> int:
+    # Connection errors and timeouts were recorded by name; answer them as an unavailable upstream
+    return call["status"] if isinstance(call["status"], int) else 503
+
+
+def create_replay_upstream(upstream: RecordedUpstream) -> FastAPI:
+    app = FastAPI(title="Recorded upstream")
+
+    async def failure(call: Dict[str, Any]) -> Optional[JSONResponse]:
+        status = _status(call)
+        if status == 200:
+            return None
+        await asyncio.sleep(call["ms"] / 1000.0)
+        headers = {"Retry-After": "1"} if status == 429 else None
+        return JSONResponse(status_code=status, content={"error": {"message": "Recorded failure"}}, headers=headers)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        user = messages[-1]["content"] if messages else ""
+        call, marker = upstream.next_call("chat.completions", user)
+        response = await failure(call)
+        if response:
+            return response
+
+        # Verse and prayer batches are parsed as JSON rows, so they get the canned batches
+        if "unique Bible verses" in user:
+            text = _VERSE_REPLY
+        elif "unique prayers" in user:
+            text = _PRAYER_REPLY
+        else:
+            text = synthetic_text(call.get("chars") or len(_CHAT_REPLY), marker)
+        model = body.get("model", "replay-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        completion_tokens = call.get("tokens") or len(text) // 4
+
+        if body.get("stream"):
+            words = text.split(" ")
+            interval = call.get("body_ms", 0.0) / 1000.0 / max(1, len(words))
+
+            async def events():
+                await asyncio.sleep(call["ms"] / 1000.0)
+                for word in words:
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if interval:
+                        await asyncio.sleep(interval)
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(call["ms"] / 1000.0)
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        call, marker = upstream.next_call("audio.transcriptions", getattr(upload, "filename", "") or "")
+        response = await failure(call)
+        if response:
+            return response
+        await asyncio.sleep(call["ms"] / 1000.0)
+        return {"text": synthetic_text(call.get("chars") or 40, marker)}
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        call, _ = upstream.next_call("text_to_speech", body.get("text", ""))
+        response = await failure(call)
+        if response:
+            return response
+        total = call.get("bytes") or 4096
+        chunks = max(1, math.ceil(total / 4096))
+        interval = call.get("body_ms", 0.0) / 1000.0 / chunks
+
+        async def audio():
+            await asyncio.sleep(call["ms"] / 1000.0)
+            sent = 0
+            while sent < total:
+                size = min(4096, total - sent)
+                yield b"\xff\xfb" + bytes(size - 2) if size >= 2 else bytes(size)
+                sent += size
+                if interval:
+                    await asyncio.sleep(interval)
+
+        return StreamingResponse(audio(), media_type="audio/mpeg")
+
+    @app.get("/replay/stats")
+    async def stats():
+        return {"matched": upstream.matched, "drawn": upstream.drawn}
+
+    return app
+
+
+# --- run --------------------------------------------------------------------------------------
+
+
+def build_request(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """httpx request arguments for a captured request, or None if it cannot be rebuilt"""
+    if "{id}" in record["path"]:
+        # Ids (audio downloads, job polls) came from responses that were not recorded
+        return None
+    marker = marker_for(record)
+    request: Dict[str, Any] = {"method": record["method"], "url": record["path"]}
+    if record.get("query"):
+        request["params"] = synthesize(record["query"], marker)
+    if "body" in record:
+        request["json"] = synthesize(record["body"], marker)
+    elif record.get("ct") == "multipart/form-data":
+        audio = synthetic_wav(record["req_bytes"] - _MULTIPART_OVERHEAD)
+        request["files"] = {"audio_file": (f"{marker}.wav", audio, "audio/wav")}
+    elif record.get("req_bytes"):
+        # Oversized JSON or another body kind: same size, no content
+        request["content"] = bytes(record["req_bytes"])
+        request["headers"] = {"content-type": record.get("ct") or "application/octet-stream"}
+    return request
+
+
+async def replay(records: List[Dict[str, Any]], base_url: str, speed: float, timeout: float,
+                 max_in_flight: int) -> dict:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    first_bytes: Dict[str, List[float]] = defaultdict(list)
+    captured: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    skipped: Dict[str, int] = defaultdict(int)
+    late = 0
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def one(route: str, request: Dict[str, Any]):
+            started = time.perf_counter()
+            try:
+                async with client.stream(**request) as response:
+                    first_bytes[route].append(time.perf_counter() - started)
+                    async for _ in response.aiter_raw():
+                        pass
+                status = str(response.status_code)
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[route].append(time.perf_counter() - started)
+            statuses[route][status] += 1
+
+        tasks = []
+        started = time.perf_counter()
+        for record in records:
+            route = f"{record['method']} {record['path']}"
+            request = build_request(record)
+            if request is None:
+                skipped[route] += 1
+                continue
+            # Open loop at the captured spacing: responses never hold back later requests
+            delay = started + record["at"] / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.1:
+                late += 1
+            captured[route].append(record["ms"] / 1000.0)
+            tasks.append(asyncio.create_task(one(route, request)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route in sorted(latencies):
+        values = latencies[route]
+        failed = sum(count for status, count in statuses[route].items() if not status.startswith(("2", "3")))
+        routes[route] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / elapsed, 3),
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+            "mean_ms": _ms(statistics.fmean(values)),
+            "ttfb_p50_ms": _ms(percentile(first_bytes[route], 50)),
+            "ttfb_p95_ms": _ms(percentile(first_bytes[route], 95)),
+            "error_rate": round(failed / len(values), 4),
+            "statuses": dict(statuses[route]),
+            "captured_p50_ms": _ms(percentile(captured[route], 50)),
+            "captured_p95_ms": _ms(percentile(captured[route], 95)),
+        }
+
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        "speed": speed,
+        "captured_duration_s": round(records[-1]["at"], 2) if records else 0.0,
+        "duration_s": round(elapsed, 2),
+        "completed": completed,
+        "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+        "late_starts": late,
+        "skipped": dict(skipped),
+        "routes": routes,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def print_report(report: dict):
+    print(f"\n{report['completed']} requests in {report['duration_s']}s at {report['speed']}x "
+          f"(captured over {report['captured_duration_s']}s; {report['throughput_rps']} rps, "
+          f"{report['late_starts']} started late)")
+    if report["skipped"]:
+        print(f"skipped (ids from unrecorded responses): {report['skipped']}")
+    print(f"{'route':<40} {'reqs':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'ttfb95':>8} {'err':>6}  captured p50/p95")
+    for route, stats in report["routes"].items():
+        print(f"{route:<40} {stats['requests']:>6} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} "
+              f"{stats['ttfb_p95_ms'] or '-':>8} {stats['error_rate']:>6.1%}  "
+              f"{stats['captured_p50_ms']}/{stats['captured_p95_ms']}")
+    warn_if_rate_limited(report["routes"])
+
+
+# --- compare ----------------------------------------------------------------------------------
+
+
+def compare(base: dict, candidate: dict, threshold: float) -> bool:
+    """Print per-route changes; False if any route's p95 grew by more than `threshold` or it errs more"""
+    ok = True
+    print(f"{'route':<40} {'metric':<14} {'base':>10} {'candidate':>10} {'change':>8}")
+    for route in sorted(set(base["routes"]) | set(candidate["routes"])):
+        before, after = base["routes"].get(route), candidate["routes"].get(route)
+        if before is None or after is None:
+            print(f"{route:<40} {'only in ' + ('candidate' if before is None else 'base'):<14}")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "ttfb_p95_ms", "throughput_rps"):
+            old, new = before[metric], after[metric]
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            flag = "  REGRESSION" if metric == "p95_ms" and change > threshold else ""
+            ok = ok and not flag
+            print(f"{route:<40} {metric:<14} {old:>10} {new:>10} {change:>+7.1%}{flag}")
+        old, new = before["error_rate"], after["error_rate"]
+        flag = "  REGRESSION" if new > old + 0.01 else ""
+        ok = ok and not flag
+        print(f"{route:<40} {'error_rate':<14} {old:>10.2%} {new:>10.2%} {new - old:>+7.2%}{flag}")
+    print(f"\noverall throughput: {base['throughput_rps']} -> {candidate['throughput_rps']} rps")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upstream = commands.add_parser("upstream", help="serve OpenAI and ElevenLabs from a capture")
+    upstream.add_argument("capture", nargs="+")
+    upstream.add_argument("--host", default="127.0.0.1")
+    upstream.add_argument("--port", type=int, default=9100)
+    upstream.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="replay a capture against the app")
+    run.add_argument("capture", nargs="+")
+    run.add_argument("--base-url", default="http://127.0.0.1:8065")
+    run.add_argument("--speed", type=float, default=1.0, help="time compression (2 = twice the captured rate)")
+    run.add_argument("--timeout", type=float, default=120.0)
+    run.add_argument("--max-in-flight", type=int, default=512)
+    run.add_argument("--json", help="also write the report to this file")
+
+    diff = commands.add_parser("compare", help="compare two run reports")
+    diff.add_argument("base")
+    diff.add_argument("candidate")
+    diff.add_argument("--threshold", type=float, default=0.1, help="allowed p95 growth before failing (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.command == "upstream":
+        records = load_capture(args.capture)
+        uvicorn.run(create_replay_upstream(RecordedUpstream(records, args.seed)),
+                    host=args.host, port=args.port, log_level="warning")
+    elif args.command == "run":
+        report = asyncio.run(replay(load_capture(args.capture), args.base_url, args.speed,
+                                    args.timeout, args.max_in_flight))
+        print_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    else:
+        with open(args.base, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.candidate, "r", encoding="utf-8") as f:
+            candidate = json.load(f)
+        if not compare(base, candidate, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cold-start profile for the service
+
+Breaks down where start-up time goes, each step in a fresh interpreter so
+nothing is already cached in sys.modules:
+
+    1. `import app.main`, measured with `python -X importtime` and grouped by
+       top-level package, plus the slowest individual modules
+    2. wall-clock time of the bare import, repeated for a stable median
+    3. first construction of the LLM gateway (OpenAI SDK import + pooled client)
+
+Usage:
+    python -m benchmarks.startup_profile --runs 5 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ENV = dict(os.environ)
+# No real keys are needed to import or build clients
+ENV.setdefault("OPEN_AI_API_KEY", "profile")
+ENV.setdefault("ELEVENLABS_API_KEY", "profile")
+
+IMPORT_TIMER = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+INIT_TIMER = (
+    "import time; import app.main; "
+    "from app.services.api_manager.llm_gateway import get_llm_gateway; "
+    "t = time.perf_counter(); get_llm_gateway(); print(time.perf_counter() - t)"
+)
+
+
+def _python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        env=ENV, capture_output=True, text=True, check=True
+    )
+
+
+def import_breakdown() -> Tuple[Dict[str, int], List[Tuple[int, str]]]:
+    """Self time (us) per top-level package, and (self_us, module) for every module"""
+    result = _python("import app.main", "-X", "importtime")
+    by_package: Dict[str, int] = defaultdict(int)
+    modules: List[Tuple[int, str]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        module = name.strip()
+        by_package[module.split(".")[0]] += int(self_us)
+        modules.append((int(self_us), module))
+    return by_package, sorted(modules, reverse=True)
+
+
+def median_seconds(code: str, runs: int) -> float:
+    return statistics.median(float(_python(code).stdout.strip().splitlines()[-1]) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    by_package, modules = import_breakdown()
+    total_us = sum(by_package.values())
+
+    print(f"import app.main: {total_us / 1000:.1f} ms of module self-time\n")
+    print(f"{'package':<28} {'ms':>8} {'share':>7}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<28} {self_us / 1000:>8.1f} {self_us / total_us:>7.1%}")
+
+    print(f"\n{'slowest modules':<50} {'ms':>8}")
+    for self_us, module in modules[:args.top]:
+        print(f"{module:<50} {self_us / 1000:>8.1f}")
+
+    loaded = {module.split(".")[0] for _, module in modules}
+    deferred = [name for name in ("openai", "requests") if name not in loaded]
+    if deferred:
+        print(f"\nDeferred until first use: {', '.join(deferred)}")
+
+    print(f"\nWall clock, median of {args.runs} fresh interpreters:")
+    print(f"  import app.main            {median_seconds(IMPORT_TIMER, args.runs) * 1000:>8.1f} ms")
+    print(f"  first get_llm_gateway()    {median_seconds(INIT_TIMER, args.runs) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Event-loop responsiveness benchmark for STTService.transcribe
+
+Runs several transcriptions concurrently against a fake Whisper client with a
+fixed upstream latency and measures how late a 10 ms heartbeat task fires
+while they are in flight. A blocking transcription path shows lag close to
+the full upstream latency; the async path should stay within a few ms.
+
+Usage:
+    python -m benchmarks.stt_event_loop --uploads 8 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+# The service reads its settings at import time; no real keys are needed here
+os.environ.setdefault("OPEN_AI_API_KEY", "benchmark")
+os.environ.setdefault("ELEVENLABS_API_KEY", "benchmark")
+
+from app.services.speech_to_text.speech_to_text_service import STTService  # noqa: E402
+
+
+class _AsyncTranscriptions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, model, file):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text="In the beginning God created the heaven and the earth.")
+
+
+class _BlockingTranscriptions(_AsyncTranscriptions):
+    async def create(self, model, file):
+        # Mimics the old behaviour: a sync client call inside a coroutine
+        time.sleep(self.latency)
+        return SimpleNamespace(text="In the beginning God created the heaven and the earth.")
+
+
+def _fake_client(transcriptions) -> SimpleNamespace:
+    return SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions))
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float, lags: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _run(service: STTService, uploads: int, payload: bytes) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(stop, 0.01, lags))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(service.transcribe(payload, f"clip{i}.wav") for i in range(uploads)))
+    wall = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "wall_s": wall,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_max_ms": lags_ms[-1],
+    }
+
+
+async def main(uploads: int, latency: float, payload_kb: int):
+    payload = b"RIFF\0\0\0\0WAVE" + b"\0" * (payload_kb * 1024)
+    for label, transcriptions in (
+        ("blocking", _BlockingTranscriptions(latency)),
+        ("async", _AsyncTranscriptions(latency)),
+    ):
+        service = STTService()
+        service.client = _fake_client(transcriptions)
+        result = await _run(service, uploads, payload)
+        print(
+            f"{label:>8}: {uploads} uploads in {result['wall_s']:.2f}s "
+            f"(concurrency {service.max_concurrency}) | "
+            f"loop lag p50 {result['lag_p50_ms']:.1f}ms max {result['lag_max_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Whisper latency in seconds")
+    parser.add_argument("--payload-kb", type=int, default=512)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.latency, args.payload_kb))
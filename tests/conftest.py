@@ -0,0 +1,5 @@
+import os
+
+# Settings are read at import time; no real keys are needed to test local code
+os.environ.setdefault("OPEN_AI_API_KEY", "test")
+os.environ.setdefault("ELEVENLABS_API_KEY", "test")
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from app.services.speech_to_text.audio_ingest import (
+    AudioTooLargeError,
+    detect_audio_format,
+    ingest_upload,
+    normalized_filename,
+)
+
+FORMATS = {"wav", "mp3", "m4a", "mp4", "webm"}
+WAV = b"RIFF\x24\x00\x00\x00WAVEfmt " + bytes(32)
+
+
+@pytest.mark.parametrize("head, expected", [
+    (WAV[:16], "wav"),
+    (b"ID3\x04\x00" + bytes(11), "mp3"),
+    (b"\xff\xfb\x90\x64" + bytes(12), "mp3"),  # MPEG-1 Layer III
+    (b"\xff\xf3\x90\x64" + bytes(12), "mp3"),  # MPEG-2 Layer III
+    (b"\xff\xf1\x50\x80" + bytes(12), None),  # AAC ADTS: same sync word, layer bits 00
+    (b"\x00\x00\x00\x20ftypM4A " + bytes(4), "m4a"),
+    (b"\x00\x00\x00\x20ftypisom" + bytes(4), "mp4"),
+    (b"\x1a\x45\xdf\xa3" + bytes(12), "webm"),
+    (b"OggS" + bytes(12), None),
+    (b"\xff", None),
+    (b"", None),
+])
+def test_detect_audio_format(head, expected):
+    assert detect_audio_format(head) == expected
+
+
+def test_filename_takes_the_detected_extension():
+    assert normalized_filename("sermon.mp3", "wav") == "sermon.wav"
+    assert normalized_filename("voice.note.m4a", "mp4") == "voice.note.mp4"
+    assert normalized_filename("recording", "webm") == "recording.webm"
+    assert normalized_filename(".mp3", "mp3") == "audio.mp3"
+
+
+def _ingest(data: bytes, max_bytes: int = 1024, filename: str = "clip.mp3"):
+    upload = UploadFile(io.BytesIO(data), filename=filename)
+    return asyncio.run(ingest_upload(upload, max_bytes=max_bytes, allowed_formats=FORMATS, chunk_size=16))
+
+
+def test_ingest_hashes_and_rewinds_a_valid_upload():
+    data = WAV + bytes(100)
+    audio = _ingest(data)
+    assert (audio.format, audio.filename, audio.size) == ("wav", "clip.wav", len(data))
+    assert audio.sha256 == hashlib.sha256(data).hexdigest()
+    assert audio.file.read() == data
+
+
+def test_ingest_rejects_oversized_uploads():
+    with pytest.raises(AudioTooLargeError):
+        _ingest(WAV + bytes(2000))
+
+
+def test_ingest_rejects_unsupported_and_empty_uploads():
+    with pytest.raises(ValueError, match="Unsupported format"):
+        _ingest(b"\xff\xf1\x50\x80" + bytes(100))
+    with pytest.raises(ValueError, match="Empty"):
+        _ingest(b"")
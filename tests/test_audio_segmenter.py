@@ -0,0 +1,105 @@
+import io
+import wave
+from array import array
+
+import pytest
+
+from app.services.speech_to_text.audio_segmenter import (
+    encode_wav,
+    iter_wav_segments,
+    stitch_transcripts,
+    wav_duration_seconds,
+)
+
+RATE = 8000
+
+
+def _pcm(*parts) -> bytes:
+    """16-bit mono PCM from (seconds, amplitude) parts; amplitude 0 is silence"""
+    samples = array("h")
+    for seconds, amplitude in parts:
+        samples.extend(amplitude if i % 2 else -amplitude for i in range(int(seconds * RATE)))
+    return samples.tobytes()
+
+
+def _frames(data: bytes) -> bytes:
+    with wave.open(io.BytesIO(data), "rb") as reader:
+        assert reader.getframerate() == RATE and reader.getnchannels() == 1
+        return reader.readframes(reader.getnframes())
+
+
+def _segments(pcm: bytes, segment_seconds=4.0, overlap_seconds=0.5, search_seconds=1.0, max_bytes=10_000_000):
+    return list(iter_wav_segments(
+        io.BytesIO(encode_wav(pcm, RATE)), segment_seconds, overlap_seconds, search_seconds, max_bytes
+    ))
+
+
+def test_short_recording_is_one_segment():
+    pcm = _pcm((2.0, 1000))
+    segments = _segments(pcm)
+    assert len(segments) == 1
+    assert (segments[0].start_seconds, segments[0].end_seconds) == (0.0, 2.0)
+    assert _frames(segments[0].data) == pcm
+
+
+def test_cut_lands_in_the_nearby_silence():
+    # Target cut at 4.0 s; the only quiet stretch within the 1 s search window is 4.5-4.7 s
+    pcm = _pcm((4.5, 1000), (0.2, 0), (4.3, 1000))
+    segments = _segments(pcm)
+    assert len(segments) == 3
+    assert 4.5 <= segments[0].end_seconds <= 4.7
+
+
+def test_segments_overlap_and_cover_the_recording():
+    pcm = _pcm((3.0, 1000), (0.3, 0), (3.0, 2000), (0.3, 0), (3.4, 1000))
+    segments = _segments(pcm, overlap_seconds=0.5)
+    assert [segment.index for segment in segments] == list(range(len(segments)))
+    assert segments[-1].end_seconds == pytest.approx(10.0)
+    for previous, segment in zip(segments, segments[1:]):
+        assert segment.start_seconds == pytest.approx(previous.end_seconds - 0.5)
+    # Every segment holds exactly its slice of the original audio
+    for segment in segments:
+        start, end = int(segment.start_seconds * RATE) * 2, int(round(segment.end_seconds * RATE)) * 2
+        assert _frames(segment.data) == pcm[start:end]
+
+
+def test_segment_size_is_capped():
+    pcm = _pcm((10.0, 1000))
+    max_bytes = 3 * RATE * 2
+    segments = _segments(pcm, segment_seconds=60.0, max_bytes=max_bytes)
+    assert len(segments) > 1
+    assert all(len(segment.data) <= max_bytes for segment in segments)
+
+
+def test_settings_without_room_for_audio_are_rejected():
+    with pytest.raises(ValueError):
+        _segments(_pcm((5.0, 1000)), segment_seconds=1.0, search_seconds=1.0)
+
+
+def test_non_wav_input_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_wav_segments(io.BytesIO(b"ID3" + bytes(100)), 4.0, 0.5, 1.0, 10_000_000))
+    with pytest.raises(ValueError):
+        wav_duration_seconds(io.BytesIO(b"not a wav file"))
+
+
+def test_duration_leaves_the_file_rewound():
+    file = io.BytesIO(encode_wav(_pcm((1.5, 1000)), RATE))
+    assert wav_duration_seconds(file) == pytest.approx(1.5)
+    assert file.tell() == 0
+
+
+def test_stitch_drops_words_repeated_across_the_overlap():
+    parts = ["In the beginning God created", "God created the heaven and the earth."]
+    assert stitch_transcripts(parts) == "In the beginning God created the heaven and the earth."
+
+
+def test_stitch_ignores_case_and_punctuation_in_the_overlap():
+    parts = ["The Lord is my shepherd, I shall", "shepherd; I shall not want."]
+    assert stitch_transcripts(parts) == "The Lord is my shepherd, I shall not want."
+
+
+def test_stitch_keeps_single_repeated_words_and_skips_empty_parts():
+    assert stitch_transcripts(["Amen", "Amen and amen"]) == "Amen Amen and amen"
+    assert stitch_transcripts(["", "Let there be light", ""]) == "Let there be light"
+    assert stitch_transcripts([]) == ""
@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+    is_upstream_failure,
+)
+from app.core.deadline import DeadlineExceeded
+
+
+def _breaker(open_seconds: float = 0.0, probes: int = 2) -> CircuitBreaker:
+    # open_seconds=0 moves an opened breaker straight to half-open on the next look
+    return CircuitBreaker(
+        "test", slow_call_seconds=10.0, failure_ratio=0.5, window=4, min_calls=4,
+        open_seconds=open_seconds, half_open_probes=probes
+    )
+
+
+def _trip(breaker: CircuitBreaker):
+    for _ in range(4):
+        breaker.record(0.1, failed=True, probe=breaker.before_call())
+
+
+def _half_open() -> CircuitBreaker:
+    """A breaker that has just turned half-open, and stays open for a minute if it reopens"""
+    breaker = _breaker()
+    _trip(breaker)
+    assert breaker.state == HALF_OPEN
+    breaker.open_seconds = 60.0
+    return breaker
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def test_opens_at_failure_ratio_once_window_has_min_calls():
+    breaker = _breaker(open_seconds=60.0)
+    breaker.record(0.1, failed=True)
+    breaker.record(0.1, failed=True)
+    breaker.record(0.1, failed=False)
+    assert breaker.state == CLOSED
+    breaker.record(0.1, failed=False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_slow_calls_open_the_breaker():
+    breaker = _breaker(open_seconds=60.0)
+    for _ in range(4):
+        breaker.record(11.0, failed=False)
+    assert breaker.state == OPEN
+
+
+def test_half_open_admits_only_the_probe_limit():
+    breaker = _breaker()
+    _trip(breaker)
+    assert breaker.state == HALF_OPEN
+    breaker.check()  # check() never takes a probe
+    assert breaker.before_call() is True
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_probe_successes_close_the_breaker():
+    breaker = _breaker()
+    _trip(breaker)
+    first, second = breaker.before_call(), breaker.before_call()
+    breaker.record(0.1, failed=False, probe=first)
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.1, failed=False, probe=second)
+    assert breaker.state == CLOSED
+    assert breaker.before_call() is False
+
+
+@pytest.mark.parametrize("seconds, failed", [(0.1, True), (11.0, False)])
+def test_failed_or_slow_probe_reopens(seconds, failed):
+    breaker = _half_open()
+    breaker.record(seconds, failed=failed, probe=breaker.before_call())
+    assert breaker.state == OPEN
+
+
+def test_abandoned_probe_frees_its_place():
+    breaker = _breaker()
+    _trip(breaker)
+    first = breaker.before_call()
+    breaker.before_call()
+    breaker.abandon(first)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_abandon_after_leaving_half_open_is_ignored():
+    breaker = _half_open()
+    first, second = breaker.before_call(), breaker.before_call()
+    breaker.record(0.1, failed=True, probe=first)
+    assert breaker.state == OPEN
+    # The other probe ends unanswered after the breaker reopened
+    breaker.abandon(second)
+    breaker.open_seconds = 0.0
+    assert breaker.state == HALF_OPEN
+    # The reopened breaker's probe places are all available
+    assert breaker.before_call() is True
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_late_probe_and_non_probe_results_do_not_count():
+    breaker = _breaker()
+    _trip(breaker)
+    probe = breaker.before_call()
+    # A call admitted before the breaker opened reports while it is half-open
+    breaker.record(0.1, failed=True, probe=False)
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.1, failed=False, probe=probe)
+    breaker.record(0.1, failed=False, probe=breaker.before_call())
+    assert breaker.state == CLOSED
+    # A probe reporting after the breaker closed is ignored too
+    breaker.record(0.1, failed=True, probe=True)
+    assert breaker.state == CLOSED
+
+
+def test_guard_abandons_probe_on_cancellation_and_deadline():
+    breaker = _breaker()
+    _trip(breaker)
+    for error in (asyncio.CancelledError(), DeadlineExceeded("late")):
+        with pytest.raises(type(error)):
+            with breaker.guard():
+                raise error
+        assert breaker.state == HALF_OPEN
+    # Both probe places are free again
+    assert breaker.before_call() is True
+    assert breaker.before_call() is True
+
+
+def test_guard_records_upstream_failures():
+    breaker = _half_open()
+    with pytest.raises(_StatusError):
+        with breaker.guard():
+            raise _StatusError(503)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.parametrize("error, counts", [
+    (_StatusError(500), True),
+    (_StatusError(429), True),
+    (_StatusError(400), False),
+    (ConnectionError("reset"), True),
+    (DeadlineExceeded("late"), False),
+    (CircuitOpen("test", 1.0), False),
+    (asyncio.CancelledError(), False),
+])
+def test_is_upstream_failure(error, counts):
+    assert is_upstream_failure(error) is counts
+
+
+def test_disabled_breaker_never_opens():
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, window=4, min_calls=1, enabled=False)
+    for _ in range(10):
+        assert breaker.before_call() is False
+        breaker.record(5.0, failed=True)
+    breaker.check()
+    assert breaker.state == CLOSED
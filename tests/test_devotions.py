@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from app.services.Devotions import Devotions_generation
+from app.services.Devotions.Devotions_generation import (
+    DevotionEngine,
+    DevotionGenerationError,
+    DevotionStore,
+    parse_devotion,
+)
+
+DAY = datetime.date(2026, 3, 1)
+
+
+def _reply(reference: str = "psalm 46:10") -> str:
+    return json.dumps(["Be Still", reference, "Be still, and know that I am God.", "Reflection.", "Amen.", "Pause."])
+
+
+def _payload(day: datetime.date, title: str = "Be Still") -> dict:
+    payload = parse_devotion(day, _reply(), "test-model")
+    payload["title"] = title
+    return payload
+
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_parse_devotion_canonicalizes_the_reference():
+    payload = parse_devotion(DAY, _reply(), "test-model")
+    assert payload["scripture_reference"] == "Psalms 46:10"
+    assert payload["date"] == "2026-03-01" and payload["model"] == "test-model"
+
+
+@pytest.mark.parametrize("content", [
+    json.dumps(["Only", "three", "fields"]),
+    json.dumps(["Be Still", "Psalm 46:10", "", "Reflection.", "Amen.", "Pause."]),
+    "not json",
+    _reply("Hezekiah 3:1"),
+])
+def test_parse_devotion_rejects_malformed_replies(content):
+    with pytest.raises(DevotionGenerationError):
+        parse_devotion(DAY, content, "test-model")
+
+
+def test_store_keeps_the_first_write_for_a_day(tmp_path):
+    store = DevotionStore(str(tmp_path / "devotions.sqlite3"))
+    try:
+        store.put(_payload(DAY, "First"))
+        store.put(_payload(DAY, "Second"))
+        store.put(_payload(DAY + datetime.timedelta(days=2), "Later"))
+        assert store.get(DAY.isoformat())["title"] == "First"
+        assert store.get("2026-03-02") is None
+        assert store.latest_before("2026-03-03")["title"] == "First"
+        assert store.latest_before(DAY.isoformat()) is None
+        assert [p["title"] for p in store.get_range("2026-02-01", "2026-03-31")] == ["First", "Later"]
+    finally:
+        store.close()
+
+
+@pytest.fixture
+def engine_env(tmp_path, monkeypatch):
+    """Point engines at a temporary store and a scripted gateway; returns the list of prompts sent"""
+    prompts = []
+
+    async def complete(route, prompt):
+        prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(text=_reply(), model="test-model")
+
+    async def gateway():
+        return SimpleNamespace(complete=complete)
+
+    monkeypatch.setattr(Devotions_generation.settings, "devotions_db_path", str(tmp_path / "devotions.sqlite3"))
+    monkeypatch.setattr(Devotions_generation, "llm_gateway", gateway)
+    return prompts
+
+
+def test_concurrent_requests_share_one_generation(engine_env):
+    async def scenario():
+        engine = DevotionEngine()
+        responses = await asyncio.gather(*(engine.get(DAY) for _ in range(5)))
+        return responses, await engine.get(DAY)
+
+    responses, again = asyncio.run(scenario())
+    assert len(engine_env) == 1
+    assert all(response is responses[0] for response in responses)
+    assert again is responses[0]
+
+
+def test_stored_days_are_served_after_a_restart_without_generating(engine_env):
+    async def generate():
+        return (await DevotionEngine().get(DAY)).etag
+
+    async def restarted():
+        return await DevotionEngine().cached(DAY)
+
+    etag = asyncio.run(generate())
+    response = asyncio.run(restarted())
+    assert len(engine_env) == 1
+    assert response is not None and response.etag == etag
+
+
+def test_served_devotionals_revalidate_with_304(engine_env):
+    async def scenario():
+        return await DevotionEngine().get(DAY)
+
+    precomputed = asyncio.run(scenario())
+    full = precomputed(_request())
+    assert full.status_code == 200
+    assert full.headers["cache-control"] == "public, max-age=86400"
+    assert json.loads(full.body)["devotion"]["title"] == "Be Still"
+
+    revalidated = precomputed(_request(if_none_match=full.headers["etag"]))
+    assert revalidated.status_code == 304
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import (
+    DeadlineExceeded,
+    iter_within_deadline,
+    remaining,
+    reset_deadline,
+    set_deadline,
+    timeout_for,
+    within_deadline,
+)
+from app.core.hedging import HedgeBudget, hedged_call
+
+
+class Upstream:
+    """Answers each call after the next scripted delay, failing where the script says so"""
+
+    def __init__(self, *delays, fail=()):
+        self.delays = list(delays)
+        self.fail = set(fail)
+        self.started = 0
+        self.cancelled = 0
+
+    async def call(self):
+        attempt = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delays[attempt])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if attempt in self.fail:
+            raise RuntimeError(f"attempt {attempt} failed")
+        return attempt
+
+
+def _hedge(upstream: Upstream, hedge_after, budget=None, events=None):
+    events = events if events is not None else []
+    return asyncio.run(hedged_call(
+        upstream.call, hedge_after, budget or HedgeBudget(ratio=0.1, burst=1.0),
+        on_hedge=lambda: events.append("hedge"), on_hedge_win=lambda: events.append("win")
+    ))
+
+
+def test_fast_primary_is_not_hedged():
+    upstream = Upstream(0.0)
+    assert _hedge(upstream, 0.05) == 0
+    assert upstream.started == 1
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    upstream = Upstream(1.0, 0.0)
+    events = []
+    assert _hedge(upstream, 0.01, events=events) == 1
+    assert events == ["hedge", "win"]
+    assert upstream.cancelled == 1
+
+
+def test_primary_that_finishes_first_still_wins():
+    upstream = Upstream(0.03, 1.0)
+    events = []
+    assert _hedge(upstream, 0.01, events=events) == 0
+    assert events == ["hedge"]
+    assert upstream.cancelled == 1
+
+
+def test_failed_hedge_falls_back_to_the_primary():
+    upstream = Upstream(0.03, 0.0, fail={1})
+    assert _hedge(upstream, 0.01) == 0
+
+
+def test_primary_error_is_raised_when_both_fail():
+    upstream = Upstream(0.03, 0.0, fail={0, 1})
+    with pytest.raises(RuntimeError, match="attempt 0"):
+        _hedge(upstream, 0.01)
+
+
+def test_no_hedge_without_a_threshold_or_budget():
+    upstream = Upstream(0.03)
+    assert _hedge(upstream, None) == 0
+    assert upstream.started == 1
+
+    empty = HedgeBudget(ratio=0.1, burst=1.0)
+    empty.tokens = 0.0
+    upstream = Upstream(0.03)
+    assert _hedge(upstream, 0.01, budget=empty) == 0
+    assert upstream.started == 1
+
+
+def test_budget_earns_hedges_in_proportion_to_requests():
+    budget = HedgeBudget(ratio=0.25, burst=2.0)
+    assert budget.try_spend() and budget.try_spend() and not budget.try_spend()
+    for _ in range(3):
+        budget.record_request()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert budget.try_spend()
+    for _ in range(100):
+        budget.record_request()
+    assert budget.tokens == 2.0
+
+
+def test_timeouts_shrink_to_the_time_left():
+    assert remaining() is None and timeout_for(30.0) == 30.0
+    token = set_deadline(0.5)
+    try:
+        assert 0.4 < timeout_for(30.0) <= 0.5
+        assert timeout_for(0.1) == 0.1
+    finally:
+        reset_deadline(token)
+
+    token = set_deadline(-1.0)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            timeout_for(30.0)
+    finally:
+        reset_deadline(token)
+
+
+def test_within_deadline_cancels_a_call_that_outlives_the_budget():
+    upstream = Upstream(5.0)
+
+    async def scenario():
+        token = set_deadline(0.02)
+        try:
+            async with within_deadline("test"):
+                await upstream.call()
+        finally:
+            reset_deadline(token)
+
+    with pytest.raises(DeadlineExceeded, match="waiting for test"):
+        asyncio.run(scenario())
+    assert upstream.cancelled == 1
+
+
+def test_within_deadline_leaves_other_timeouts_alone():
+    async def scenario():
+        token = set_deadline(5.0)
+        try:
+            async with within_deadline("test"):
+                await asyncio.wait_for(asyncio.sleep(1.0), 0.01)
+        finally:
+            reset_deadline(token)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_streamed_reads_are_bounded_one_at_a_time():
+    async def trickle():
+        for delay in (0.0, 0.0, 5.0):
+            await asyncio.sleep(delay)
+            yield delay
+
+    async def scenario():
+        received = []
+        token = set_deadline(0.05)
+        try:
+            async for item in iter_within_deadline(trickle(), "test"):
+                received.append(item)
+        except DeadlineExceeded:
+            return received
+        finally:
+            reset_deadline(token)
+
+    assert asyncio.run(scenario()) == [0.0, 0.0]
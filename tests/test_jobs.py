@@ -0,0 +1,291 @@
+import asyncio
+import io
+import os
+import time
+from collections import Counter
+
+import pytest
+
+from app.core.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, IdempotencyConflict, Job, JobQueue, JobStore
+from app.services.jobs.jobs_service import split_for_tts
+
+
+def _queue(tmp_path, concurrency=None, max_workers: int = 4, max_attempts: int = 2) -> JobQueue:
+    return JobQueue(
+        db_path=str(tmp_path / "jobs.sqlite3"),
+        artifact_dir=str(tmp_path / "jobs"),
+        max_workers=max_workers,
+        concurrency=concurrency or {"echo": 1},
+        retention_seconds=3600,
+        max_attempts=max_attempts
+    )
+
+
+async def _echo(job, progress):
+    return {"params": job.params}
+
+
+async def _finished(queue: JobQueue, job_id: str) -> Job:
+    """The job once it reaches a terminal status"""
+    async def last():
+        async for job in queue.watch(job_id, heartbeat=0.05):
+            pass
+        return job
+
+    return await asyncio.wait_for(last(), 5.0)
+
+
+def _store_job(db_path: str, status: str, attempts: int) -> str:
+    """Leave a job in the table the way a killed process would"""
+    store = JobStore(db_path)
+    job = Job(id=f"{status}-{attempts}", type="echo", status=status, params={"n": attempts}, created_at=time.time(),
+              attempts=attempts)
+    store.insert(job)
+    store.close()
+    return job.id
+
+
+def test_job_runs_to_success(tmp_path):
+    async def scenario():
+        queue = _queue(tmp_path)
+        queue.register("echo", _echo)
+        await queue.start()
+        try:
+            job, created = await queue.submit("echo", {"text": "hi"})
+            assert created and job.status == QUEUED
+            done = await _finished(queue, job.id)
+        finally:
+            await queue.stop()
+        assert done.status == SUCCEEDED
+        assert done.result == {"params": {"text": "hi"}}
+        assert done.attempts == 1 and done.progress == 1.0
+
+    asyncio.run(scenario())
+
+
+def test_handler_failure_is_recorded(tmp_path):
+    async def fail(job, progress):
+        raise RuntimeError("upstream said no")
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        queue.register("echo", fail)
+        await queue.start()
+        try:
+            job, _ = await queue.submit("echo", {})
+            return await _finished(queue, job.id)
+        finally:
+            await queue.stop()
+
+    done = asyncio.run(scenario())
+    assert done.status == FAILED
+    assert done.error == "upstream said no"
+
+
+def test_restart_requeues_interrupted_and_queued_jobs(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    interrupted = _store_job(db_path, RUNNING, attempts=1)
+    waiting = _store_job(db_path, QUEUED, attempts=0)
+
+    async def scenario():
+        queue = _queue(tmp_path, max_attempts=2)
+        queue.register("echo", _echo)
+        await queue.start()
+        try:
+            return [await _finished(queue, job_id) for job_id in (interrupted, waiting)]
+        finally:
+            await queue.stop()
+
+    rerun, run = asyncio.run(scenario())
+    assert rerun.status == SUCCEEDED and rerun.attempts == 2
+    assert run.status == SUCCEEDED and run.attempts == 1
+
+
+def test_restart_fails_jobs_out_of_attempts(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    exhausted = _store_job(db_path, RUNNING, attempts=2)
+    ran = []
+
+    async def record(job, progress):
+        ran.append(job.id)
+        return {}
+
+    async def scenario():
+        queue = _queue(tmp_path, max_attempts=2)
+        queue.register("echo", record)
+        await queue.start()
+        try:
+            return await _finished(queue, exhausted)
+        finally:
+            await queue.stop()
+
+    done = asyncio.run(scenario())
+    assert done.status == FAILED
+    assert done.error == "Interrupted by restarts too many times"
+    assert ran == []
+
+
+def test_reused_idempotency_key_returns_the_original_job(tmp_path):
+    ran = []
+
+    async def record(job, progress):
+        ran.append(job.id)
+        return {}
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        queue.register("echo", record)
+        await queue.start()
+        try:
+            first, created = await queue.submit("echo", {"text": "hi"}, idempotency_key="k1")
+            await _finished(queue, first.id)
+            again, created_again = await queue.submit("echo", {"text": "hi"}, idempotency_key="k1")
+            return first, created, again, created_again
+        finally:
+            await queue.stop()
+
+    first, created, again, created_again = asyncio.run(scenario())
+    assert created and not created_again
+    assert again.id == first.id and again.status == SUCCEEDED
+    assert ran == [first.id]
+
+
+def test_reused_idempotency_key_with_new_params_conflicts(tmp_path):
+    async def scenario():
+        queue = _queue(tmp_path, concurrency={"echo": 1, "other": 1})
+        queue.register("echo", _echo)
+        queue.register("other", _echo)
+        await queue.start()
+        try:
+            await queue.submit("echo", {"text": "hi"}, idempotency_key="k1")
+            with pytest.raises(IdempotencyConflict):
+                await queue.submit("echo", {"text": "bye"}, idempotency_key="k1")
+            # Keys are per job type
+            other, created = await queue.submit("other", {"text": "bye"}, idempotency_key="k1")
+            assert created
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_attachment_is_written_before_the_job_is_stored(tmp_path):
+    seen_at_insert = []
+
+    async def read_input(job, progress):
+        with open(queue.artifact_path(job.id, "input"), "rb") as f:
+            return {"input": f.read().decode()}
+
+    queue = _queue(tmp_path)
+    queue.register("echo", read_input)
+
+    async def scenario():
+        await queue.start()
+        insert = queue.store.insert
+
+        def checked_insert(job):
+            seen_at_insert.append(os.path.exists(queue.artifact_path(job.id, "input")))
+            return insert(job)
+
+        queue.store.insert = checked_insert
+        try:
+            job, _ = await queue.submit("echo", {}, idempotency_key="k1", attachment=io.BytesIO(b"audio"))
+            done = await _finished(queue, job.id)
+            # A duplicate's copy of the upload is discarded; the original input is kept
+            again, created = await queue.submit("echo", {}, idempotency_key="k1", attachment=io.BytesIO(b"other"))
+        finally:
+            await queue.stop()
+        return job, done, again, created
+
+    job, done, again, created = asyncio.run(scenario())
+    assert seen_at_insert == [True, True]
+    assert done.result == {"input": "audio"}
+    assert not created and again.id == job.id
+    assert os.listdir(tmp_path / "jobs") == [job.id]
+    assert (tmp_path / "jobs" / job.id / "input").read_bytes() == b"audio"
+
+
+def test_failed_insert_leaves_no_attachment(tmp_path):
+    async def scenario():
+        queue = _queue(tmp_path)
+        queue.register("echo", _echo)
+        await queue.start()
+
+        def broken_insert(job):
+            raise OSError("disk full")
+
+        queue.store.insert = broken_insert
+        try:
+            with pytest.raises(OSError):
+                await queue.submit("echo", {}, attachment=io.BytesIO(b"audio"))
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert os.listdir(tmp_path / "jobs") == []
+
+
+def _tracking_handler(running: Counter, peak: Counter):
+    async def handler(job, progress):
+        running[job.type] += 1
+        running["total"] += 1
+        for key in (job.type, "total"):
+            peak[key] = max(peak[key], running[key])
+        await asyncio.sleep(0.02)
+        running[job.type] -= 1
+        running["total"] -= 1
+        return {}
+
+    return handler
+
+
+def _run_batch(tmp_path, concurrency, max_workers, jobs_per_type: int = 4) -> Counter:
+    running, peak = Counter(), Counter()
+
+    async def scenario():
+        queue = _queue(tmp_path, concurrency=concurrency, max_workers=max_workers)
+        for job_type in concurrency:
+            queue.register(job_type, _tracking_handler(running, peak))
+        await queue.start()
+        try:
+            jobs = [
+                (await queue.submit(job_type, {"n": n}))[0]
+                for n in range(jobs_per_type) for job_type in concurrency
+            ]
+            done = [await _finished(queue, job.id) for job in jobs]
+        finally:
+            await queue.stop()
+        assert all(job.status == SUCCEEDED for job in done)
+
+    asyncio.run(scenario())
+    return peak
+
+
+def test_each_type_runs_at_most_its_worker_count(tmp_path):
+    peak = _run_batch(tmp_path, {"serial": 1, "wide": 3}, max_workers=10)
+    assert peak["serial"] == 1
+    assert peak["wide"] == 3
+    assert peak["total"] == 4
+
+
+def test_max_workers_caps_all_types_together(tmp_path):
+    peak = _run_batch(tmp_path, {"serial": 1, "wide": 3}, max_workers=2)
+    assert peak["serial"] == 1
+    assert peak["total"] == 2
+
+
+def test_split_for_tts_packs_whole_sentences():
+    assert split_for_tts("Short text.", 100) == ["Short text."]
+    assert split_for_tts("One. Two two! Three? Four.", 14) == ["One. Two two!", "Three? Four."]
+
+
+def test_split_for_tts_breaks_long_sentences_on_whitespace():
+    text = "In the beginning God created the heaven and the earth. And the earth was without form, and void."
+    chunks = split_for_tts(text, 20)
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_split_for_tts_cuts_unbroken_text_and_skips_blank_input():
+    assert split_for_tts("x" * 30, 12) == ["x" * 12, "x" * 12, "x" * 6]
+    assert split_for_tts("  ", 12) == []
@@ -0,0 +1,170 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.circuit_breaker import OPEN, CircuitBreaker, CircuitOpen
+from app.core.deadline import DeadlineExceeded, reset_deadline, set_deadline
+from app.services.api_manager import llm_gateway as gateway_module
+from app.services.api_manager.llm_gateway import LLMGateway
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _connection_error() -> Exception:
+    return openai.APIConnectionError(request=_REQUEST)
+
+
+def _bad_request() -> Exception:
+    return openai.BadRequestError("bad request", response=httpx.Response(400, request=_REQUEST), body=None)
+
+
+class FakeCompletions:
+    """Plays back a script of replies: a string answers, an exception is raised, (seconds, reply) waits first"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def create(self, messages, timeout, **params):
+        self.calls += 1
+        step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, tuple):
+            await asyncio.sleep(step[0])
+            step = step[1]
+        if isinstance(step, Exception):
+            raise step
+        message = SimpleNamespace(content=step)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def breaker(monkeypatch) -> CircuitBreaker:
+    """A private breaker, so failures scripted here never trip the process-wide one"""
+    breaker = CircuitBreaker("test", slow_call_seconds=10.0, window=4, min_calls=4, open_seconds=60.0)
+    monkeypatch.setattr(gateway_module, "openai_breaker", breaker)
+    return breaker
+
+
+def _trip(breaker: CircuitBreaker):
+    while breaker.state != OPEN:
+        breaker.record(0.1, failed=True, probe=breaker.before_call())
+
+
+def _gateway(breaker, *script, max_retries: int = 2) -> LLMGateway:
+    gateway = LLMGateway()
+    gateway.completions = FakeCompletions(*script)
+    gateway.client = SimpleNamespace(chat=SimpleNamespace(completions=gateway.completions))
+    gateway.max_retries = max_retries
+    gateway.retry_base_delay = 0.0
+    gateway._hedge_delay = lambda route: None
+    return gateway
+
+
+def test_transient_errors_are_retried(breaker):
+    gateway = _gateway(breaker, _connection_error(), _connection_error(), "Grace and peace")
+    result = asyncio.run(gateway.complete("verse_batch", "Generate verses"))
+    assert result.text == "Grace and peace"
+    assert gateway.completions.calls == 3
+
+
+def test_retries_give_up_after_max_retries(breaker):
+    gateway = _gateway(breaker, _connection_error(), max_retries=1)
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(gateway.complete("verse_batch", "Generate verses"))
+    assert gateway.completions.calls == 2
+
+
+def test_client_errors_are_not_retried(breaker):
+    gateway = _gateway(breaker, _bad_request())
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(gateway.complete("verse_batch", "Generate verses"))
+    assert gateway.completions.calls == 1
+
+
+def test_no_retry_once_the_backoff_would_outlast_the_deadline(breaker):
+    gateway = _gateway(breaker, _connection_error(), "too late")
+    gateway.retry_base_delay = gateway.retry_max_delay = 5.0
+
+    async def scenario():
+        token = set_deadline(1.0)
+        try:
+            await gateway.complete("verse_batch", "Generate verses")
+        finally:
+            reset_deadline(token)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    assert gateway.completions.calls == 1
+
+
+def test_cacheable_routes_answer_repeated_questions_from_cache(breaker):
+    gateway = _gateway(breaker, "Love is patient")
+
+    async def scenario():
+        first = await gateway.complete("bible_chat", "What is love?")
+        second = await gateway.complete("bible_chat", "  what is   LOVE? ")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert (first.cached, second.cached) == (False, True)
+    assert second.text == "Love is patient"
+    assert gateway.completions.calls == 1
+
+
+def test_uncacheable_routes_always_call_upstream(breaker):
+    gateway = _gateway(breaker, "[]")
+
+    async def scenario():
+        for _ in range(2):
+            await gateway.complete("verse_batch", "Generate verses")
+
+    asyncio.run(scenario())
+    assert gateway.completions.calls == 2
+
+
+def test_expired_answer_is_served_while_openai_fails(breaker):
+    gateway = _gateway(breaker, "Love is patient", _connection_error(), max_retries=1)
+    # Entries expire as soon as they are written, so the second call goes upstream
+    gateway.response_cache.ttl_seconds = -1
+
+    async def scenario():
+        await gateway.complete("bible_chat", "What is love?")
+        return await gateway.complete("bible_chat", "What is love?")
+
+    result = asyncio.run(scenario())
+    assert result.text == "Love is patient"
+    assert result.stale and result.cached
+    assert gateway.completions.calls == 3
+
+
+def test_expired_answer_is_served_while_the_breaker_is_open(breaker):
+    gateway = _gateway(breaker, "Love is patient")
+    gateway.response_cache.ttl_seconds = -1
+
+    async def scenario():
+        await gateway.complete("bible_chat", "What is love?")
+        _trip(breaker)
+        return await gateway.complete("bible_chat", "What is love?")
+
+    result = asyncio.run(scenario())
+    assert result.stale and result.text == "Love is patient"
+    assert gateway.completions.calls == 1
+
+
+def test_failure_without_a_stored_answer_propagates(breaker):
+    gateway = _gateway(breaker, "unused")
+    _trip(breaker)
+    with pytest.raises(CircuitOpen):
+        asyncio.run(gateway.complete("bible_chat", "What is love?"))
+    assert gateway.completions.calls == 0
+
+
+def test_slow_completions_are_hedged(breaker):
+    gateway = _gateway(breaker, (1.0, "slow reply"), "hedged reply")
+    gateway._hedge_delay = lambda route: 0.01
+    result = asyncio.run(gateway.complete("verse_batch", "Generate verses"))
+    assert result.text == "hedged reply"
+    assert gateway.completions.calls == 2
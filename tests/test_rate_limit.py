@@ -0,0 +1,89 @@
+import pytest
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, TokenBucketTable
+
+CHAT = f"{settings.api_v1_prefix}/bible-chat/query"
+
+
+def test_new_client_starts_with_a_full_bucket():
+    table = TokenBucketTable(rate=1.0, burst=5.0)
+    for _ in range(5):
+        assert table.take(["ip:a"], 1.0, now=0.0) == 0.0
+    assert table.take(["ip:a"], 1.0, now=0.0) == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    table = TokenBucketTable(rate=2.0, burst=4.0)
+    assert table.take(["ip:a"], 4.0, now=0.0) == 0.0
+    # Half a second at 2 tokens/s refills one token
+    assert table.take(["ip:a"], 2.0, now=0.5) == pytest.approx(0.5)
+    assert table.take(["ip:a"], 1.0, now=0.5) == 0.0
+    # Long idle refills to burst, never beyond it
+    assert table.take(["ip:a"], 4.0, now=100.0) == 0.0
+    assert table.take(["ip:a"], 0.5, now=100.0) == pytest.approx(0.25)
+
+
+def test_rejected_take_charges_nothing():
+    table = TokenBucketTable(rate=1.0, burst=3.0)
+    table.take(["ip:a"], 2.0, now=0.0)
+    assert table.take(["ip:a"], 2.0, now=0.0) == pytest.approx(1.0)
+    # The failed attempt did not spend the remaining token
+    assert table.take(["ip:a"], 1.0, now=0.0) == 0.0
+
+
+def test_cost_above_burst_is_capped():
+    table = TokenBucketTable(rate=1.0, burst=3.0)
+    assert table.take(["ip:a"], 10.0, now=0.0) == 0.0
+    assert table.take(["ip:a"], 10.0, now=1.0) == pytest.approx(2.0)
+
+
+def test_take_is_all_or_nothing_across_keys():
+    table = TokenBucketTable(rate=1.0, burst=2.0)
+    table.take(["key:k"], 2.0, now=0.0)
+    # The IP has room but the key doesn't: neither is charged
+    assert table.take(["ip:a", "key:k"], 1.0, now=0.0) == pytest.approx(1.0)
+    assert table.take(["ip:a"], 2.0, now=0.0) == 0.0
+
+
+def test_charge_goes_into_debt_repaid_by_refill():
+    table = TokenBucketTable(rate=10.0, burst=100.0)
+    table.charge(["ip:a"], 150.0, now=0.0)
+    # 50 tokens in debt: positive again just after 5 s
+    assert table.wait_for_credit(["ip:a"], now=0.0) == pytest.approx(5.1)
+    assert table.wait_for_credit(["ip:a"], now=4.0) == pytest.approx(1.1)
+    assert table.wait_for_credit(["ip:a"], now=5.5) == 0.0
+
+
+def test_sweep_drops_refilled_buckets():
+    table = TokenBucketTable(rate=1.0, burst=2.0, shards=1, sweep_every=2)
+    table.take(["ip:a"], 1.0, now=0.0)
+    table.take(["ip:b"], 2.0, now=0.0)
+    # The second operation swept at now=0, when neither bucket was full
+    assert len(table) == 2
+    table.take(["ip:c"], 1.0, now=1.5)
+    table.take(["ip:c"], 0.5, now=1.5)
+    # By now ip:a has refilled and is dropped; ip:b (1.5 tokens) and ip:c (0.5) are kept
+    assert len(table) == 2
+
+
+def test_limiter_weights_requests_by_route_cost():
+    limiter = RateLimiter()
+    limiter.requests = TokenBucketTable(rate=1.0, burst=4.0)
+    clients = ("ip:a",)
+    assert limiter.check(clients, CHAT, now=0.0) is None
+    assert limiter.check(clients, CHAT, now=0.0) is None
+    resource, wait = limiter.check(clients, CHAT, now=0.0)
+    assert resource == "requests"
+    assert wait == pytest.approx(2.0)
+    # Free routes are never limited
+    assert limiter.check(clients, f"{settings.api_v1_prefix}/bible-chat/health", now=0.0) is None
+
+
+def test_limiter_rejects_while_quota_is_in_debt():
+    limiter = RateLimiter()
+    clients = ("ip:a",)
+    limiter.quotas["llm_tokens"].charge(clients, settings.llm_token_quota_per_hour + 1000.0, now=0.0)
+    resource, wait = limiter.check(clients, CHAT, now=0.0)
+    assert resource == "llm_tokens"
+    assert wait > 0
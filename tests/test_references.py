@@ -0,0 +1,84 @@
+import pytest
+
+from app.services.scripture.references import (
+    InvalidReference,
+    ScriptureReference,
+    check_reference,
+    is_valid,
+    parse_references,
+    resolve_book,
+    strip_invalid_citations,
+)
+
+
+@pytest.mark.parametrize("name, book", [
+    ("1 Cor", "1 Corinthians"),
+    ("I Corinthians", "1 Corinthians"),
+    ("1st John", "1 John"),
+    ("Ps", "Psalms"),
+    ("Song of Songs", "Song of Solomon"),
+    ("Hab.", "Habakkuk"),
+])
+def test_resolve_book_aliases(name, book):
+    assert resolve_book(name) == book
+
+
+def test_resolve_book_unknown():
+    assert resolve_book("Hezekiah") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("John 3:16", [ScriptureReference("John", 3, 16)]),
+    ("1 Cor 13:4-7", [ScriptureReference("1 Corinthians", 13, 4, None, 7)]),
+    ("Ps 23", [ScriptureReference("Psalms", 23)]),
+    ("Ps 1-3", [ScriptureReference("Psalms", 1, None, 3)]),
+    ("Gen 1:1-2:3", [ScriptureReference("Genesis", 1, 1, 2, 3)]),
+    ("Jude 3", [ScriptureReference("Jude", 1, 3)]),
+    ("John 3:16a", [ScriptureReference("John", 3, 16)]),
+    ("Romans 5:8; 6:23", [ScriptureReference("Romans", 5, 8), ScriptureReference("Romans", 6, 23)]),
+    ("John 3:16, 18-20", [ScriptureReference("John", 3, 16), ScriptureReference("John", 3, 18, None, 20)]),
+    ("Hab 3:17-18 (ESV)", [ScriptureReference("Habakkuk", 3, 17, None, 18)]),
+])
+def test_parse_references(text, expected):
+    assert parse_references(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "Hezekiah 1:1", "3:16", "John three"])
+def test_parse_references_rejects(text):
+    with pytest.raises(InvalidReference):
+        parse_references(text)
+
+
+@pytest.mark.parametrize("reference, valid", [
+    (ScriptureReference("Psalms", 150, 6), True),
+    (ScriptureReference("Psalms", 151), False),
+    (ScriptureReference("John", 3, 37), False),
+    (ScriptureReference("Genesis", 1, 1, 2, 3), True),
+    (ScriptureReference("Genesis", 2, 1, 1, 3), False),
+    (ScriptureReference("John", 3, 18, None, 16), False),
+    (ScriptureReference("Obadiah", 2), False),
+])
+def test_is_valid_against_canon(reference, valid):
+    assert is_valid(reference) is valid
+
+
+def test_check_reference_canonical_form():
+    assert check_reference("1 Cor 13:4-7") == "1 Corinthians 13:4-7"
+    assert check_reference("Gen 1:1-2:3; 3:1") == "Genesis 1:1-2:3; Genesis 3:1"
+
+
+def test_check_reference_invalid_or_unparsed():
+    assert check_reference("John 22:1") is None
+    assert check_reference("not a reference") is None
+
+
+def test_strip_invalid_citations():
+    text, removed = strip_invalid_citations("Obadiah 3:5 says so, and John 3:16 agrees (Psalm 151:1).")
+    assert text == "Obadiah says so, and John 3:16 agrees."
+    assert removed == ["Obadiah 3:5", "Psalm 151:1"]
+
+
+def test_strip_invalid_citations_keeps_valid_parts():
+    text, removed = strip_invalid_citations("See John 3:16, 99 for more.")
+    assert text == "See John 3:16 for more."
+    assert removed == ["John 3:16, 99"]
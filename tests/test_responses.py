@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+from app.core import responses
+from app.core.responses import PrecomputedResponse, negotiate_encoding
+
+LARGE = {"success": True, "devotion": {"title": "Grace", "body": "Be still, and know that I am God. " * 40}}
+
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("*", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("*, gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiation_without_brotli(without_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_brotli_is_preferred_when_available(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_large_bodies_are_served_compressed(without_brotli):
+    precomputed = PrecomputedResponse(LARGE)
+    response = precomputed(_request(accept_encoding="gzip"))
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == LARGE
+
+    identity = precomputed(_request())
+    assert "content-encoding" not in identity.headers
+    assert json.loads(identity.body) == LARGE
+    assert len(response.body) < len(identity.body)
+
+
+def test_small_bodies_are_never_compressed(without_brotli):
+    response = PrecomputedResponse({"status": "ok"})(_request(accept_encoding="gzip"))
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body) == {"status": "ok"}
+
+
+def test_matching_etag_gets_304():
+    precomputed = PrecomputedResponse(LARGE, max_age=86400)
+    etag = precomputed(_request()).headers["etag"]
+    assert etag.startswith('W/"')
+
+    for if_none_match in (etag, etag[2:], f'"stale", {etag}', "*"):
+        response = precomputed(_request(if_none_match=if_none_match, accept_encoding="gzip"))
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+        assert response.headers["cache-control"] == "public, max-age=86400"
+
+
+def test_changed_content_gets_a_full_response():
+    old_etag = PrecomputedResponse({"day": 1})(_request()).headers["etag"]
+    response = PrecomputedResponse({"day": 2})(_request(if_none_match=old_etag))
+    assert response.status_code == 200
+    assert json.loads(response.body) == {"day": 2}
+
+
+def test_etag_depends_only_on_content():
+    assert PrecomputedResponse(LARGE).etag == PrecomputedResponse(dict(LARGE)).etag
+    assert PrecomputedResponse(LARGE).etag != PrecomputedResponse({**LARGE, "success": False}).etag
+
+
+def test_error_responses_are_never_304():
+    precomputed = PrecomputedResponse({"detail": "Not Found"}, status_code=404)
+    response = precomputed(_request(if_none_match=precomputed.etag))
+    assert response.status_code == 404
+    assert response.headers["cache-control"] == "no-cache"
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import DeadlineExceeded, reset_deadline, set_deadline
+from app.core.scheduler import BATCH, INTERACTIVE, PREFETCH, UpstreamScheduler
+
+WEIGHTS = {INTERACTIVE: 8.0, BATCH: 2.0, PREFETCH: 1.0}
+
+
+async def _queue(scheduler: UpstreamScheduler, priorities, admitted):
+    """Start one acquire() per priority, each recording its label when admitted"""
+    async def acquire(label, priority):
+        await scheduler.acquire(priority)
+        admitted.append(label)
+
+    tasks = [asyncio.create_task(acquire(f"{priority}{i}", priority)) for i, priority in enumerate(priorities)]
+    await asyncio.sleep(0)
+    return tasks
+
+
+async def _drain(scheduler: UpstreamScheduler, tasks):
+    """Release the held slot once per queued call so each is admitted in turn"""
+    for _ in tasks:
+        scheduler.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+def test_uncontended_acquire_is_immediate():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 2, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        await scheduler.acquire(INTERACTIVE)
+        assert scheduler.snapshot()["in_flight"] == 2
+        scheduler.release()
+        scheduler.release()
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_backlog_is_served_in_weight_ratio():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        admitted = []
+        tasks = await _queue(scheduler, [BATCH] * 10 + [INTERACTIVE] * 10, admitted)
+        await _drain(scheduler, tasks)
+        return admitted
+
+    admitted = asyncio.run(scenario())
+    # Finish tags: interactive k/8, batch k/2, so 8 interactive per 2 batch while both are backlogged
+    first = [label.rstrip("0123456789") for label in admitted[:10]]
+    assert first.count(INTERACTIVE) == 8
+    assert first.count(BATCH) == 2
+    assert admitted[-1].startswith(BATCH)
+
+
+def test_admission_follows_finish_tags():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, {INTERACTIVE: 10.0, BATCH: 4.0, PREFETCH: 1.0})
+        await scheduler.acquire(BATCH)
+        admitted = []
+        # Tags: prefetch 1.0; batch 0.25, 0.5, 0.75; interactive 0.1, 0.2
+        tasks = await _queue(scheduler, [PREFETCH, BATCH, BATCH, BATCH, INTERACTIVE, INTERACTIVE], admitted)
+        await _drain(scheduler, tasks)
+        return admitted
+
+    assert asyncio.run(scenario()) == [
+        "interactive4", "interactive5", "batch1", "batch2", "batch3", "prefetch0"
+    ]
+
+
+def test_late_interactive_call_waits_only_behind_work_tagged_ahead():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        admitted = []
+        batch = await _queue(scheduler, [BATCH] * 6, admitted)
+        # Admit two batch calls (tags 0.5, 1.0), moving virtual time to 1.0
+        for _ in range(2):
+            scheduler.release()
+            await asyncio.sleep(0)
+        # Tagged max(1.0, 0) + 1/8, ahead of the remaining batch tags 1.5..3.0
+        late = await _queue(scheduler, [INTERACTIVE], admitted)
+        await _drain(scheduler, batch[2:] + late)
+        return admitted
+
+    admitted = asyncio.run(scenario())
+    assert admitted[:3] == ["batch0", "batch1", "interactive0"]
+
+
+def test_cancelled_after_admission_hands_the_slot_on():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        first = asyncio.create_task(scheduler.acquire(INTERACTIVE))
+        second = asyncio.create_task(scheduler.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+
+        # Admits `first`, which is then cancelled before it gets to run
+        scheduler.release()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        await asyncio.wait_for(second, 1.0)
+        assert scheduler.snapshot()["in_flight"] == 1
+        assert scheduler.snapshot()["queued"] == {INTERACTIVE: 0, BATCH: 0, PREFETCH: 0}
+        scheduler.release()
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_while_queued_leaves_the_queue():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        waiting = asyncio.create_task(scheduler.acquire(PREFETCH))
+        await asyncio.sleep(0)
+        assert scheduler.snapshot()["queued"][PREFETCH] == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.snapshot()["queued"][PREFETCH] == 0
+
+        scheduler.release()
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_deadline_expires_while_queued():
+    async def scenario():
+        scheduler = UpstreamScheduler("test", 1, WEIGHTS)
+        await scheduler.acquire(BATCH)
+        token = set_deadline(0.01)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.acquire(INTERACTIVE)
+        finally:
+            reset_deadline(token)
+        assert scheduler.snapshot()["queued"][INTERACTIVE] == 0
+        assert scheduler.snapshot()["in_flight"] == 1
+
+    asyncio.run(scenario())
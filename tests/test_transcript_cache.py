@@ -0,0 +1,105 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+from app.core.cache import TTLCache
+from app.services.speech_to_text.speech_to_text_service import STTService
+
+WAV = b"RIFF\x24\x00\x00\x00WAVEfmt " + bytes(32)
+
+
+def _service():
+    """An STTService whose Whisper client records calls and answers with a counter"""
+    calls = []
+
+    async def create(model, file, timeout=None, **options):
+        calls.append((file[0], options))
+        return SimpleNamespace(text=f"transcript {len(calls)}")
+
+    service = STTService()
+    service.client = SimpleNamespace(audio=SimpleNamespace(transcriptions=SimpleNamespace(create=create)))
+    return service, calls
+
+
+def test_identical_audio_is_transcribed_once():
+    service, calls = _service()
+
+    async def scenario():
+        first = await service.transcribe(WAV, "prayer.wav")
+        # Same bytes under another name: the cache keys on content, not filename
+        second = await service.transcribe(WAV, "retry-upload.wav")
+        return first, second
+
+    assert asyncio.run(scenario()) == ("transcript 1", "transcript 1")
+    assert len(calls) == 1
+    assert service.transcript_cache.stats()["hits"] == 1
+
+
+def test_language_hint_is_part_of_the_key():
+    service, calls = _service()
+
+    async def scenario():
+        return [await service.transcribe(WAV, "a.wav", language) for language in (None, "es", "es")]
+
+    assert asyncio.run(scenario()) == ["transcript 1", "transcript 2", "transcript 2"]
+    assert [options for _, options in calls] == [{}, {"language": "es"}]
+
+
+def test_file_objects_are_cached_only_with_a_content_hash():
+    service, calls = _service()
+
+    async def scenario():
+        await service.transcribe(io.BytesIO(WAV), "a.wav")
+        await service.transcribe(io.BytesIO(WAV), "a.wav")
+        await service.transcribe(io.BytesIO(WAV), "a.wav", content_hash="abc")
+        await service.transcribe(io.BytesIO(WAV), "b.wav", content_hash="abc")
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_failed_transcriptions_are_not_cached():
+    service, calls = _service()
+    create = service.client.audio.transcriptions.create
+    failures = [RuntimeError("upstream error")]
+
+    async def flaky(**kwargs):
+        if failures:
+            raise failures.pop()
+        return await create(**kwargs)
+
+    service.client.audio.transcriptions.create = flaky
+
+    async def scenario():
+        try:
+            await service.transcribe(WAV, "a.wav")
+        except RuntimeError:
+            pass
+        return await service.transcribe(WAV, "a.wav")
+
+    assert asyncio.run(scenario()) == "transcript 1"
+    assert len(calls) == 1
+
+
+def test_cache_persists_unexpired_entries(tmp_path):
+    path = str(tmp_path / "transcripts.json")
+    cache = TTLCache(max_entries=10, ttl_seconds=60, persist_path=path)
+    cache.set("hash:whisper-1:auto", "In the beginning")
+    cache.save()
+
+    reloaded = TTLCache(max_entries=10, ttl_seconds=60, persist_path=path)
+    assert reloaded.get("hash:whisper-1:auto") == "In the beginning"
+
+
+def test_cache_evicts_least_recently_used_and_keeps_stale_values():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    expired = TTLCache(max_entries=2, ttl_seconds=-1)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+    assert expired.get_stale("a") == 1
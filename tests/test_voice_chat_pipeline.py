@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import json
+
+from app.services.audio_generation.audio_service import AudioGenerationService
+from app.services.speech_to_text import voice_chat_pipeline
+from app.services.speech_to_text.voice_chat_pipeline import SentenceBuffer, voice_chat_events
+
+
+def _parse(frame: str):
+    event, data = frame.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def _collect(monkeypatch, tokens, tts_delays=None, fail_sentence=None, fail_chat=False):
+    """Run the pipeline with a scripted chat stream and fake TTS, returning (event, data) pairs"""
+    async def fake_chat(transcript):
+        for token in tokens:
+            await asyncio.sleep(0)
+            yield token
+        if fail_chat:
+            raise RuntimeError("chat upstream failed")
+
+    async def fake_tts(self, text, chunk_size=8192):
+        # Earlier sentences can be slower than later ones; audio must still arrive in order
+        await asyncio.sleep((tts_delays or {}).get(text, 0))
+        if text == fail_sentence:
+            raise RuntimeError("tts upstream failed")
+        yield text.encode()
+
+    monkeypatch.setattr(voice_chat_pipeline.stt_service, "stream_bible_gpt_response", fake_chat)
+    monkeypatch.setattr(AudioGenerationService, "stream_audio", fake_tts)
+    monkeypatch.setattr(voice_chat_pipeline.settings, "voice_min_sentence_chars", 1)
+
+    async def run():
+        return [_parse(frame) async for frame in voice_chat_events("Who wrote Romans?")]
+
+    return asyncio.run(run())
+
+
+def test_sentence_buffer_releases_complete_sentences():
+    buffer = SentenceBuffer(min_chars=1)
+    assert buffer.feed("Paul wrote") == []
+    assert buffer.feed(" Romans. He was") == ["Paul wrote Romans."]
+    assert buffer.feed(" an apostle!\" Grace") == ["He was an apostle!\""]
+    assert buffer.flush() == "Grace"
+    assert buffer.flush() is None
+
+
+def test_sentence_buffer_merges_short_sentences():
+    buffer = SentenceBuffer(min_chars=12)
+    assert buffer.feed("Amen. See Rom. 5:8 for more. ") == ["Amen. See Rom.", "5:8 for more."]
+
+
+def test_events_arrive_in_pipeline_order(monkeypatch):
+    events = _collect(
+        monkeypatch, ["Paul ", "wrote it. ", "Around ", "AD 57."],
+        tts_delays={"Paul wrote it.": 0.05}
+    )
+    names = [name for name, _ in events]
+    assert names[0] == "transcript" and events[0][1] == {"text": "Who wrote Romans?"}
+    assert names[-1] == "done"
+    assert "".join(data["text"] for name, data in events if name == "token") == "Paul wrote it. Around AD 57."
+    text_done = [data for name, data in events if name == "text_done"]
+    assert text_done == [{"response": "Paul wrote it. Around AD 57."}]
+
+    audio = [data for name, data in events if name == "audio"]
+    assert [data["sentence_index"] for data in audio] == [0, 1]
+    assert [base64.b64decode(data["audio"]).decode() for data in audio] == ["Paul wrote it.", "Around AD 57."]
+
+
+def test_tts_failure_is_reported_for_that_sentence_only(monkeypatch):
+    events = _collect(monkeypatch, ["First one. ", "Second one."], fail_sentence="First one.")
+    assert ("error", {"stage": "tts", "sentence_index": 0}) in events
+    assert [data["sentence_index"] for name, data in events if name == "audio"] == [1]
+    assert events[-1] == ("done", {})
+
+
+def test_chat_failure_ends_the_stream(monkeypatch):
+    events = _collect(monkeypatch, ["Partial answer. "], fail_chat=True)
+    assert ("error", {"stage": "chat", "message": "Could not generate a response"}) in events
+    assert not any(name == "text_done" for name, _ in events)
+    # The sentence finished before the failure is still spoken
+    assert [data["sentence_index"] for name, data in events if name == "audio"] == [0]
+    assert events[-1] == ("done", {})